@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Event-loop blocking benchmark for the database layer
+
+Measures /health latency while 200 concurrent /api/mood/history requests
+are in flight, once against the legacy blocking Session handler and once
+against the async handler. Run from the backend directory:
+
+    python benchmarks/bench_async_db.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Point the app at a throwaway SQLite database before config is imported
+_tmp_dir = tempfile.mkdtemp(prefix="eggjam-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import APIRouter
+from sqlalchemy import insert
+
+from database import Base, SessionLocal, engine
+from models.db_models import MoodEntry, User
+
+CONCURRENT_REQUESTS = 200
+USERS = 100
+ENTRIES_PER_USER = 2000
+HEALTH_PROBE_INTERVAL = 0.005
+
+legacy_router = APIRouter(prefix="/legacy/mood")
+
+
+@legacy_router.get("/history/{user_id}")
+async def legacy_mood_history(user_id: int, days: int = 30):
+    """The pre-async handler: blocking Session queries on the event loop"""
+    db = SessionLocal()
+    try:
+        cutoff_date = datetime.now() - timedelta(days=days)
+        entries = db.query(MoodEntry).filter(
+            MoodEntry.user_id == user_id,
+            MoodEntry.date >= cutoff_date
+        ).order_by(MoodEntry.date.asc()).all()
+        return [{"id": e.id, "mood_score": e.mood_score, "date": e.date} for e in entries]
+    finally:
+        db.close()
+
+
+def seed():
+    """Create tables and a mood log large enough that the history query scans"""
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": str(u), "email": f"bench{u}@demo.com", "full_name": f"Bench User {u}"}
+            for u in range(1, USERS + 1)
+        ])
+        conn.execute(insert(MoodEntry), [
+            {
+                "user_id": str(u),
+                "mood_score": (i % 10) + 1,
+                "emotions": ["calm"],
+                "note": "",
+                "date": now - timedelta(days=i)
+            }
+            for u in range(1, USERS + 1)
+            for i in range(ENTRIES_PER_USER)
+        ])
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, history_path: str) -> dict:
+    """Probe /health while the history requests are running"""
+    health_latencies = []
+    done = asyncio.Event()
+
+    async def probe(due: float):
+        await client.get("/health")
+        health_latencies.append((time.perf_counter() - due) * 1000)
+
+    async def schedule_probes():
+        # Probes are due on a fixed schedule and latency is measured from the
+        # due time, so time spent waiting on a blocked event loop is counted
+        due = time.perf_counter()
+        probes = []
+        while True:
+            now = time.perf_counter()
+            while due <= now:
+                probes.append(asyncio.create_task(probe(due)))
+                due += HEALTH_PROBE_INTERVAL
+            if done.is_set():
+                break
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        await asyncio.gather(*probes)
+
+    prober = asyncio.create_task(schedule_probes())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    await asyncio.gather(*[client.get(history_path) for _ in range(CONCURRENT_REQUESTS)])
+    elapsed = time.perf_counter() - started
+    done.set()
+    await prober
+
+    return {
+        "probes": len(health_latencies),
+        "p50_ms": statistics.median(health_latencies),
+        "p99_ms": percentile(health_latencies, 99),
+        "max_ms": max(health_latencies),
+        "history_wall_s": elapsed
+    }
+
+
+async def main():
+    import main as app_module
+
+    app_module.app.other_asgi_app.include_router(legacy_router)
+    transport = httpx.ASGITransport(app=app_module.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        results = {
+            "before (sync Session)": await run_scenario(client, "/legacy/mood/history/1"),
+            "after (AsyncSession)": await run_scenario(client, "/api/mood/history/1"),
+        }
+
+    print(f"{CONCURRENT_REQUESTS} concurrent /api/mood/history requests over {USERS * ENTRIES_PER_USER} mood rows")
+    print(f"{'scenario':24} {'probes':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'wall s':>8}")
+    for name, r in results.items():
+        print(f"{name:24} {r['probes']:>7} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['max_ms']:>9.2f} {r['history_wall_s']:>8.2f}")
+
+
+if __name__ == "__main__":
+    seed()
+    asyncio.run(main())
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Audit log write path: commit per event vs. the queued bulk writer
+
+Records 5k audit events the old way (an AuditLog row plus its own commit
+per event) and through AuditLogWriter, timing both and counting commits.
+Then checks the failure modes: with the database down, `record` keeps
+returning at once after the queue is full (the rest are only in the spill
+file) and everything is written, in order, once the database is back; a
+batch that keeps failing goes to the failed-audit file after
+AUDIT_MAX_RETRIES; and a second writer replays the spill of the "crashed"
+first one on start. Run from the backend directory:
+
+    python benchmarks/bench_audit_log.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp(prefix="eggjam-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, event, func, select
+
+from database import AsyncSessionLocal, Base, async_engine, engine
+from models.platform_config import AuditLog
+from services.audit_log import AuditLogWriter
+
+EVENTS = 5_000
+SPILL_DIR = os.path.join(_tmp_dir, "spill")
+
+commits = 0
+
+
+@event.listens_for(async_engine.sync_engine, "commit")
+def count_commits(conn):
+    global commits
+    commits += 1
+
+
+def make_event(i: int) -> dict:
+    return {"action": "login", "user_id": f"user_{i % 300}", "ip_address": "10.0.0.1"}
+
+
+async def count_rows() -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count(AuditLog.id)))
+
+
+async def reset():
+    global commits
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(AuditLog))
+        await db.commit()
+    commits = 0
+
+
+async def run_legacy():
+    for i in range(EVENTS):
+        async with AsyncSessionLocal() as db:
+            db.add(AuditLog(**make_event(i)))
+            await db.commit()
+
+
+async def run_writer():
+    writer = AuditLogWriter(spill_dir=SPILL_DIR)
+    for i in range(EVENTS):
+        await writer.record(**make_event(i))
+    await writer.close()
+
+
+class DatabaseDown:
+    def __init__(self):
+        self.down = True
+
+    def __call__(self):
+        if self.down:
+            raise ConnectionError("database unavailable")
+        return AsyncSessionLocal()
+
+
+async def outage_and_recovery():
+    """Database down for 500 events, then back; returns (slowest record ms, rows, in order?)"""
+    database = DatabaseDown()
+    writer = AuditLogWriter(session_factory=database, spill_dir=os.path.join(_tmp_dir, "outage"),
+                            queue_size=100, batch_size=50, segment_events=64)
+    slowest = 0.0
+    for i in range(500):
+        started = time.perf_counter()
+        await writer.record(**make_event(i))
+        slowest = max(slowest, time.perf_counter() - started)
+    database.down = False
+    await writer.close()
+    async with AsyncSessionLocal() as db:
+        users = (await db.execute(select(AuditLog.user_id).order_by(AuditLog.id))).scalars().all()
+    return slowest * 1000, len(users), users == [make_event(i)["user_id"] for i in range(500)]
+
+
+class RejectsRows:
+    """A database that is up but refuses these rows (e.g. a schema mismatch)"""
+
+    def __call__(self):
+        return RejectingSession()
+
+
+class RejectingSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, *args, **kwargs):
+        raise ValueError("column user_id is of type integer")
+
+
+async def poisoned_batch():
+    """Returns whether the writer gave up on the batch, and how many events it set aside"""
+    spill_dir = os.path.join(_tmp_dir, "poisoned")
+    writer = AuditLogWriter(session_factory=RejectsRows(), spill_dir=spill_dir, batch_size=10,
+                            interval_ms=10, max_retries=2)
+    for i in range(10):
+        await writer.record(**make_event(i))
+    for _ in range(100):
+        await asyncio.sleep(0.05)
+        if not writer._inflight and writer._queue.empty():
+            break
+    gave_up = not writer._inflight
+    await writer.close()
+    failed = [name for name in os.listdir(spill_dir) if name.startswith("failed-audit-")]
+    with open(os.path.join(spill_dir, failed[0])) as f:
+        return gave_up, sum(1 for _ in f)
+
+
+async def crash_and_replay():
+    crashed = AuditLogWriter(session_factory=DatabaseDown(), spill_dir=SPILL_DIR, queue_size=100,
+                             batch_size=50, segment_events=64)
+    recorded = 0
+    for i in range(500):
+        await crashed.record(**make_event(i))
+        recorded += 1
+
+    # Simulate the worker dying: the task stops, the OS drops its lock
+    crashed._writer.cancel()
+    os.close(crashed._lock_fd)
+    os.close(crashed._segment_fd)
+    spilled = 0
+    for name in os.listdir(SPILL_DIR):
+        if name.endswith(".jsonl"):
+            with open(os.path.join(SPILL_DIR, name)) as f:
+                spilled += sum(1 for _ in f)
+
+    survivor = AuditLogWriter(spill_dir=SPILL_DIR)
+    await survivor.start()
+    await survivor.close()
+    return recorded, spilled, await count_rows(), os.listdir(SPILL_DIR)
+
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+
+    await reset()
+    started = time.perf_counter()
+    await run_legacy()
+    legacy_s, legacy_commits = time.perf_counter() - started, commits
+
+    await reset()
+    started = time.perf_counter()
+    await run_writer()
+    writer_s, writer_commits, writer_rows = time.perf_counter() - started, commits, await count_rows()
+
+    await reset()
+    slowest_ms, recovered, in_order = await outage_and_recovery()
+    gave_up, set_aside = await poisoned_batch()
+
+    await reset()
+    recorded, spilled, replayed, left = await crash_and_replay()
+    await async_engine.dispose()
+
+    print(f"{EVENTS:,} audit events")
+    print(f"commit per event: {legacy_commits:6,} commits  {legacy_s:6.2f}s  {EVENTS / legacy_s:8,.0f} events/s")
+    print(f"queued writer:    {writer_commits:6,} commits  {writer_s:6.2f}s  {EVENTS / writer_s:8,.0f} events/s  "
+          f"({writer_rows:,} rows)")
+    print(f"database down: 500 record() calls, slowest {slowest_ms:.2f} ms (queue 100, rest spill-only); "
+          f"database back: {recovered} rows written, {'in' if in_order else 'OUT OF'} order")
+    print(f"rejected batch: {'set aside' if gave_up else 'STILL RETRYING'} after 2 attempts, "
+          f"{set_aside} events in failed-audit-*.jsonl")
+    print(f"crashed worker: {recorded} events recorded with the database down, {spilled} in the spill file")
+    print(f"after restart: {replayed} of {spilled} spilled events replayed, spill dir now {left or 'empty'}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-byte benchmark for /api/conversation/chat vs /chat/stream
+
+Runs the app under uvicorn and a local stub model (100 ms to first token,
+200 tokens at 10 ms each) in child processes, then compares time-to-first-byte,
+time-to-first-token and aggregate token throughput for the buffered and
+the streaming endpoint. Run from the backend directory:
+
+    python benchmarks/bench_chat_streaming.py
+
+Set BENCH_CONCURRENCY to change the number of simultaneous chats (default 20).
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_llm import free_port, start_app_process, start_stub_process, stub_env
+
+STUB_PORT = free_port()
+APP_PORT = free_port()
+_tmp_dir = tempfile.mkdtemp(prefix="eggjam-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+os.environ.update(stub_env(STUB_PORT))
+
+import httpx
+
+CONCURRENCY = int(os.environ.get("BENCH_CONCURRENCY", 20))
+PAYLOAD = {"message": "I have a maths exam tomorrow and feel stressed", "user_id": "bench"}
+
+
+async def buffered_request(client: httpx.AsyncClient) -> dict:
+    started = time.perf_counter()
+    async with client.stream("POST", "/api/conversation/chat", json=PAYLOAD) as response:
+        first_byte = None
+        body = b""
+        async for chunk in response.aiter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            body += chunk
+    total = time.perf_counter() - started
+    return {"ttfb": first_byte, "ttft": first_byte, "total": total, "tokens": body.count(b"tok")}
+
+
+async def streaming_request(client: httpx.AsyncClient) -> dict:
+    started = time.perf_counter()
+    first_byte = first_token = None
+    tokens = 0
+    async with client.stream("POST", "/api/conversation/chat/stream", json=PAYLOAD) as response:
+        async for line in response.aiter_lines():
+            now = time.perf_counter() - started
+            if first_byte is None:
+                first_byte = now
+            if line == "event: token":
+                tokens += 1
+                if first_token is None:
+                    first_token = now
+    total = time.perf_counter() - started
+    return {"ttfb": first_byte, "ttft": first_token, "total": total, "tokens": tokens}
+
+
+async def run(client: httpx.AsyncClient, request_fn) -> dict:
+    started = time.perf_counter()
+    results = await asyncio.gather(*[request_fn(client) for _ in range(CONCURRENCY)])
+    wall = time.perf_counter() - started
+    return {
+        "ttfb_ms": statistics.median(r["ttfb"] for r in results) * 1000,
+        "ttft_ms": statistics.median(r["ttft"] for r in results) * 1000,
+        "total_ms": statistics.median(r["total"] for r in results) * 1000,
+        "tokens_per_s": sum(r["tokens"] for r in results) / wall
+    }
+
+
+async def main():
+    from database import Base, SessionLocal, engine
+    import models.platform_config  # noqa: F401 - register tables
+    from models.db_models import User, UserRole
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.add(User(id=PAYLOAD["user_id"], email="bench@example.com", full_name="Bench", role=UserRole.STUDENT))
+        db.commit()
+
+    start_stub_process(STUB_PORT)
+    app_process = start_app_process(APP_PORT, {"DATABASE_URL": os.environ["DATABASE_URL"], **stub_env(STUB_PORT)})
+
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=60) as client:
+            await streaming_request(client)  # warm up connections and config cache
+            results = {
+                "buffered /chat": await run(client, buffered_request),
+                "SSE /chat/stream": await run(client, streaming_request),
+            }
+    finally:
+        app_process.terminate()
+
+    print(f"{CONCURRENCY} concurrent chats, stub model: 100 ms first token + 200 tokens x 10 ms")
+    print(f"{'endpoint':18} {'TTFB ms':>9} {'TTFT ms':>9} {'total ms':>9} {'tokens/s':>10}")
+    for name, r in results.items():
+        print(f"{name:18} {r['ttfb_ms']:>9.1f} {r['ttft_ms']:>9.1f} {r['total_ms']:>9.1f} {r['tokens_per_s']:>10.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
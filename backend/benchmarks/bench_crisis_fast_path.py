@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Crisis fast path latency under a slow model provider
+
+Points the LLM gateway at a stub provider that takes 2 s per completion,
+then sends high/critical-risk messages to POST /api/conversation/chat and
+times the reply against a 50 ms SLO, next to ordinary messages that have
+to wait for the model. Then waits for the personalized follow-ups and
+checks each one was pushed to the student (broadcast_to_user) and appended
+to their chat session. Exits non-zero if the SLO is missed. Run from the
+backend directory:
+
+    python benchmarks/bench_crisis_fast_path.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp(prefix="eggjam-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+os.environ["AUDIT_SPILL_DIR"] = os.path.join(_tmp_dir, "audit")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from database import Base, SessionLocal, engine
+from models.db_models import User, UserRole
+from services.chat_sessions import chat_sessions
+from services.crisis_followup import crisis_followup
+from services.llm_gateway import llm_gateway
+from socket_manager import socket_manager
+
+import main
+
+SLO_MS = 50.0
+PROVIDER_SECONDS = 2.0
+CRISIS_MESSAGES = [
+    "I want to die, nothing matters anymore",
+    "I keep thinking I should end my life",
+    "I've started cutting again and I feel hopeless",
+    "honestly I want to hurt myself tonight",
+]
+ROUNDS = 25
+
+
+async def slow_provider(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(PROVIDER_SECONDS)
+    return httpx.Response(200, json={"choices": [{"message": {"content": "Personalized follow-up."}}]})
+
+
+async def main_async():
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        user_ids = [f"student_{i}" for i in range(5)] + [f"at_risk_{i}" for i in range(ROUNDS * len(CRISIS_MESSAGES))]
+        db.add_all(User(id=u, email=f"{u}@example.com", full_name=u, role=UserRole.STUDENT) for u in user_ids)
+        db.commit()
+    llm_gateway._transport = httpx.MockTransport(slow_provider)
+
+    pushed = []
+    deliver = socket_manager.broadcast_to_user
+
+    async def record_push(user_id, event, data):
+        pushed.append((user_id, event, data, time.perf_counter()))
+        await deliver(user_id, event, data)
+
+    socket_manager.broadcast_to_user = record_push
+
+    app = main.app.other_asgi_app
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def send(user_id: str, text: str):
+            started = time.perf_counter()
+            response = await client.post("/api/conversation/chat", json={"message": text, "user_id": user_id})
+            response.raise_for_status()
+            return (time.perf_counter() - started) * 1000, response.json()
+
+        # Ordinary turns run alongside, waiting on the slow model
+        ordinary = [asyncio.create_task(send(f"student_{i}", "I had a nice day at school")) for i in range(5)]
+
+        crisis_ms, sessions = [], {}
+        for i in range(ROUNDS * len(CRISIS_MESSAGES)):
+            user_id = f"at_risk_{i}"
+            ms, body = await send(user_id, CRISIS_MESSAGES[i % len(CRISIS_MESSAGES)])
+            assert body["risk_level"] in ("high", "critical") and body["suggested_resources"], body
+            crisis_ms.append(ms)
+            sessions[user_id] = body["session_id"]
+        sent_at = time.perf_counter()
+
+        ordinary_ms = [ms for ms, _ in await asyncio.gather(*ordinary)]
+        while crisis_followup._tasks:
+            await asyncio.sleep(0.05)
+
+    followups = [p for p in pushed if p[1] == "crisis_followup"]
+    in_session = 0
+    for user_id, session_id in sessions.items():
+        session = await chat_sessions.get(session_id)
+        in_session += session is not None and session.messages[-1].content == "Personalized follow-up."
+    await chat_sessions.close()
+
+    ordered = sorted(crisis_ms)
+    p99 = ordered[int(0.99 * (len(ordered) - 1))]
+    print(f"model provider latency: {PROVIDER_SECONDS * 1000:.0f} ms")
+    print(f"crisis replies ({len(crisis_ms)}):  p50 {statistics.median(crisis_ms):6.1f} ms  "
+          f"p99 {p99:6.1f} ms  max {max(crisis_ms):6.1f} ms  (SLO {SLO_MS:.0f} ms)")
+    print(f"ordinary replies ({len(ordinary_ms)}):  p50 {statistics.median(ordinary_ms):6.1f} ms")
+    print(f"follow-ups pushed: {len(followups)}/{len(sessions)}, appended to session: {in_session}/{len(sessions)}, "
+          f"last one {(max(p[3] for p in followups) - sent_at) * 1000:.0f} ms after the final crisis reply")
+
+    if p99 > SLO_MS:
+        print("SLO MISSED")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async())
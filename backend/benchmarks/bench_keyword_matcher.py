@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the shared keyword matcher
+
+Compares the per-table substring loops that used to run on every message
+(risk tiers, depression/anxiety/crisis markers, tone, letter reversals)
+with one KeywordMatcher.match() call over all tables, from short chat
+messages up to very long ones.
+Also reports false hits the substring loops produce, and checks that
+inflected or punctuated crisis wording ("hopelessness", "harmed",
+"'suicide'", "i want to die…") scores at least the risk tier the substring
+loops gave it; exits non-zero if not.
+Run from the backend directory:
+
+    python benchmarks/bench_keyword_matcher.py
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services.ai_service  # noqa: F401 (registers the risk tiers)
+from services.advanced_ai_services import MentalHealthMonitor
+from services.discovery_services import LearningDisabilityDetector
+from services.keyword_matcher import keyword_matcher
+from services.parent_mediation_service import ParentMediationService
+
+MESSAGE_WORDS = [30, 200, 1000, 5000]
+MESSAGES_PER_SIZE = 50
+ROUNDS = 5
+
+FILLER = (
+    "today at school we had a maths test and i think it went okay but the "
+    "science homework is taking forever and my friends want to study together "
+    "after lunch so maybe i will finish it tonight before dinner with my diet plan "
+    "and the teacher said the project is due next week"
+).split()
+TIERS = ("critical", "high", "medium", "low")
+# The risk tiers as the substring loops had them, before inflections were listed
+LEGACY_CRISIS_KEYWORDS = {
+    "critical": ["suicide", "kill myself", "end my life", "want to die", "not worth living"],
+    "high": ["self-harm", "hurt myself", "cutting", "harm", "hopeless"],
+    "medium": ["depressed", "anxiety attack", "can't cope", "overwhelming", "can't go on"],
+    "low": ["stressed", "worried", "sad", "anxious", "upset"]
+}
+INFLECTED = [
+    "I feel hopelessness every day", "everything feels hopeless", "I harmed myself last night",
+    "I keep harming myself", "thinking about self-harming again", "I have self-harmed before",
+    "I feel suicidal", "I thought about suicide", "I'm killing myself over this homework",
+    "I keep having anxiety attacks", "I'm so distressed", "I feel sadness", "she was anxiously waiting",
+    "that was upsetting", "it harms nobody"
+]
+PUNCTUATED = [
+    "I keep thinking 'I want to die'", "'suicide' is on my mind", "“I want to die”",
+    "i want to die…", "i want to die😢", "i feel hopeless!!!", "(self-harm)", "kill myself."
+]
+SIGNALS = [
+    "i feel hopeless", "nobody cares", "i am so tired", "heart racing",
+    "it is not my fault", "teh", "i want to die", "self-harm", "worried"
+]
+
+
+def legacy_scan(text: str) -> dict:
+    """The per-table loops as they ran before the shared matcher"""
+    found = {}
+
+    message_lower = text.lower()
+    for tier in TIERS:
+        if any(keyword in message_lower for keyword in LEGACY_CRISIS_KEYWORDS[tier]):
+            found["risk"] = tier
+            break
+
+    for name, table in (("depression", MentalHealthMonitor.DEPRESSION_MARKERS),
+                        ("anxiety", MentalHealthMonitor.ANXIETY_MARKERS)):
+        text_lower = text.lower()
+        found[name] = sum(1 for words in table.values() if any(w.rstrip("*") in text_lower for w in words))
+
+    text_lower = text.lower()
+    found["crisis"] = any(t.rstrip("*") in text_lower for t in MentalHealthMonitor.CRISIS_TERMS["language"])
+
+    lower_text = text.lower()
+    for tone, words in ParentMediationService.TONE_MARKERS.items():
+        if any(w in lower_text for w in words):
+            found["tone"] = tone
+            break
+
+    text_lower = text.lower()
+    found["reversals"] = sum(text_lower.count(p) for p in LearningDisabilityDetector.REVERSAL_PATTERNS["common"])
+    return found
+
+
+def risk_tier(text: str) -> str:
+    """AIService._assess_risk's tier from the matcher's hits"""
+    hits = keyword_matcher.match(text)
+    return next((tier for tier in TIERS if hits[f"risk.{tier}"]), "none")
+
+
+def check_inflections() -> int:
+    """Inflected or punctuated messages the matcher scores below the substring loops"""
+    rank = {tier: i for i, tier in enumerate(TIERS + ("none",))}
+    weaker = 0
+    print("Inflected and punctuated crisis wording (loops -> matcher):")
+    for message in INFLECTED + PUNCTUATED:
+        legacy, tier = legacy_scan(message).get("risk", "none"), risk_tier(message)
+        flag = "" if rank[tier] <= rank[legacy] else "  <-- weaker"
+        weaker += bool(flag)
+        print(f"  {message!r:45} {legacy:>8} -> {tier:<8}{flag}")
+    return weaker
+
+
+def build_messages(words: int, seed: int):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(MESSAGES_PER_SIZE):
+        tokens = [rng.choice(FILLER) for _ in range(words)]
+        for _ in range(max(1, words // 250)):
+            tokens.insert(rng.randrange(len(tokens)), rng.choice(SIGNALS))
+        messages.append(" ".join(tokens))
+    return messages
+
+
+def time_per_message(fn, messages) -> float:
+    samples = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        for message in messages:
+            fn(message)
+        samples.append((time.perf_counter() - started) / len(messages))
+    return statistics.median(samples) * 1e6
+
+
+def main():
+    keyword_matcher.match("")  # compile outside the timed region
+
+    print(f"{'words':>6} {'loops us':>10} {'matcher us':>11} {'speedup':>8}")
+    for words in MESSAGE_WORDS:
+        messages = build_messages(words, seed=words)
+        legacy_us = time_per_message(legacy_scan, messages)
+        matcher_us = time_per_message(keyword_matcher.match, messages)
+        print(f"{words:>6} {legacy_us:>10.1f} {matcher_us:>11.1f} {legacy_us / matcher_us:>7.2f}x")
+
+    sample = "I'm sticking to my diet and the studio is having a harmony workshop"
+    print()
+    print(f"False hits on {sample!r}:")
+    print(f"  substring loops: {legacy_scan(sample)}")
+    print(f"  matcher:         {dict(keyword_matcher.match(sample))}")
+
+    print()
+    if check_inflections():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+LLM admission under a slow provider: one FIFO line vs. the priority scheduler
+
+A stub provider (200 ms per completion, 8 concurrent) is hit at once by
+120 background generations (challenges/quests), 60 chat turns and 66
+tutoring questions (60 from one school, 6 from another), while 10 crisis
+turns arrive over the first second. Run once with every call in a single
+FIFO queue, as before, and once with the scheduler's priority classes,
+per-school fair queuing and load shedding. Reports per-class latency and
+how many calls were shed to their fallbacks. Run from the backend directory:
+
+    python benchmarks/bench_llm_scheduler.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp(prefix="eggjam-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from database import Base, engine
+from models.db_models import UserRole
+from services import llm_gateway as gateway_module
+from services.llm_gateway import LLMError, LLMGateway
+from services.llm_scheduler import LLMPriority, LLMScheduler
+from services.principal_cache import Principal, current_principal
+
+CAPACITY = 8
+LATENCY = 0.2
+
+
+async def provider(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(LATENCY)
+    return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+
+async def call(gateway, label, priority, school, delay, results):
+    await asyncio.sleep(delay)
+    current_principal.set(Principal(id=label, role=UserRole.STUDENT, school_id=school, is_active=True))
+    started = time.perf_counter()
+    try:
+        await gateway.chat([{"role": "user", "content": "hi"}], priority=priority)
+        shed = False
+    except LLMError:
+        shed = True  # caller returns its fallback
+    results.setdefault(label, []).append((time.perf_counter() - started, shed))
+
+
+async def run(scheduler: LLMScheduler, prioritized: bool):
+    gateway_module.llm_scheduler = scheduler
+    gateway = LLMGateway(transport=httpx.MockTransport(provider))
+
+    def p(priority):
+        return priority if prioritized else LLMPriority.CHAT
+
+    results = {}
+    calls = []
+    calls += [call(gateway, "background", p(LLMPriority.BACKGROUND), 1, 0, results) for _ in range(120)]
+    calls += [call(gateway, "chat", p(LLMPriority.CHAT), 1, 0, results) for _ in range(60)]
+    calls += [call(gateway, "tutoring school A", p(LLMPriority.TUTORING), 1, 0, results) for _ in range(60)]
+    calls += [call(gateway, "tutoring school B", p(LLMPriority.TUTORING), 2, 0.01, results) for _ in range(6)]
+    calls += [call(gateway, "crisis", p(LLMPriority.CRISIS), 1, 0.1 * i, results) for i in range(10)]
+    await asyncio.gather(*calls)
+    await gateway.close()
+    return results
+
+
+def summarize(title, results):
+    print(title)
+    for label in ("crisis", "chat", "tutoring school A", "tutoring school B", "background"):
+        served = [t for t, shed in results[label] if not shed]
+        shed = [t for t, s in results[label] if s]
+        line = f"  {label:<18} served {len(served):3}"
+        if served:
+            line += f"  p50 {statistics.median(served) * 1000:6.0f} ms  max {max(served) * 1000:6.0f} ms"
+        if shed:
+            line += (f"  | shed {len(shed):3}, fallback after p50 {statistics.median(shed) * 1000:.0f} ms"
+                     f" / max {max(shed) * 1000:.0f} ms")
+        print(line)
+
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+
+    # Before: one line, no budgets (what a plain semaphore gives)
+    fifo = LLMScheduler(
+        capacity=CAPACITY,
+        quotas={p: 1.0 for p in LLMPriority},
+        max_wait_seconds={p: None for p in LLMPriority}
+    )
+    fifo._service_time = 0.0  # no warm estimate; nothing here gets near the 30 s deadline
+    summarize("single FIFO queue:", await run(fifo, prioritized=False))
+
+    scheduler = LLMScheduler(capacity=CAPACITY)
+    # Warm the service-time estimate the way production traffic would
+    scheduler._service_time = LATENCY
+    summarize("priority scheduler:", await run(scheduler, prioritized=True))
+    metrics = scheduler.metrics()
+    print(f"  metrics: service_time_ms={metrics['service_time_ms']}, "
+          + ", ".join(f"{name} shed={c['shed']} wait_p95={c['wait_ms_p95']}ms"
+                      for name, c in metrics["classes"].items()))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Event-loop lag during a login storm
+
+Fires 60 concurrent logins at the real /api/auth/login route (bcrypt on the
+hashing pool, behind admission control) and at a copy of the previous
+handler (passlib verify inline on the event loop), while a probe task
+measures how late a 10 ms sleep wakes up. Lag is what every other request
+on the worker (chat, sockets) would feel. Hashes use bcrypt cost 10 to keep
+the run short; set BENCH_BCRYPT_ROUNDS=12 for the production cost. Run from
+the backend directory:
+
+    python benchmarks/bench_login_storm.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp(prefix="eggjam-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+os.environ.setdefault("BCRYPT_ROUNDS", os.environ.get("BENCH_BCRYPT_ROUNDS", "10"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from passlib.context import CryptContext
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database import Base, engine, get_db
+from models.db_models import User
+from routes import auth
+from services.password_hasher import login_admission, password_hasher
+
+LOGINS = 60
+USERS = 20
+PROBE_INTERVAL = 0.010
+
+legacy_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+app = FastAPI()
+app.include_router(auth.router)
+
+
+@app.post("/legacy/login")
+async def legacy_login(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_db)
+):
+    """The previous handler: bcrypt verify inline on the event loop"""
+    user = (await db.execute(select(User).where(User.email == form_data.username))).scalars().first()
+    if not user or not legacy_context.verify(form_data.password, user.hashed_password):
+        raise HTTPException(status_code=401)
+    return {"ok": True}
+
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    hashed = legacy_context.hash("correct horse", rounds=settings.BCRYPT_ROUNDS)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": str(u), "email": f"storm{u}@demo.com", "full_name": f"Storm {u}",
+             "hashed_password": hashed, "age": 15}
+            for u in range(USERS)
+        ])
+
+
+async def storm(client: httpx.AsyncClient, path: str):
+    lags = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(PROBE_INTERVAL)
+            lags.append((time.perf_counter() - started - PROBE_INTERVAL) * 1000)
+
+    async def login(i):
+        r = await client.post(path, data={"username": f"storm{i % USERS}@demo.com", "password": "correct horse"})
+        return r.status_code
+
+    probe_task = asyncio.create_task(probe())
+    started = time.perf_counter()
+    codes = await asyncio.gather(*[login(i) for i in range(LOGINS)])
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe_task
+
+    lags.sort()
+    return {
+        "elapsed": elapsed,
+        "codes": {c: codes.count(c) for c in set(codes)},
+        "p50": statistics.median(lags),
+        "p99": lags[int(len(lags) * 0.99) - 1] if len(lags) > 1 else lags[-1],
+        "max": lags[-1]
+    }
+
+
+def report(label, r):
+    print(f"{label:<28} {r['elapsed']:6.2f}s  loop lag p50 {r['p50']:7.1f} ms  "
+          f"p99 {r['p99']:7.1f} ms  max {r['max']:7.1f} ms  status {r['codes']}")
+
+
+async def main():
+    seed()
+    await password_hasher.warm()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        legacy = await storm(client, "/legacy/login")
+        pooled = await storm(client, "/api/auth/login")
+    password_hasher.close()
+
+    print(f"{LOGINS} concurrent logins, bcrypt cost {settings.BCRYPT_ROUNDS}, "
+          f"{os.cpu_count()} CPUs, admission limit {login_admission.limit}")
+    report("inline bcrypt (previous)", legacy)
+    report("hashing pool + admission", pooled)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Circle presence: full roster per change vs. batched presence diffs
+
+For circles of 20, 100 and 500 members (10,000 sockets in total at each
+size), runs 30 simulated seconds of churn at 2 changes per second per
+circle: a member drops, and 40% of the time comes back 0.1-0.4 s later
+(a reconnect). Compares pushing the full roster to the room on every
+change with PresenceService's diffs, flushed every 500 ms. Reports
+packets, bytes and the average payload, plus the largest pending diff
+state between flushes. Run from the backend directory:
+
+    python benchmarks/bench_presence.py
+"""
+import asyncio
+import heapq
+import json
+import os
+import random
+import sys
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp(prefix="eggjam-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.presence import PresenceService
+from services.state_store import MemoryStateStore
+
+SOCKETS = 10_000
+SECONDS = 30.0
+CHURN_PER_ROOM = 2.0
+FLUSH = 0.5
+
+
+async def run(room_size: int):
+    rooms = SOCKETS // room_size
+    stats = {"naive_packets": 0, "naive_bytes": 0, "diff_packets": 0, "diff_bytes": 0, "diffs": 0}
+
+    async def emit(event, payload, room):
+        if event == "presence_diff":
+            recipients = await presence.count(room)
+            stats["diff_packets"] += recipients
+            stats["diff_bytes"] += recipients * len(json.dumps(payload))
+            stats["diffs"] += 1
+
+    presence = PresenceService(emit=emit, flush_ms=3.6e9, store=MemoryStateStore())  # flushed by hand below
+
+    async def roster_push(room):
+        recipients = await presence.count(room)
+        stats["naive_packets"] += recipients
+        stats["naive_bytes"] += recipients * len(json.dumps(await presence.snapshot(room)))
+
+    for r in range(rooms):
+        for m in range(room_size):
+            await presence.join(f"sid_{r}_{m}", f"user_{r}_{m}", f"circle_{r}")
+    await presence.flush()
+    stats.update({key: 0 for key in stats})  # the initial roster isn't churn
+
+    rng = random.Random(5)
+    events = []  # (time, seq, room, member, join?)
+    seq = 0
+    for r in range(rooms):
+        now = rng.expovariate(CHURN_PER_ROOM)
+        while now < SECONDS:
+            m = rng.randrange(room_size)
+            events.append((now, seq, r, m, False)); seq += 1
+            if rng.random() < 0.4:
+                events.append((now + rng.uniform(0.1, 0.4), seq, r, m, True)); seq += 1
+            now += rng.expovariate(CHURN_PER_ROOM)
+    heapq.heapify(events)
+
+    online = {(r, m) for r in range(rooms) for m in range(room_size)}
+    changes = 0
+    peak_pending = 0
+    next_flush = FLUSH
+    while events:
+        at, _, r, m, join = heapq.heappop(events)
+        while next_flush <= at:
+            peak_pending = max(peak_pending, sum(len(c) for c in presence._pending.values()))
+            await presence.flush()
+            next_flush += FLUSH
+        room, sid, user = f"circle_{r}", f"sid_{r}_{m}", f"user_{r}_{m}"
+        if join and (r, m) not in online:
+            online.add((r, m))
+            await presence.join(sid, user, room)
+        elif not join and (r, m) in online:
+            online.discard((r, m))
+            await presence.drop(sid)
+        else:
+            continue
+        changes += 1
+        await roster_push(room)
+    await presence.flush()
+    await presence.close()
+
+    for r in range(rooms):
+        assert await presence.count(f"circle_{r}") == sum(1 for rr, _ in online if rr == r)
+    print(f"{rooms:4} circles x {room_size:3} members, {changes:,} joins/leaves:")
+    print(f"  full roster per change:  {stats['naive_packets']:>9,} packets  {stats['naive_bytes'] / 1e6:8.1f} MB  "
+          f"avg payload {stats['naive_bytes'] / max(1, stats['naive_packets']):6.0f} B")
+    print(f"  diffs every {FLUSH * 1000:.0f} ms:      {stats['diff_packets']:>9,} packets  "
+          f"{stats['diff_bytes'] / 1e6:8.1f} MB  avg payload {stats['diff_bytes'] / max(1, stats['diff_packets']):6.0f} B"
+          f"  ({stats['diffs']:,} diffs, peak pending {peak_pending} entries)")
+
+
+async def main():
+    for size in (20, 100, 500):
+        await run(size)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Authenticated request throughput with and without the principal cache
+
+Serves one trivial endpoint behind the current get_current_user dependency
+(cached Principal) and behind the previous one (verify the JWT, then hydrate
+the full User row on every request), and drives each with 20 concurrent
+clients sharing 50 users' tokens. Run from the backend directory:
+
+    python benchmarks/bench_principal_cache.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp(prefix="eggjam-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import Base, engine, get_db
+from models.db_models import User, UserRole
+from services.auth_service import AuthService, get_current_user, oauth2_scheme
+from services.principal_cache import principal_cache
+
+USERS = 50
+CONCURRENCY = 20
+REQUESTS = 5_000
+
+
+async def legacy_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """The previous dependency: verify, then load the whole User"""
+    payload = AuthService.verify_token(token)
+    if payload is None or payload.get("sub") is None:
+        raise HTTPException(status_code=401)
+    user = await db.get(User, payload["sub"])
+    if user is None:
+        raise HTTPException(status_code=401)
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return user
+
+
+app = FastAPI()
+
+
+@app.get("/cached")
+async def cached(current_user=Depends(get_current_user)):
+    return {"id": current_user.id, "role": current_user.role}
+
+
+@app.get("/legacy")
+async def legacy(current_user=Depends(legacy_current_user)):
+    return {"id": current_user.id, "role": current_user.role}
+
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": str(u), "email": f"bench{u}@demo.com", "full_name": f"Bench User {u}",
+             "role": UserRole.STUDENT, "interests": ["music", "art"], "goals": ["sleep more"]}
+            for u in range(USERS)
+        ])
+    return [AuthService.create_access_token({"sub": str(u)}) for u in range(USERS)]
+
+
+async def drive(client: httpx.AsyncClient, path: str, tokens) -> float:
+    counter = iter(range(REQUESTS))
+
+    async def worker():
+        for i in counter:
+            r = await client.get(path, headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"})
+            assert r.status_code == 200, r.text
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(CONCURRENCY)])
+    return REQUESTS / (time.perf_counter() - started)
+
+
+async def main():
+    tokens = seed()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await drive(client, "/legacy", tokens)  # warm up pool and imports
+        legacy_rps = await drive(client, "/legacy", tokens)
+        principal_cache.clear()
+        cached_rps = await drive(client, "/cached", tokens)
+
+    print(f"{REQUESTS:,} authenticated requests, {CONCURRENCY} concurrent, {USERS} tokens")
+    print(f"verify + full User load:  {legacy_rps:8,.0f} req/s")
+    print(f"principal cache:          {cached_rps:8,.0f} req/s  ({cached_rps / legacy_rps:.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Cost of a rate-limit check
+
+Times the sliding-window check of the in-memory backend alone, the whole
+RateLimitMiddleware around a no-op ASGI app (token -> cached principal ->
+user and school counters) and the Redis backend against the in-process
+fakeredis stand-in (a real Redis adds one network round trip). Also checks
+that a 100/window limit admits exactly 100 requests on both backends and
+that the previous window still counts, weighted, halfway into the next.
+Run from the backend directory:
+
+    python benchmarks/bench_rate_limiter.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp(prefix="eggjam-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Base, engine
+from models.db_models import UserRole
+from services.platform_config_cache import platform_config
+from services.principal_cache import Principal, principal_cache
+from services.rate_limiter import MemoryRateLimitBackend, RateLimitMiddleware, RedisRateLimitBackend
+
+CHECKS = 100_000
+USERS = 1_000
+WINDOW = 60.0
+
+
+def per_check_us(total_s: float, n: int) -> float:
+    return total_s / n * 1e6
+
+
+async def time_memory_backend():
+    backend = MemoryRateLimitBackend()
+    keys = [[(f"user:{u}", 10**9), (f"school:{u % 20}", 10**9)] for u in range(USERS)]
+    runs = []
+    for _ in range(5):
+        started = time.perf_counter()
+        for i in range(CHECKS):
+            await backend.hit(keys[i % USERS], WINDOW)
+        runs.append(per_check_us(time.perf_counter() - started, CHECKS))
+    return statistics.median(runs)
+
+
+async def time_middleware():
+    async def app(scope, receive, send):
+        pass
+
+    tokens = []
+    for u in range(USERS):
+        token = f"header.payload.sig{u}"
+        principal_cache.put(token, Principal(id=str(u), role=UserRole.STUDENT, school_id=u % 20, is_active=True))
+        tokens.append(token)
+    scopes = [
+        {"type": "http", "method": "GET", "path": "/api/challenges/daily", "client": ("10.0.0.1", 1234),
+         "headers": [(b"host", b"api"), (b"authorization", f"Bearer {t}".encode())]}
+        for t in tokens
+    ]
+    # Limits high enough that nothing is rejected
+    await platform_config.seed({"api_rate_limits": {
+        "value": {"global_limit": 10**9, "student_limit": 10**9, "school_limit": 10**9},
+        "category": "api", "description": "bench"
+    }})
+    middleware = RateLimitMiddleware(app, backend=MemoryRateLimitBackend())
+    await middleware(scopes[0], None, None)
+
+    bare, wrapped = [], []
+    for _ in range(5):
+        started = time.perf_counter()
+        for i in range(CHECKS):
+            await app(scopes[i % USERS], None, None)
+        bare.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        for i in range(CHECKS):
+            await middleware(scopes[i % USERS], None, None)
+        wrapped.append(time.perf_counter() - started)
+    return per_check_us(statistics.median(wrapped) - statistics.median(bare), CHECKS)
+
+
+async def time_redis_backend():
+    backend = RedisRateLimitBackend(url="fakeredis://bench-timing")
+    n = 5_000
+    started = time.perf_counter()
+    for i in range(n):
+        await backend.hit([(f"user:{i % USERS}", 10**9), (f"school:{i % 20}", 10**9)], WINDOW)
+    return per_check_us(time.perf_counter() - started, n)
+
+
+async def admitted(backend, n: int, limit: int = 100) -> int:
+    return sum([not await backend.hit([("user:x", limit)], WINDOW) for _ in range(n)])
+
+
+async def check_limits():
+    memory = MemoryRateLimitBackend()
+    redis = RedisRateLimitBackend(url="fakeredis://bench-limits")
+    results = {"memory": await admitted(memory, 150), "redis (fakeredis)": await admitted(redis, 150)}
+
+    # 100 hits at the end of one window, then halfway into the next: half
+    # of the previous window still overlaps, so only ~50 more fit
+    sliding = MemoryRateLimitBackend()
+    start = (int(time.time() / WINDOW) + 10) * WINDOW
+    first = sum(not sliding.hit_now([("user:y", 100)], WINDOW, start - 0.001) for _ in range(150))
+    second = sum(not sliding.hit_now([("user:y", 100)], WINDOW, start + WINDOW / 2) for _ in range(150))
+    return results, first, second
+
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+    memory_us = await time_memory_backend()
+    middleware_us = await time_middleware()
+    redis_us = await time_redis_backend()
+    limits, first, second = await check_limits()
+
+    print(f"{CHECKS:,} checks over {USERS:,} users, two counters each (user + school)")
+    print(f"memory backend:             {memory_us:6.2f} us per check")
+    print(f"middleware overhead:        {middleware_us:6.2f} us per request")
+    print(f"redis backend (fakeredis):  {redis_us:6.1f} us per check, plus the network round trip")
+    for name, n in limits.items():
+        print(f"limit 100, 150 requests, {name}: {n} admitted")
+    print(f"sliding window: {first} admitted at the end of a window, {second} halfway through the next")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Per-message cost of baseline deviation as history grows
+
+Feeds 100k messages for a single user through MentalHealthMonitor's
+rolling statistics + z-score deviation and reports the cost per message
+in successive blocks, next to the previous approach (unbounded list,
+7-day filter and np.mean on every message, capped at 10k messages since
+it is quadratic). Run from the backend directory:
+
+    python benchmarks/bench_rolling_baseline.py
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from models.advanced_features import MentalHealthBaseline
+from services.advanced_ai_services import MentalHealthMonitor
+
+MESSAGES = 100_000
+LEGACY_MESSAGES = 10_000
+BLOCK = 10_000
+USER_ID = "bench-user"
+
+
+def make_monitor() -> MentalHealthMonitor:
+    monitor = MentalHealthMonitor()
+    monitor.baselines[USER_ID] = MentalHealthBaseline(
+        user_id=USER_ID,
+        baseline_mood=6.5,
+        typical_vocab=[],
+        typical_typing_speed_wpm=38.0,
+        typical_session_frequency=2.0,
+        typical_message_length=60,
+        established_at=datetime.now()
+    )
+    return monitor
+
+
+def rolling_step(monitor: MentalHealthMonitor, sentiment: float, wpm: float, now: float):
+    monitor.signals[USER_ID].observe(sentiment, wpm, now)
+    return monitor._calculate_deviation(USER_ID)
+
+
+def legacy_step(history: list, baseline_mood: float, sentiment: float, now: datetime):
+    recent = [m for m in history if m['timestamp'] > now - timedelta(days=7)]
+    deviation = max(baseline_mood - np.mean([m['sentiment'] for m in recent]), 0) if recent else 0
+    history.append({'timestamp': now, 'sentiment': sentiment, 'risk_score': 0.0})
+    return deviation
+
+
+def main():
+    rng = random.Random(3)
+    inputs = [(rng.betavariate(5, 3), rng.gauss(38, 6)) for _ in range(MESSAGES)]
+    start = time.time()
+
+    monitor = make_monitor()
+    rolling = []
+    for block_start in range(0, MESSAGES, BLOCK):
+        started = time.perf_counter()
+        for i in range(block_start, block_start + BLOCK):
+            sentiment, wpm = inputs[i]
+            # Messages a few seconds apart with a long break every 50
+            now = start + i * 5 + (i // 50) * 4 * 3600
+            rolling_step(monitor, sentiment, wpm, now)
+        rolling.append((time.perf_counter() - started) / BLOCK * 1e6)
+
+    history = []
+    legacy = []
+    base = datetime.now()
+    for block_start in range(0, LEGACY_MESSAGES, BLOCK // 5):
+        started = time.perf_counter()
+        for i in range(block_start, block_start + BLOCK // 5):
+            legacy_step(history, 0.65, inputs[i][0], base + timedelta(seconds=i * 5))
+        legacy.append((block_start + BLOCK // 5, (time.perf_counter() - started) / (BLOCK // 5) * 1e6))
+
+    print("Rolling statistics (ring buffer + EWMA):")
+    for n, us in enumerate(rolling, start=1):
+        print(f"  messages {(n - 1) * BLOCK:>7,}-{n * BLOCK:>7,}: {us:7.2f} us/msg")
+    signals = monitor.signals[USER_ID]
+    print(f"  deviation after {MESSAGES:,}: {monitor._calculate_deviation(USER_ID):.2f} "
+          f"(mood ewma {signals.mood.ewma_mean:.3f}, window {signals.mood.window} values)")
+    print()
+    print("Previous list + 7-day filter + np.mean:")
+    for upto, us in legacy:
+        print(f"  up to {upto:>7,} messages: {us:9.2f} us/msg")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the local sentiment scorer
+
+Scores a synthetic corpus of student messages one at a time (the request
+path) and reports messages per second plus the share of messages that
+would be escalated to the LLM. Run from the backend directory:
+
+    python benchmarks/bench_sentiment.py
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.sentiment import SentimentScorer
+
+MESSAGES = 50_000
+ROUNDS = 3
+
+OPENERS = [
+    "Honestly", "Today", "I think", "Lately", "Ugh", "So", "Right now", "This week", "", ""
+]
+FEELINGS = [
+    "I feel hopeless and nobody cares about me",
+    "I'm so happy because I passed my maths test",
+    "I am not happy with how things are going",
+    "I'm okay I guess",
+    "exams are stressing me out and I can't sleep",
+    "my friends and I had a fun day at school",
+    "I feel happy but also kind of sad",
+    "what is the homework for tomorrow",
+    "I'm really proud of my science project",
+    "everything is too much and I want to give up",
+    "not bad, could be better",
+    "I'm worried about the results but hopeful",
+]
+ENDINGS = ["", ".", "!", " to be honest.", " and I don't know what to do.", " lol"]
+
+
+def build_corpus(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [
+        f"{rng.choice(OPENERS)} {rng.choice(FEELINGS)}{rng.choice(ENDINGS)}".strip()
+        for _ in range(n)
+    ]
+
+
+def main():
+    corpus = build_corpus(MESSAGES)
+    scorer = SentimentScorer()
+
+    started = time.perf_counter()
+    scorer.load()
+    load_ms = (time.perf_counter() - started) * 1000
+
+    single_rates = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        results = [scorer.score(text) for text in corpus]
+        single_rates.append(MESSAGES / (time.perf_counter() - started))
+
+    escalated = sum(1 for r in results if scorer.is_uncertain(r))
+
+    print(f"Lexicon load:           {load_ms:.1f} ms")
+    print(f"Per-message scoring:    {statistics.median(single_rates):,.0f} msg/s "
+          f"({1e6 / statistics.median(single_rates):.1f} us/msg)")
+    print(f"Escalated to LLM:       {escalated / MESSAGES:.1%} of messages")
+
+
+if __name__ == "__main__":
+    main()
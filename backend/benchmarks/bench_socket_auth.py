@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Socket.IO authentication: once per connection vs. on every event
+
+Seeds 500 students and connects 5,000 simulated sockets (10 per student),
+each with its student's JWT, through SocketManager.connect. Then compares
+authorizing 20,000 events from the Socket.IO session (what the handlers
+do) with a plain per-event check (decode the JWT and look the user up),
+and finally expires the tokens of 2,000 sockets and times one bulk sweep.
+Engine.IO sockets and packet writes are stubbed in-process, so the numbers
+are the server-side cost only. Run from the backend directory:
+
+    python benchmarks/bench_socket_auth.py
+"""
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+_tmp_dir = tempfile.mkdtemp(prefix="eggjam-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import socketio
+from jose import jwt
+from sqlalchemy import select
+
+from database import AsyncSessionLocal, Base, SessionLocal, engine
+from models.db_models import User, UserRole
+from services.auth_service import ALGORITHM, SECRET_KEY, AuthService
+from services.jwks import verified_tokens
+from services.principal_cache import principal_cache
+from socket_manager import sio, socket_manager
+
+STUDENTS = 500
+TABS = 10
+EVENTS = 20_000
+PER_EVENT_SAMPLE = 2_000
+EXPIRING = 2_000
+
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.add_all([
+            User(id=f"student_{i}", email=f"s{i}@example.com", role=UserRole.STUDENT, school_id=None, is_active=True)
+            for i in range(STUDENTS)
+        ])
+        db.commit()
+
+
+async def drop_packet(*args):
+    pass
+
+
+async def open_socket(n: int, token: str) -> str:
+    eio_sid = f"eio_{n}"
+    sio.eio.sockets[eio_sid] = SimpleNamespace(session={}, closed=False, send=drop_packet)
+    sid = sio.manager.connect(eio_sid, "/")
+    if asyncio.iscoroutine(sid):
+        sid = await sid
+    await socket_manager.connect(sid, {}, {"token": token})
+    return sid
+
+
+async def per_event_check(token: str):
+    """A plain per-event check: verify the JWT, then load the user"""
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(select(User.id, User.role, User.is_active).where(User.id == payload["sub"]))).first()
+    assert row is not None and row.is_active
+
+
+async def main():
+    seed()
+    sio.logger.setLevel(logging.WARNING)
+    sio._send_eio_packet = drop_packet
+
+    for n, bad in enumerate((None, "not-a-jwt", AuthService.create_access_token({"sub": "nobody"}))):
+        try:
+            await open_socket(-1 - n, bad)
+        except socketio.exceptions.ConnectionRefusedError:
+            continue
+        raise AssertionError(f"connect with token {bad!r} was accepted")
+    print("connects without a valid token: refused")
+
+    tokens = [AuthService.create_access_token({"sub": f"student_{i}"}) for i in range(STUDENTS)]
+
+    connect_ms = []
+    sids = []
+    for n in range(STUDENTS * TABS):
+        started = time.perf_counter()
+        sids.append(await open_socket(n, tokens[n % STUDENTS]))
+        connect_ms.append((time.perf_counter() - started) * 1000)
+    first, repeat = connect_ms[:STUDENTS], connect_ms[STUDENTS:]
+    print(f"connected {len(socket_manager.active_connections):,} sockets for {len(socket_manager.user_sockets)} students")
+    print(f"  connect auth, first token use:  p50 {statistics.median(first):6.3f} ms  (verify + users lookup)")
+    print(f"  connect auth, cached principal: p50 {statistics.median(repeat):6.3f} ms")
+
+    started = time.perf_counter()
+    for i in range(EVENTS):
+        assert await socket_manager.principal(sids[i % len(sids)]) is not None
+    session_us = (time.perf_counter() - started) / EVENTS * 1e6
+
+    started = time.perf_counter()
+    for i in range(PER_EVENT_SAMPLE):
+        await per_event_check(tokens[i % STUDENTS])
+    plain_us = (time.perf_counter() - started) / PER_EVENT_SAMPLE * 1e6
+    print(f"per-event authorization from the session: {session_us:8.1f} us/event")
+    print(f"per-event JWT decode + users lookup:      {plain_us:8.1f} us/event  "
+          f"({plain_us / session_us:.0f}x, ~{plain_us * EVENTS / 1e6:.1f} s for {EVENTS:,} events)")
+
+    # Re-authenticate some sockets with short-lived tokens, then sweep once they lapse
+    principal_cache.clear()
+    verified_tokens.clear()
+    short = [AuthService.create_access_token({"sub": f"student_{i % STUDENTS}"}, timedelta(seconds=30))
+             for i in range(EXPIRING)]
+    for sid, token in zip(sids, short):
+        assert await socket_manager.authorize(sid, token) is not None
+    started = time.perf_counter()
+    swept = await socket_manager.sweep_expired(now=time.time() + 60)
+    sweep_ms = (time.perf_counter() - started) * 1000
+    remaining = len(socket_manager.active_connections)
+    print(f"expiry sweep: disconnected {swept:,} sockets in {sweep_ms:.0f} ms, "
+          f"{remaining:,} still connected (expected {len(sids) - EXPIRING:,})")
+    assert swept == EXPIRING and remaining == len(sids) - EXPIRING
+    await socket_manager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Targeted pushes (broadcast_to_user) against 50k open sockets
+
+Registers 50,000 simulated connections with the Socket.IO server (40,000
+students, 10,000 of them with a second tab open) and sends 10,000 pushes
+to random students, once with the old scan over every connection and once
+through the user index and per-user rooms. Packets are counted rather
+than written to a transport, so the numbers are the server-side cost of
+finding the recipients. The scan is timed on a sample and scaled up, since
+the full run takes minutes. Run from the backend directory:
+
+    python benchmarks/bench_socket_fanout.py
+"""
+import asyncio
+import inspect
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp(prefix="eggjam-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from socket_manager import sio, socket_manager
+
+STUDENTS = 40_000
+SECOND_TABS = 10_000
+PUSHES = 10_000
+SCAN_SAMPLE = 200
+
+
+async def legacy_broadcast_to_user(user_id, event, data):
+    """broadcast_to_user as it was: scan every connection"""
+    for sid, uid in socket_manager.active_connections.items():
+        if uid == user_id:
+            await sio.emit(event, data, room=sid)
+
+
+async def main():
+    sent = 0
+
+    async def count_packet(eio_sid, pkt):
+        nonlocal sent
+        sent += 1
+
+    sio._send_eio_packet = count_packet
+    sio.logger.setLevel(logging.WARNING)  # the server logs every emit and room entry
+
+    started = time.perf_counter()
+    for i in range(STUDENTS + SECOND_TABS):
+        sid = sio.manager.connect(f"eio_{i}", "/")
+        if inspect.isawaitable(sid):
+            sid = await sid
+        await socket_manager.register_user(sid, f"student_{i % STUDENTS}")
+    print(f"registered {len(socket_manager.active_connections):,} sockets for "
+          f"{len(socket_manager.user_sockets):,} students in {time.perf_counter() - started:.1f} s")
+
+    rng = random.Random(7)
+    targets = [f"student_{rng.randrange(STUDENTS)}" for _ in range(PUSHES)]
+    expected = sum(len(socket_manager.user_sockets[t]) for t in targets)
+    payload = {"message": "You have a new challenge"}
+
+    sent = 0
+    started = time.perf_counter()
+    for user_id in targets[:SCAN_SAMPLE]:
+        await legacy_broadcast_to_user(user_id, "notification", payload)
+    scan_each = (time.perf_counter() - started) / SCAN_SAMPLE
+    scan_sent = sent
+
+    sent = 0
+    started = time.perf_counter()
+    for user_id in targets:
+        await socket_manager.broadcast_to_user(user_id, "notification", payload)
+    room_total = time.perf_counter() - started
+    assert sent == expected, (sent, expected)
+
+    print(f"scan over every connection:  {scan_each * 1e6:9.0f} us/push  "
+          f"(~{scan_each * PUSHES:.1f} s for {PUSHES:,}, from {SCAN_SAMPLE} pushes / {scan_sent} packets)")
+    print(f"user index + per-user room:  {room_total / PUSHES * 1e6:9.0f} us/push  "
+          f"({room_total:.2f} s for {PUSHES:,}, {sent:,} packets)")
+    print(f"speedup: {scan_each * PUSHES / room_total:.0f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for per-user event histories
+
+Loads 10k users x 1k mood events into TimeSeriesStore and measures the
+allocated memory, then does the same for the previous dict-of-lists layout
+(one dict with a datetime per event) on a sample of users and extrapolates.
+Also times a 30-day range query, and checks that expired events are
+never returned, a steadily active user's array stays bounded and idle
+users are evicted; exits non-zero if not. Run from the backend directory:
+
+    python benchmarks/bench_timeseries_memory.py
+"""
+import gc
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.timeseries_store import TimeSeriesStore
+
+USERS = 10_000
+EVENTS_PER_USER = 1_000
+LEGACY_SAMPLE_USERS = 500
+SPACING_SECONDS = 3600  # one event per hour, ~42 days of history
+
+
+def event_times():
+    now = time.time()
+    return [now - (EVENTS_PER_USER - i) * SPACING_SECONDS for i in range(EVENTS_PER_USER)]
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    store = build()
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return store, current, elapsed
+
+
+def build_store(times, values):
+    store = TimeSeriesStore(("sentiment", "risk_score"), retention_seconds=90 * 86400)
+    for user in range(USERS):
+        user_id = f"user-{user}"
+        for ts, (sentiment, risk) in zip(times, values):
+            store.append(user_id, ts, sentiment=sentiment, risk_score=risk)
+    return store
+
+
+def build_legacy(times, values):
+    history = defaultdict(list)
+    for user in range(LEGACY_SAMPLE_USERS):
+        user_id = f"user-{user}"
+        for ts, (sentiment, risk) in zip(times, values):
+            history[user_id].append({
+                'timestamp': datetime.fromtimestamp(ts),
+                'sentiment': sentiment,
+                'risk_score': risk
+            })
+    return history
+
+
+def check_retention() -> int:
+    """Retention and idle eviction problems found (0 = all good)"""
+    day = 86400
+    store = TimeSeriesStore(("sentiment",), retention_seconds=7 * day, chunk_size=16)
+    now = time.time()
+    problems = 0
+
+    # Active user: one event an hour for 30 days against a 7-day window
+    for i in range(30 * 24):
+        store.append("active", now - (30 * 24 - i) * 3600, sentiment=0.5)
+    oldest = float(store.query("active")["ts"][0])
+    capacity = len(store._series["active"])
+    if oldest < now - 7 * day or capacity > 7 * 24 + 2 * store.chunk_size:
+        print(f"  active user: oldest event {(now - oldest) / day:.1f} days old, {capacity} rows held")
+        problems += 1
+
+    # Idle users: last seen 8-10 days ago, nothing to return and evicted on sweep
+    for user in range(100):
+        store.append(f"idle-{user}", now - (8 + user % 3) * day, sentiment=0.5)
+    if any(f"idle-{user}" in store for user in range(100)) or store.count("idle-0"):
+        print("  idle users still report expired events")
+        problems += 1
+    evicted = store.evict_idle()
+    if evicted != 100 or len(store) != 1:
+        print(f"  idle eviction dropped {evicted} of 100 users, {len(store)} left")
+        problems += 1
+
+    print(f"Retention and idle eviction: {'ok' if not problems else f'{problems} problem(s)'}")
+    return problems
+
+
+def main():
+    rng = random.Random(11)
+    times = event_times()
+    values = [(rng.random(), rng.random()) for _ in range(EVENTS_PER_USER)]
+    total_events = USERS * EVENTS_PER_USER
+
+    store, store_bytes, store_seconds = measure(lambda: build_store(times, values))
+    legacy, legacy_bytes, _ = measure(lambda: build_legacy(times, values))
+    legacy_per_event = legacy_bytes / (LEGACY_SAMPLE_USERS * EVENTS_PER_USER)
+
+    cutoff = time.time() - 30 * 86400
+    query_us = []
+    for user in range(0, USERS, USERS // 200):
+        started = time.perf_counter()
+        store.query(f"user-{user}", start=cutoff)
+        query_us.append((time.perf_counter() - started) * 1e6)
+
+    print(f"{USERS:,} users x {EVENTS_PER_USER:,} events = {total_events:,} events")
+    print(f"TimeSeriesStore:  {store_bytes / 2**20:8.1f} MiB  ({store_bytes / total_events:5.1f} B/event, "
+          f"{store.dtype.itemsize} B/row, append {store_seconds / total_events * 1e6:.2f} us under tracemalloc)")
+    print(f"dict-of-lists:    {legacy_per_event * total_events / 2**20:8.1f} MiB  ({legacy_per_event:5.1f} B/event, "
+          f"extrapolated from {LEGACY_SAMPLE_USERS} users)")
+    print(f"Reduction:        {legacy_per_event * total_events / store_bytes:.1f}x")
+    print(f"30-day range query: median {statistics.median(query_us):.1f} us")
+
+    print()
+    if check_retention():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
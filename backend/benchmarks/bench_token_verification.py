@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Token verification cost: RS256 via JWKS, HS256, and the verified-token cache
+
+Signs Clerk-style RS256 tokens with a throwaway RSA key served from a
+stubbed JWKS loader (no network), then times AuthService.verify_token on
+first sight (signature check) and on repeat (cache hit), alongside our own
+HS256 tokens. Also checks that a token signed by an unknown key, a tampered
+token and an expired token are all rejected. Run from the backend directory:
+
+    python benchmarks/bench_token_verification.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+from services import auth_service
+from services.auth_service import AuthService
+from services.jwks import JWKSCache, verified_tokens
+
+TOKENS = 500
+
+
+def rsa_key(kid: str):
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public = jwk.construct(private.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ), algorithm="RS256").to_dict()
+    public.update({"kid": kid, "use": "sig"})
+    return pem, public
+
+
+def clerk_token(pem: bytes, kid: str, sub: str, exp_in: int = 3600) -> str:
+    now = int(time.time())
+    return jwt.encode(
+        {"sub": sub, "iat": now, "exp": now + exp_in, "azp": "http://localhost:5173"},
+        pem, algorithm="RS256", headers={"kid": kid}
+    )
+
+
+async def time_each(tokens):
+    timings = []
+    for token in tokens:
+        started = time.perf_counter()
+        payload = await AuthService.verify_token(token)
+        timings.append((time.perf_counter() - started) * 1e6)
+        assert payload is not None
+    return statistics.median(timings)
+
+
+async def main():
+    pem, public = rsa_key("bench-key")
+    other_pem, _ = rsa_key("rogue-key")
+    fetches = 0
+
+    async def loader():
+        nonlocal fetches
+        fetches += 1
+        return {"keys": [public]}
+
+    # Point verify_token at the stubbed key set
+    auth_service.jwks_cache = JWKSCache(source="stub", loader=loader)
+
+    rs_tokens = [clerk_token(pem, "bench-key", f"user_{i}") for i in range(TOKENS)]
+    hs_tokens = [AuthService.create_access_token({"sub": str(i)}) for i in range(TOKENS)]
+
+    verified_tokens.clear()
+    rs_first = await time_each(rs_tokens)
+    rs_repeat = await time_each(rs_tokens)
+    verified_tokens.clear()
+    hs_first = await time_each(hs_tokens)
+    hs_repeat = await time_each(hs_tokens)
+
+    header, body, signature = rs_tokens[0].split(".")
+    tampered = ".".join([header, body[:-4] + ("AAAA" if body[-4:] != "AAAA" else "BBBB"), signature])
+    rejected = {
+        "unknown key": await AuthService.verify_token(clerk_token(other_pem, "rogue-key", "user_x")),
+        "wrong key, known kid": await AuthService.verify_token(clerk_token(other_pem, "bench-key", "user_x")),
+        "tampered": await AuthService.verify_token(tampered),
+        "expired": await AuthService.verify_token(clerk_token(pem, "bench-key", "user_x", exp_in=-60)),
+    }
+
+    print(f"{TOKENS:,} tokens each, median per verification")
+    print(f"RS256 via JWKS, first sight: {rs_first:8.1f} us")
+    print(f"RS256, repeat (cached):      {rs_repeat:8.1f} us  ({rs_first / rs_repeat:,.0f}x)")
+    print(f"HS256, first sight:          {hs_first:8.1f} us")
+    print(f"HS256, repeat (cached):      {hs_repeat:8.1f} us")
+    print(f"JWKS fetches: {fetches}")
+    for label, payload in rejected.items():
+        print(f"{label:<22} {'rejected' if payload is None else 'ACCEPTED'}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Typing indicators: relaying every keystroke vs. the debounced relay
+
+1,000 students type in 100 peer circles (10 typists and 10 readers per
+circle, 2,000 sockets) for 60 simulated seconds: bursts of 2-8 s at about
+5 keystrokes/s, pauses of 1-6 s, an explicit typing_stop at the end of
+each burst and some short bursts of 1-2 keystrokes. Counts the packets a
+naive relay sends (every keystroke and stop to the rest of the room) and
+the packets TypingRelay actually sends through Socket.IO (rooms, sender
+skipped), with its timer wheel driven by a simulated clock at 100 ms
+ticks. Also checks that no (user, room) got two starts or two stops
+inside one window. Run from the backend directory:
+
+    python benchmarks/bench_typing_relay.py
+"""
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp(prefix="eggjam-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.typing_relay import TypingRelay
+from socket_manager import sio, socket_manager
+
+CIRCLES = 100
+TYPISTS = 10
+READERS = 10
+SECONDS = 60.0
+TICK = 0.1
+NAIVE_SAMPLE = 5_000
+
+
+def keystrokes(rng: random.Random):
+    """(time, kind, typist, circle) events, kind 'start' (keystroke) or 'stop'"""
+    events = []
+    for circle in range(CIRCLES):
+        for t in range(TYPISTS):
+            user = f"c{circle}_typist{t}"
+            now = rng.uniform(0, 3)
+            while now < SECONDS:
+                burst = rng.choice([rng.uniform(2, 8)] * 4 + [rng.uniform(0.05, 0.4)])
+                end = min(now + burst, SECONDS)
+                while now < end:
+                    events.append((now, "start", user, circle))
+                    now += rng.expovariate(5.0)
+                events.append((now, "stop", user, circle))
+                now += rng.uniform(1, 6)
+    events.sort()
+    return events
+
+
+async def main():
+    sio.logger.setLevel(logging.WARNING)
+    sent = 0
+
+    async def count_packet(eio_sid, pkt):
+        nonlocal sent
+        sent += 1
+
+    sio._send_eio_packet = count_packet
+
+    sid_of = {}
+    n = 0
+    for circle in range(CIRCLES):
+        for user in [f"c{circle}_typist{t}" for t in range(TYPISTS)] + [f"c{circle}_reader{r}" for r in range(READERS)]:
+            sid = sio.manager.connect(f"eio_{n}", "/")
+            if asyncio.iscoroutine(sid):
+                sid = await sid
+            n += 1
+            await socket_manager.register_user(sid, user)
+            await sio.enter_room(sid, f"circle_{circle}")
+            sid_of[user] = sid
+
+    events = keystrokes(random.Random(11))
+    strokes = sum(1 for e in events if e[1] == "start")
+    stops = len(events) - strokes
+    members = TYPISTS + READERS
+
+    # Naive: every keystroke and stop goes to the rest of the room
+    naive_packets = (strokes + stops) * (members - 1)
+    sent = 0
+    started = time.perf_counter()
+    for at, kind, user, circle in events[:NAIVE_SAMPLE]:
+        event = "user_typing" if kind == "start" else "user_typing_stop"
+        await sio.emit(event, {"user_id": user}, room=f"circle_{circle}", skip_sid=sid_of[user])
+    naive_cpu = (time.perf_counter() - started) / NAIVE_SAMPLE * len(events)
+
+    # Debounced relay on a simulated clock
+    clock = [0.0]
+    log = []
+    relay = TypingRelay(tick=TICK, clock=lambda: clock[0])
+    emit = relay._emit
+
+    async def logged_emit(event, payload, room, user_id, sid):
+        log.append((clock[0], event, user_id, room))
+        await emit(event, payload, room, user_id, sid)
+
+    relay._emit = logged_emit
+    relay._ensure_running = lambda: None  # ticks are driven below
+
+    sent = 0
+    started = time.perf_counter()
+    next_tick = TICK
+    for at, kind, user, circle in events:
+        while next_tick <= at:
+            clock[0] = next_tick
+            await relay.expire(next_tick)
+            next_tick += TICK
+        clock[0] = at
+        if kind == "start":
+            await relay.start(user, sid_of[user], f"circle_{circle}", user)
+        else:
+            await relay.stop(user, f"circle_{circle}")
+    while relay._typing:
+        clock[0] = next_tick
+        await relay.expire(next_tick)
+        next_tick += TICK
+    relay_cpu = time.perf_counter() - started
+    relay_packets = sent
+
+    last = {}
+    violations = 0
+    for at, event, user, room in log:
+        previous = last.get((event, user, room))
+        if previous is not None and at - previous < relay.window - 1e-9:
+            violations += 1
+        last[(event, user, room)] = at
+    starts = sum(1 for e in log if e[1] == "user_typing")
+    assert starts == len(log) - starts, "every start must get its stop"
+
+    print(f"{CIRCLES * TYPISTS:,} typists, {CIRCLES} circles x {members} members, {SECONDS:.0f} s: "
+          f"{strokes:,} keystrokes, {stops:,} explicit stops")
+    print(f"naive relay:      {naive_packets:>10,} packets  (~{naive_cpu:5.1f} s server CPU, "
+          f"timed on {NAIVE_SAMPLE:,} events)")
+    print(f"debounced relay:  {relay_packets:>10,} packets  ({relay_cpu:5.1f} s server CPU incl. wheel ticks)  "
+          f"{starts:,} start/stop pairs, {naive_packets / relay_packets:.0f}x fewer packets")
+    print(f"window violations (two starts or stops for one user+room within {relay.window:.1f} s): {violations}")
+    if violations:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
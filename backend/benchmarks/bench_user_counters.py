@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Write amplification of per-user counter updates
+
+Replays 6k events (logins and point awards) for 200 users, once with the
+previous pattern (load the User row, modify, commit per event) and once
+through UserCounterCoalescer flushed every simulated 5 s window, counting
+the UPDATE statements that reach the database and checking both end with
+the same totals. Run from the backend directory:
+
+    python benchmarks/bench_user_counters.py
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+_tmp_dir = tempfile.mkdtemp(prefix="eggjam-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, insert, select, update
+
+from database import AsyncSessionLocal, Base, async_engine, engine
+from models.db_models import User
+from services.user_counters import UserCounterCoalescer
+
+USERS = 200
+EVENTS = 6_000
+EVENTS_PER_WINDOW = 2_000  # ~400 events/s over a 5 s flush window
+
+updates = 0
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def count_updates(conn, cursor, statement, parameters, context, executemany):
+    global updates
+    if statement.lstrip().upper().startswith("UPDATE"):
+        updates += len(parameters) if executemany else 1
+
+
+def make_events():
+    rng = random.Random(5)
+    return [
+        (str(rng.randrange(USERS)), "login" if rng.random() < 0.3 else "points")
+        for _ in range(EVENTS)
+    ]
+
+
+async def reset():
+    async with async_engine.begin() as conn:
+        await conn.execute(update(User).values(total_points=0, last_login=None))
+
+
+async def run_legacy(events):
+    for user_id, kind in events:
+        async with AsyncSessionLocal() as db:
+            user = await db.get(User, user_id)
+            if kind == "login":
+                user.last_login = datetime.utcnow()
+            else:
+                user.total_points += 10
+            await db.commit()
+
+
+async def run_coalesced(events):
+    coalescer = UserCounterCoalescer(interval_seconds=3600)
+    for i, (user_id, kind) in enumerate(events, 1):
+        if kind == "login":
+            coalescer.set(user_id, "last_login", datetime.utcnow())
+        else:
+            coalescer.add(user_id, "total_points", 10)
+        if i % EVENTS_PER_WINDOW == 0:
+            await coalescer.flush()
+    await coalescer.close()
+
+
+async def totals():
+    async with AsyncSessionLocal() as db:
+        return dict((await db.execute(select(User.id, User.total_points))).all())
+
+
+async def measure(run, events):
+    global updates
+    await reset()
+    updates = 0
+    started = time.perf_counter()
+    await run(events)
+    return time.perf_counter() - started, updates, await totals()
+
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": str(u), "email": f"bench{u}@demo.com", "total_points": 0} for u in range(USERS)
+        ])
+
+    events = make_events()
+    legacy_s, legacy_updates, legacy_totals = await measure(run_legacy, events)
+    coalesced_s, coalesced_updates, coalesced_totals = await measure(run_coalesced, events)
+    await async_engine.dispose()
+
+    print(f"{EVENTS:,} events, {USERS} users, flush every {EVENTS_PER_WINDOW:,} events")
+    print(f"read-modify-write per event: {legacy_updates:7,} UPDATEs  {legacy_s:6.2f}s")
+    print(f"coalesced:                   {coalesced_updates:7,} UPDATEs  {coalesced_s:6.2f}s  "
+          f"({legacy_updates / coalesced_updates:.0f}x fewer writes)")
+    print(f"totals match: {legacy_totals == coalesced_totals}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
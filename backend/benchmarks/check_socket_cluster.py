@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Circle messages across two uvicorn workers sharing a Redis client manager
+
+Starts a fakeredis TCP server and two `uvicorn main:app` processes
+(SOCKETIO_MANAGER=redis, both pointed at it), adds a student to a circle,
+connects one Socket.IO client to each worker with the student's JWT and
+joins both to the circle, then posts a message to the circle through
+worker A's REST endpoint. Both clients must
+receive it, including the one on worker B. Repeats a few times and reports
+delivery latency. Then a second student, connected only to worker B, sends a
+crisis message to worker A's /chat; the personalized follow-up (from a stub
+model) is pushed with broadcast_to_user and must reach them on worker B.
+Exits non-zero if any delivery is missed. Run from the backend directory:
+
+    python benchmarks/check_socket_cluster.py
+"""
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+import websockets
+from fakeredis import TcpFakeServer
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TMP_DIR = tempfile.mkdtemp(prefix="eggjam-cluster-")
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP_DIR}/cluster.db"
+sys.path.insert(0, BACKEND_DIR)
+
+from database import Base, SessionLocal, engine
+from models.db_models import User, UserRole
+from services.auth_service import AuthService
+from stub_llm import start_stub_process, stub_env
+
+CIRCLE_ID = "1"
+ROUNDS = 20
+TIMEOUT = 5.0
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_redis() -> int:
+    port = free_port()
+    server = TcpFakeServer(("127.0.0.1", port))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return port
+
+
+def seed_students() -> dict:
+    """Create the schema and two students; returns their access tokens"""
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.add(User(id="student_a", email="a@example.com", full_name="A", role=UserRole.STUDENT, is_active=True))
+        db.add(User(id="student_b", email="b@example.com", full_name="B", role=UserRole.STUDENT, is_active=True))
+        db.commit()
+    return {user_id: AuthService.create_access_token({"sub": user_id}) for user_id in ("student_a", "student_b")}
+
+
+def start_worker(port: int, redis_url: str, llm_port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        **stub_env(llm_port),
+        "AUDIT_SPILL_DIR": os.path.join(TMP_DIR, f"audit-{port}"),
+        "SOCKETIO_MANAGER": "redis",
+        "SOCKETIO_REDIS_URL": redis_url,
+        # Circle history shared too, as it would be in production
+        "STATE_BACKEND": "redis",
+        "REDIS_URL": redis_url,
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+async def wait_ready(base_url: str):
+    async with httpx.AsyncClient() as client:
+        for _ in range(100):
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"worker at {base_url} did not start")
+
+
+class CircleClient:
+    """Just enough of the Engine.IO v4 / Socket.IO v5 websocket protocol"""
+
+    def __init__(self, port: int, token: str):
+        self.url = f"ws://127.0.0.1:{port}/socket.io/?EIO=4&transport=websocket"
+        self.token = token
+        self.received: asyncio.Queue = asyncio.Queue()
+
+    async def connect(self):
+        self.ws = await websockets.connect(self.url)
+        assert (await self.ws.recv()).startswith("0")  # engine.io open
+        await self.ws.send("40" + json.dumps({"token": self.token}))
+        while True:
+            frame = await self.ws.recv()
+            if frame.startswith("40"):  # socket.io connect
+                break
+            assert frame.startswith("42"), frame  # e.g. 'status', sent from the connect handler
+        self._reader = asyncio.create_task(self._read())
+
+    async def emit(self, event: str, data):
+        await self.ws.send("42" + json.dumps([event, data]))
+
+    async def _read(self):
+        async for frame in self.ws:
+            if frame == "2":
+                await self.ws.send("3")  # ping / pong
+            elif frame.startswith("42"):
+                event, *args = json.loads(frame[2:])
+                await self.received.put((event, args[0] if args else None, time.perf_counter()))
+
+    async def close(self):
+        self._reader.cancel()
+        await self.ws.close()
+
+
+async def check_user_push(ports, token) -> float:
+    """Crisis follow-up for a student connected only to worker B, triggered on A; returns ms or -1"""
+    client = CircleClient(ports[1], token)
+    await client.connect()
+    await asyncio.sleep(0.2)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{ports[0]}") as http:
+            sent = time.perf_counter()
+            response = await http.post("/api/conversation/chat",
+                                       json={"user_id": "student_b", "message": "I want to die"})
+            response.raise_for_status()
+        while True:
+            event, data, at = await asyncio.wait_for(client.received.get(), TIMEOUT)
+            if event == "crisis_followup":
+                return (at - sent) * 1000
+    except asyncio.TimeoutError:
+        return -1
+    finally:
+        await client.close()
+
+
+async def run(ports, token):
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{ports[1]}") as http:
+        response = await http.post("/api/advanced/peer-circles/join",
+                                   json={"circle_id": CIRCLE_ID, "user_id": "student_a"})
+        response.raise_for_status()
+
+    clients = [CircleClient(port, token) for port in ports]
+    for client in clients:
+        await client.connect()
+        await client.emit("join_circle", {"circle_id": CIRCLE_ID})
+    await asyncio.sleep(0.5)  # room joins are fire-and-forget
+
+    latencies = {port: [] for port in ports}
+    missed = 0
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{ports[0]}") as http:
+        for i in range(ROUNDS):
+            content = f"hello #{i}"
+            sent = time.perf_counter()
+            response = await http.post(f"/api/advanced/peer-circles/{CIRCLE_ID}/message",
+                                       json={"user_id": "student_a", "username": "A", "content": content})
+            response.raise_for_status()
+            for port, client in zip(ports, clients):
+                try:
+                    while True:
+                        event, data, at = await asyncio.wait_for(client.received.get(), TIMEOUT)
+                        if event == "message" and data.get("content") == content:
+                            latencies[port].append((at - sent) * 1000)
+                            break
+                except asyncio.TimeoutError:
+                    missed += 1
+
+    for client in clients:
+        await client.close()
+    return latencies, missed
+
+
+def main():
+    tokens = seed_students()
+    redis_url = f"redis://127.0.0.1:{start_redis()}/0"
+    llm_port = free_port()
+    llm = start_stub_process(llm_port, first_token_delay=0.05, token_delay=0.0, tokens=20)
+    ports = [free_port(), free_port()]
+    workers = [start_worker(port, redis_url, llm_port) for port in ports]
+    try:
+        async def go():
+            await asyncio.gather(*(wait_ready(f"http://127.0.0.1:{port}") for port in ports))
+            return await run(ports, tokens["student_a"]), await check_user_push(ports, tokens["student_b"])
+
+        (latencies, missed), push_ms = asyncio.run(go())
+    finally:
+        for worker in workers:
+            worker.terminate()
+            worker.wait()
+        llm.terminate()
+
+    for label, port in zip(("worker A (posted to)", "worker B (other process)"), ports):
+        got = latencies[port]
+        line = f"{label:<26} received {len(got)}/{ROUNDS}"
+        if got:
+            line += f"  p50 {statistics.median(got):5.1f} ms  max {max(got):5.1f} ms  (from POST)"
+        print(line)
+    if push_ms >= 0:
+        print(f"{'user push A -> B':<26} crisis_followup in {push_ms:5.1f} ms  (from POST)")
+    else:
+        print(f"{'user push A -> B':<26} crisis_followup never arrived")
+        missed += 1
+    if missed:
+        print(f"MISSED {missed} deliveries")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
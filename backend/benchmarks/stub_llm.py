@@ -0,0 +1,97 @@
+"""
+Local stub of the OpenAI chat completions API for benchmarks
+
+Serves /v1/chat/completions (plain and `stream: true`) with configurable
+first-token latency and inter-token delay, so gateway and streaming
+benchmarks run without network access or API keys.
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def create_stub_app(first_token_delay: float = 0.1, token_delay: float = 0.01, tokens: int = 200) -> FastAPI:
+    app = FastAPI()
+    app.state.requests = 0
+
+    def completion_tokens():
+        return [f"tok{i} " for i in range(tokens)]
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+
+        if not body.get("stream"):
+            await asyncio.sleep(first_token_delay + token_delay * tokens)
+            return {"choices": [{"message": {"role": "assistant", "content": "".join(completion_tokens())}}]}
+
+        async def events():
+            await asyncio.sleep(first_token_delay)
+            for i, token in enumerate(completion_tokens()):
+                if i:
+                    await asyncio.sleep(token_delay)
+                chunk = {"choices": [{"delta": {"content": token}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def stub_env(port: int) -> dict:
+    """Environment pointing the LLM gateway at a stub on `port`"""
+    return {"OPENAI_API_KEY": "stub-key", "OPENAI_BASE_URL": f"http://127.0.0.1:{port}/v1"}
+
+
+def _serve_forever(port: int, kwargs: dict):
+    uvicorn.run(create_stub_app(**kwargs), host="127.0.0.1", port=port, log_level="warning")
+
+
+def wait_for_port(port: int, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"nothing listening on port {port}")
+
+
+def start_stub_process(port: int, **kwargs) -> multiprocessing.Process:
+    """Run the stub model in its own process so it does not compete for the app's event loop"""
+    process = multiprocessing.Process(target=_serve_forever, args=(port, kwargs), daemon=True)
+    process.start()
+    wait_for_port(port)
+    return process
+
+
+def start_app_process(port: int, env: dict) -> subprocess.Popen:
+    """Run the real app (main:app) under uvicorn in a child process"""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir,
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    wait_for_port(port)
+    return process
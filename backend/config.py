@@ -13,15 +13,98 @@ class Settings(BaseSettings):
     # OpenAI Configuration (optional for demo)
     OPENAI_API_KEY: str = "demo-key-not-configured"
     OPENAI_MODEL: str = "gpt-4-turbo-preview"
+    OPENAI_BASE_URL: str = "https://api.openai.com/v1"
+    
+    # LLM Gateway
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_MAX_RETRIES: int = 2
+    LLM_MAX_CONCURRENCY_PER_MODEL: int = 32
+    LLM_MAX_CONNECTIONS: int = 100
+    TUTOR_DEADLINE_SECONDS: float = 15.0
+    
+    # How often each worker checks whether platform configs changed
+    PLATFORM_CONFIG_CHECK_SECONDS: float = 1.0
+    
+    # Local sentiment scores with confidence below this go to the LLM
+    SENTIMENT_UNCERTAINTY_BAND: float = 0.35
     
     # Database Configuration (SQLite for demo, PostgreSQL for production)
     DATABASE_URL: str = "sqlite:///./eggjamai.db"
     REDIS_URL: str = "redis://localhost:6379/0"
     
+    # Shared state for services: memory (single process), sql or redis
+    STATE_BACKEND: str = "memory"
+    STATE_KEY_PREFIX: str = "eggjam:"
+    
+    # API rate limits (api_rate_limits platform config): counters kept per
+    # worker (memory) or shared in Redis (RATE_LIMIT_REDIS_URL, else REDIS_URL)
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_REDIS_URL: str = ""
+    
+    # Socket.IO client manager: memory (rooms and emits stay in one worker)
+    # or redis (emits published on SOCKETIO_REDIS_URL, else REDIS_URL, so
+    # every worker and node delivers to its own members)
+    SOCKETIO_MANAGER: str = "memory"
+    SOCKETIO_REDIS_URL: str = ""
+    SOCKETIO_CHANNEL: str = "eggjam-socketio"
+    # How often sockets with expired tokens are disconnected
+    SOCKETIO_AUTH_SWEEP_SECONDS: float = 30.0
+    
+    # Typing indicators: at most one start and one stop per window for each
+    # (user, room); a stop is sent after this long without keystrokes
+    TYPING_WINDOW_SECONDS: float = 1.0
+    TYPING_IDLE_SECONDS: float = 4.0
+    TYPING_WHEEL_TICK_MS: float = 100.0
+    
+    # Circle presence: joins/leaves are pushed as one diff per room per interval
+    PRESENCE_FLUSH_MS: float = 500.0
+    
+    # Chat sessions: LRU of active sessions, messages written behind in batches
+    CHAT_SESSION_CACHE_SIZE: int = 1000
+    CHAT_FLUSH_BATCH_SIZE: int = 50
+    CHAT_FLUSH_INTERVAL_MS: float = 250.0
+    CHAT_MAX_PENDING_MESSAGES: int = 10000
+    
+    # Per-user counters (points, streaks, last_login) are batched into one
+    # UPDATE per user per window
+    USER_COUNTER_FLUSH_SECONDS: float = 5.0
+    
+    # Roster imports: rows per batch and bcrypt cost for temporary passwords
+    IMPORT_BATCH_SIZE: int = 1000
+    TEMP_PASSWORD_BCRYPT_ROUNDS: int = 10
+    
+    # Audit log: events are spilled to disk, queued (bounded; callers wait
+    # when full) and bulk-inserted in batches
+    AUDIT_SPILL_DIR: str = "./audit_spill"
+    AUDIT_QUEUE_SIZE: int = 10000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL_MS: float = 200.0
+    AUDIT_SEGMENT_EVENTS: int = 10000
+    AUDIT_MAX_RETRIES: int = 8  # failed writes of one batch (backoff 1s..30s) before it goes to the failed-audit file
+    
     # Security
     SECRET_KEY: str = "demo-secret-key-change-in-production-please"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+    PRINCIPAL_CACHE_CHECK_SECONDS: float = 1.0  # how often a worker looks for invalidations by other workers
+    
+    # RS256 (Clerk) tokens are verified against this JWKS (URL or file path);
+    # left empty, only our own HS256 tokens are accepted
+    JWKS_URL: str = ""
+    JWT_ISSUER: str = ""
+    JWKS_REFRESH_SECONDS: float = 600.0
+    JWKS_MAX_STALE_SECONDS: float = 86400.0
+    VERIFIED_TOKEN_CACHE_SIZE: int = 10000
+    
+    # Password hashing: bcrypt cost (hashes at another cost are upgraded on
+    # login) and admission control for concurrent sign-ins
+    BCRYPT_ROUNDS: int = 12
+    LOGIN_MAX_CONCURRENT: int = 8
+    LOGIN_MAX_WAITING: int = 200
+    LOGIN_QUEUE_TIMEOUT_SECONDS: float = 5.0
+    PASSWORD_HASH_WORKERS: int = 0  # 0 = one per CPU
     
     # CORS
     CORS_ORIGINS: str = "http://localhost:5173,http://localhost:3000"
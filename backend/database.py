@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import settings
@@ -24,13 +26,51 @@ engine = create_engine(
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def to_async_url(url: str) -> str:
+    """
+    Map a sync database URL onto its async driver.
+    PostgreSQL runs on asyncpg, SQLite on aiosqlite.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+
+    if backend == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+
+    if backend == "postgresql":
+        # asyncpg does not understand libpq-only query params (Neon adds these)
+        query = dict(parsed.query)
+        sslmode = query.pop("sslmode", None)
+        query.pop("channel_binding", None)
+        if sslmode and sslmode != "disable":
+            query["ssl"] = sslmode
+        return parsed.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+
+    return url
+
+
+# Async engine used by request handlers so queries never block the event loop
+async_engine = create_async_engine(
+    to_async_url(database_url),
+    pool_pre_ping=True,
+    pool_size=10 if not is_sqlite else 5,
+    max_overflow=20 if not is_sqlite else 10
+)
+
+# expire_on_commit=False keeps ORM objects readable after commit without a
+# lazy refresh (which is not allowed outside the greenlet in async mode)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Base class for models
 Base = declarative_base()
 
 # Dependency for getting database session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -6,6 +6,7 @@ Run this to create all database tables
 from database import engine, Base
 from models.db_models import *
 from models.platform_config import *
+from models.state import *
 
 def init_db():
     """Create all tables"""
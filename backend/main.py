@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from config import settings
+from services.rate_limiter import RateLimitMiddleware
 import os
 from routes import conversation, assessment, challenges, advanced_features, platform_admin, auth, school, mood
 
@@ -19,6 +20,9 @@ allowed_origins = [
     "http://localhost:3000"
 ]
 
+# Enforce api_rate_limits; added before CORS so 429s still carry CORS headers
+app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
@@ -66,6 +70,62 @@ async def health_check():
             "error": str(e)
         }
 
+@app.on_event("shutdown")
+async def close_llm_gateway():
+    """Release pooled LLM provider connections."""
+    from services.llm_gateway import llm_gateway
+    await llm_gateway.close()
+
+@app.on_event("shutdown")
+async def stop_socket_timers():
+    """Stop the socket token sweeper, typing indicator and presence timers."""
+    from socket_manager import socket_manager
+    from services.typing_relay import typing_relay
+    from services.presence import presence
+    await socket_manager.close()
+    await typing_relay.close()
+    await presence.close()
+
+@app.on_event("shutdown")
+async def cancel_crisis_followups():
+    """Drop follow-ups still waiting on the model; their vetted replies were sent."""
+    from services.crisis_followup import crisis_followup
+    await crisis_followup.close()
+
+@app.on_event("shutdown")
+async def flush_chat_sessions():
+    """Write out chat messages still queued in the write-behind buffer."""
+    from services.chat_sessions import chat_sessions
+    await chat_sessions.close()
+
+@app.on_event("shutdown")
+async def flush_user_counters():
+    """Write out buffered points, streaks and last-login times."""
+    from services.user_counters import user_counters
+    await user_counters.close()
+
+@app.on_event("shutdown")
+async def flush_audit_log():
+    """Write out queued audit events (leftovers stay in the spill file)."""
+    from services.audit_log import audit_log
+    await audit_log.close()
+
+@app.on_event("shutdown")
+async def finish_student_imports():
+    """Let running roster imports finish, then stop the hashing pool."""
+    from services.student_import import student_importer
+    from services.password_hasher import password_hasher
+    await student_importer.wait()
+    password_hasher.close()
+
+@app.on_event("shutdown")
+async def close_shared_state():
+    """Close the shared state store and Redis connections."""
+    from services.state_store import state_store
+    from services.redis_client import close_redis
+    await state_store.close()
+    await close_redis()
+
 # Mount Socket.IO to the FastAPI app
 import socketio
 from socket_manager import sio
@@ -0,0 +1,53 @@
+"""
+Migrate audit_logs to the current schema
+user_id becomes a string (users.id is a UUID / Clerk id) and the audit
+queries get their (user_id, timestamp), (action, timestamp) and timestamp
+indexes. create_all() doesn't alter existing tables, so run this once on
+databases created before the change. Safe to run more than once.
+"""
+
+from sqlalchemy import inspect, text
+
+from database import engine, is_sqlite
+
+INDEXES = {
+    "ix_audit_logs_user_id_timestamp": "(user_id, timestamp)",
+    "ix_audit_logs_action_timestamp": "(action, timestamp)",
+    "ix_audit_logs_timestamp": "(timestamp)",
+}
+
+def migrate_audit_logs():
+    """Alter audit_logs.user_id and create the audit indexes"""
+    if not inspect(engine).has_table("audit_logs"):
+        print("⚠️  No audit_logs table yet - create_all() will build it with the new schema")
+        return
+
+    try:
+        with engine.begin() as conn:
+            if is_sqlite:
+                # SQLite stores string ids in an INTEGER column as text; nothing to alter
+                print("✅ audit_logs.user_id accepts string ids (SQLite)")
+            else:
+                conn.execute(text(
+                    "ALTER TABLE audit_logs ALTER COLUMN user_id TYPE VARCHAR(255) USING user_id::varchar"
+                ))
+                print("✅ audit_logs.user_id is VARCHAR(255)")
+
+            conn.execute(text("DROP INDEX IF EXISTS ix_audit_logs_user_id"))
+            for name, columns in INDEXES.items():
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON audit_logs {columns}"))
+                print(f"✅ Index {name}")
+    except Exception as e:
+        print(f"❌ Error migrating audit_logs: {e}")
+        import traceback
+        traceback.print_exc()
+        raise
+
+if __name__ == "__main__":
+    print("\n" + "=" * 60)
+    print("🗂️  EggJam.ai - audit_logs migration")
+    print("=" * 60 + "\n")
+    migrate_audit_logs()
+    print("\n" + "=" * 60)
+    print("🚀 audit_logs migration complete!")
+    print("=" * 60 + "\n")
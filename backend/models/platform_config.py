@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, Integer, String, Text, JSON, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Text, JSON, Boolean, DateTime, Index
 from sqlalchemy.sql import func
 from database import Base
 
@@ -17,11 +17,16 @@ class PlatformConfig(Base):
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    # Audit queries filter by user or action and page newest-first by time
+    __table_args__ = (
+        Index("ix_audit_logs_user_id_timestamp", "user_id", "timestamp"),
+        Index("ix_audit_logs_action_timestamp", "action", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, index=True)
+    user_id = Column(String(255))  # users.id is a string (UUID / Clerk id)
     action = Column(String(255), nullable=False)
     resource = Column(String(255))
     details = Column(JSON)
     ip_address = Column(String(50))
-    timestamp = Column(DateTime, server_default=func.now())
+    timestamp = Column(DateTime, server_default=func.now(), index=True)
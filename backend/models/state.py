@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from database import Base
+
+
+class StateEntry(Base):
+    """Key/value row for the SQL StateStore backend (values are JSON text)"""
+    __tablename__ = "state_entries"
+
+    key = Column(String(255), primary_key=True)
+    value = Column(Text, nullable=False)
+    expires_at = Column(DateTime, nullable=True, index=True)
+
+
+class StateListItem(Base):
+    """One element of a StateStore list, ordered by id"""
+    __tablename__ = "state_list_items"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    key = Column(String(255), index=True, nullable=False)
+    value = Column(Text, nullable=False)
+
+
+class StateMember(Base):
+    """One member of a StateStore ordered set"""
+    __tablename__ = "state_members"
+    __table_args__ = (UniqueConstraint("key", "member", name="uq_state_members_key_member"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    key = Column(String(255), index=True, nullable=False)
+    member = Column(String(255), nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
@@ -1,23 +1,36 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Body
 from typing import List, Dict
 from datetime import datetime
+import time
 
 from models.advanced_features import (
     MentalHealthDeviation, TutoringSession, PurposeDiscoveryResult,
     ScreenTimeData, DetoxGoal, LearningDisabilityIndicators,
     ConceptGap
 )
+from models.conversation import RiskLevel
 from services.advanced_ai_services import mental_health_monitor, academic_tutor
+from services.crisis_followup import crisis_followup
+from services.sentiment import sentiment_scorer
+from services.llm_gateway import llm_gateway
+from services.llm_scheduler import LLMPriority
 from services.discovery_services import (
     purpose_discovery_service, digital_detox_service, learning_disability_detector
 )
 from services.exam_anxiety_service import exam_anxiety_service
 from services.peer_circle_service import peer_circle_service
+from services.presence import presence
 from services.parent_mediation_service import parent_mediation_service
 
 router = APIRouter(prefix="/api/advanced", tags=["advanced_features"])
 
 
+@router.on_event("startup")
+async def load_sentiment_model():
+    """Load the local sentiment lexicon once so the first request doesn't pay for it"""
+    sentiment_scorer.load()
+
+
 # ===== MENTAL HEALTH MONITORING =====
 
 @router.post("/mental-health/analyze")
@@ -31,7 +44,7 @@ async def analyze_mental_health(
     Analyze message for mental health indicators
     Returns risk assessment and intervention if needed
     """
-    risk_score, risk_level, needs_intervention = await mental_health_monitor.analyze_session(
+    risk_score, risk_level, needs_intervention, sentiment_tier = await mental_health_monitor.analyze_session(
         user_id=user_id,
         message=message,
         voice_tone=voice_tone,
@@ -41,7 +54,8 @@ async def analyze_mental_health(
     response = {
         "risk_score": risk_score,
         "risk_level": risk_level,
-        "needs_intervention": needs_intervention
+        "needs_intervention": needs_intervention,
+        "sentiment_tier": sentiment_tier
     }
     
     if needs_intervention:
@@ -51,6 +65,13 @@ async def analyze_mental_health(
             context=message
         )
         response["intervention_message"] = intervention
+        if risk_level in ("critical", "high"):
+            crisis_followup.schedule(
+                user_id=user_id,
+                user_message=message,
+                risk_level=RiskLevel(risk_level),
+                reply=intervention
+            )
         
         # Alert counselor if critical
         if risk_level == "critical":
@@ -69,24 +90,24 @@ async def analyze_mental_health(
 async def get_mental_health_history(user_id: str, days: int = 30):
     """Get mental health trend over time"""
     
-    history = mental_health_monitor.mood_history.get(user_id, [])
+    history = mental_health_monitor.mood_history
     
     # Filter last N days
-    cutoff = datetime.now() - timedelta(days=days)
-    recent = [h for h in history if h['timestamp'] > cutoff]
+    cutoff = time.time() - days * 86400
+    recent = history.query(user_id, start=cutoff)
     
-    if not recent:
+    if len(recent) == 0:
         return {"message": "No data yet", "trend": []}
     
     # Calculate trend
-    sentiments = [h['sentiment'] for h in recent]
+    sentiments = recent["sentiment"]
     trend = "improving" if sentiments[-1] > sentiments[0] else "declining"
     
     return {
         "data_points": len(recent),
-        "average_mood": sum(sentiments) / len(sentiments),
+        "average_mood": float(sentiments.mean()),
         "trend": trend,
-        "history": recent[-30:]  # Last 30 points max
+        "history": history.to_dicts(recent[-30:])  # Last 30 points max
     }
 
 
@@ -178,21 +199,16 @@ async def explain_subject_relevance(
     prompt = f"Explain how {current_subject} is relevant to a career in {career_goal}. Be specific and exciting. 2-3 sentences."
     
     try:
-        import openai
-        from config import settings
-        openai.api_key = settings.OPENAI_API_KEY
-        
-        response = await openai.ChatCompletion.acreate(
-            model="gpt-4",
+        explanation = await llm_gateway.chat(
             messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_tokens=150
+            max_tokens=150,
+            priority=LLMPriority.TUTORING
         )
         
         return {
             "subject": current_subject,
             "career": career_goal,
-            "explanation": response.choices[0].message.content
+            "explanation": explanation
         }
     except:
         return {
@@ -208,7 +224,7 @@ async def explain_subject_relevance(
 async def set_screen_time_baseline(user_id: str, daily_minutes: int):
     """Set initial screen time baseline"""
     
-    digital_detox_service.set_baseline(user_id, daily_minutes)
+    await digital_detox_service.set_baseline(user_id, daily_minutes)
     
     return {
         "message": "Baseline set successfully",
@@ -222,9 +238,7 @@ async def set_screen_time_baseline(user_id: str, daily_minutes: int):
 async def log_screen_time(data: ScreenTimeData):
     """Log daily screen time data"""
     
-    digital_detox_service.log_screen_time(data.user_id, data)
-    
-    goal = digital_detox_service.goals.get(data.user_id)
+    goal = await digital_detox_service.log_screen_time(data.user_id, data)
     
     if goal:
         return {
@@ -262,7 +276,7 @@ async def get_detox_tips(
 async def get_detox_progress(user_id: str):
     """Get detox progress and achievements"""
     
-    goal = digital_detox_service.goals.get(user_id)
+    goal = await digital_detox_service.get_goal(user_id)
     
     if not goal:
         return {"message": "No detox goal set"}
@@ -477,7 +491,7 @@ async def get_exposure_levels():
 @router.get("/exam-anxiety/progress/{user_id}")
 async def get_anxiety_progress(user_id: str):
     """Get user progress in exposure therapy"""
-    return exam_anxiety_service.get_user_progress(user_id)
+    return await exam_anxiety_service.get_user_progress(user_id)
 
 @router.post("/exam-anxiety/start-session")
 async def start_exposure_session(user_id: str = Body(...), level: int = Body(...)):
@@ -487,7 +501,7 @@ async def start_exposure_session(user_id: str = Body(...), level: int = Body(...
 @router.post("/exam-anxiety/submit-results")
 async def submit_exposure_results(user_id: str = Body(...), session_data: Dict = Body(...)):
     """Submit results from an exposure session"""
-    return exam_anxiety_service.submit_exposure_results(user_id, session_data)
+    return await exam_anxiety_service.submit_exposure_results(user_id, session_data)
 
 
 # ===== PEER CIRCLES =====
@@ -495,28 +509,35 @@ async def submit_exposure_results(user_id: str = Body(...), session_data: Dict =
 @router.get("/peer-circles/list")
 async def list_circles(interest: str = None):
     """List available peer circles"""
-    return peer_circle_service.get_circles(interest)
+    return await peer_circle_service.get_circles(interest)
 
 @router.post("/peer-circles/create")
 async def create_circle(data: Dict = Body(...)):
     """Create a new peer circle"""
-    return peer_circle_service.create_circle(data)
+    return await peer_circle_service.create_circle(data)
 
 @router.post("/peer-circles/join")
 async def join_circle(circle_id: str = Body(...), user_id: str = Body(...)):
     """Join a peer circle"""
-    return peer_circle_service.join_circle(circle_id, user_id)
+    return await peer_circle_service.join_circle(circle_id, user_id)
 
 @router.get("/peer-circles/{circle_id}/messages")
 async def get_circle_messages(circle_id: str):
     """Get messages for a circle"""
-    return peer_circle_service.get_messages(circle_id)
+    return await peer_circle_service.get_messages(circle_id)
+
+@router.get("/peer-circles/{circle_id}/presence")
+async def get_circle_presence(circle_id: str):
+    """Who is online in a circle (live updates come as 'presence_diff' socket events)"""
+    if not presence.enabled:
+        raise HTTPException(status_code=503, detail="Presence needs a shared STATE_BACKEND when running several workers")
+    return await presence.snapshot(f"circle_{circle_id}")
 
 @router.post("/peer-circles/{circle_id}/message")
 async def send_circle_message(circle_id: str, message_data: Dict = Body(...)):
     """Send a message to a circle"""
     # 1. Save to DB
-    result = peer_circle_service.send_message(circle_id, message_data)
+    result = await peer_circle_service.send_message(circle_id, message_data)
     
     # 2. Broadcast via Socket.IO
     # We broadcast to "circle_{circle_id}" room
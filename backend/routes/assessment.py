@@ -8,11 +8,17 @@ from models.assessment import (
     AssessmentResult
 )
 from services.assessment_service import assessment_service
+from services.state_store import state_store
 
 router = APIRouter(prefix="/api/assessment", tags=["assessment"])
 
-# In-memory storage (replace with database in production)
-assessment_results: Dict[str, AssessmentResult] = {}
+
+def _result_key(result_id: str) -> str:
+    return f"assessment:result:{result_id}"
+
+
+def _user_results_key(user_id: str) -> str:
+    return f"assessment:user:{user_id}"
 
 
 @router.get("/questions/{assessment_type}", response_model=List[AssessmentQuestion])
@@ -50,8 +56,9 @@ async def submit_assessment(submission: AssessmentSubmission):
         created_at=datetime.now()
     )
     
-    # Store result
-    assessment_results[result.id] = result
+    # Store result and index it by user
+    await state_store.set(_result_key(result.id), result.model_dump(mode="json"))
+    await state_store.append(_user_results_key(result.user_id), result.id)
     
     return result
 
@@ -59,10 +66,9 @@ async def submit_assessment(submission: AssessmentSubmission):
 @router.get("/results/{user_id}", response_model=List[AssessmentResult])
 async def get_user_results(user_id: str):
     """Get all assessment results for a user."""
-    user_results = [
-        result for result in assessment_results.values()
-        if result.user_id == user_id
-    ]
+    result_ids = await state_store.get_list(_user_results_key(user_id))
+    stored = await state_store.get_many([_result_key(result_id) for result_id in result_ids])
+    user_results = [AssessmentResult.model_validate(data) for data in stored if data]
     
     return sorted(user_results, key=lambda x: x.created_at, reverse=True)
 
@@ -70,7 +76,8 @@ async def get_user_results(user_id: str):
 @router.get("/result/{result_id}", response_model=AssessmentResult)
 async def get_result(result_id: str):
     """Get a specific assessment result."""
-    if result_id not in assessment_results:
+    data = await state_store.get(_result_key(result_id))
+    if data is None:
         raise HTTPException(status_code=404, detail="Result not found")
     
-    return assessment_results[result_id]
+    return AssessmentResult.model_validate(data)
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
+from services.audit_log import audit_log
 from services.auth_service import AuthService, get_current_user
+from services.jwks import jwks_cache
+from services.password_hasher import login_admission, password_hasher
+from services.principal_cache import Principal
 from models.db_models import User
 from pydantic import BaseModel, EmailStr
 from typing import Optional
@@ -34,16 +38,38 @@ class TokenResponse(BaseModel):
     token_type: str = "bearer"
     user: UserResponse
 
+@router.on_event("startup")
+async def start_password_hasher():
+    """Spawn the hashing workers up front so the first sign-ins don't wait on them"""
+    try:
+        await password_hasher.warm()
+    except Exception as e:
+        print(f"Password hasher warm-up failed: {e}")
+
+@router.on_event("startup")
+async def load_jwks():
+    """Fetch the Clerk signing keys before the first RS256 token arrives"""
+    if jwks_cache.configured:
+        await jwks_cache.refresh()
+
 @router.post("/login", response_model=TokenResponse)
 async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Login endpoint"""
-    # Authenticate user
-    user = AuthService.authenticate_user(db, form_data.username, form_data.password)
+    # Authenticate user (bcrypt runs on the hashing pool, behind admission control)
+    async with login_admission:
+        user = await AuthService.authenticate_user(db, form_data.username, form_data.password)
     
+    ip_address = request.client.host if request.client else None
     if not user:
+        await audit_log.record(
+            action="login_failed",
+            details={"email": form_data.username},
+            ip_address=ip_address
+        )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -56,7 +82,8 @@ async def login(
     )
     
     # Update last login
-    AuthService.update_last_login(db, user.id)
+    AuthService.update_last_login(user.id)
+    await audit_log.record(action="login", user_id=user.id, ip_address=ip_address)
     
     return {
         "access_token": access_token,
@@ -67,19 +94,20 @@ async def login(
 @router.post("/register", response_model=UserResponse)
 async def register(
     user_data: UserRegister,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Register a new user"""
     try:
-        user = AuthService.create_user(
-            db=db,
-            email=user_data.email,
-            password=user_data.password,
-            full_name=user_data.full_name,
-            role=user_data.role,
-            age=user_data.age,
-            grade_level=user_data.grade_level
-        )
+        async with login_admission:
+            user = await AuthService.create_user(
+                db=db,
+                email=user_data.email,
+                password=user_data.password,
+                full_name=user_data.full_name,
+                role=user_data.role,
+                age=user_data.age,
+                grade_level=user_data.grade_level
+            )
         return user
     except ValueError as e:
         raise HTTPException(
@@ -89,8 +117,11 @@ async def register(
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get current user information"""
-    return current_user
+    user = await db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
@@ -8,6 +8,7 @@ from models.challenge import (
     ChallengeCompletion, SkillCategory, DifficultyLevel
 )
 from services.personalized_challenge_service import personalized_challenge_service
+from services.state_store import state_store
 
 router = APIRouter(prefix="/api/challenges", tags=["personalized_challenges"])
 
@@ -47,20 +48,17 @@ async def generate_quest(
     return quest
 
 
-# In-memory storage for completed challenges (replace with DB in production)
-completed_challenges_db = {}
+def _completed_key(user_id: str) -> str:
+    return f"challenges:completed:{user_id}"
+
 
 @router.post("/complete")
 async def complete_challenge(completion: ChallengeCompletion):
     """
     Mark a challenge as complete with optional proof and reflection.
     """
-    if completion.user_id not in completed_challenges_db:
-        completed_challenges_db[completion.user_id] = []
-    
-    # Check if already completed
-    if completion.challenge_id not in completed_challenges_db[completion.user_id]:
-        completed_challenges_db[completion.user_id].append(completion.challenge_id)
+    # Completed challenges are a set, so completing twice is a no-op
+    await state_store.add_member(_completed_key(completion.user_id), completion.challenge_id)
     
     return {
         "success": True,
@@ -75,7 +73,7 @@ async def get_completed_challenges(user_id: str):
     """
     Get list of completed challenge IDs for a user.
     """
-    return completed_challenges_db.get(user_id, [])
+    return await state_store.members(_completed_key(user_id))
 
 
 @router.get("/surprise/{user_id}")
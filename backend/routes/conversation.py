@@ -1,39 +1,29 @@
 from fastapi import APIRouter, HTTPException
-from typing import Dict
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator
+import json
 import uuid
 from datetime import datetime
 
 from models.conversation import (
     ConversationRequest, ConversationResponse, Message, 
-    MessageRole, SessionHistory
+    MessageRole, RiskLevel, SessionHistory
 )
 from services.ai_service import ai_service
+from services.chat_sessions import UnknownUserError, chat_sessions
+from services.crisis_followup import crisis_followup
 
 router = APIRouter(prefix="/api/conversation", tags=["conversation"])
 
-# In-memory session storage (replace with Redis in production)
-sessions: Dict[str, SessionHistory] = {}
 
-
-@router.post("/chat", response_model=ConversationResponse)
-async def chat(request: ConversationRequest):
-    """
-    Send a message and get AI response.
-    """
-    # Get or create session
+async def _start_turn(request: ConversationRequest) -> SessionHistory:
+    """Get or create the session and record the user's message."""
     session_id = request.session_id or str(uuid.uuid4())
     
-    if session_id not in sessions:
-        sessions[session_id] = SessionHistory(
-            session_id=session_id,
-            user_id=request.user_id,
-            messages=[],
-            risk_level="none",
-            created_at=datetime.now(),
-            updated_at=datetime.now()
-        )
-    
-    session = sessions[session_id]
+    try:
+        session = await chat_sessions.get_or_create(session_id, request.user_id)
+    except UnknownUserError:
+        raise HTTPException(status_code=404, detail="User not found")
     
     # Add user message to history
     user_msg = Message(
@@ -42,16 +32,26 @@ async def chat(request: ConversationRequest):
         timestamp=datetime.now()
     )
     session.messages.append(user_msg)
+    chat_sessions.record(session, user_msg)
     
-    # Get AI response with risk assessment
-    ai_response, risk_level = await ai_service.get_response(
-        user_message=request.message,
-        conversation_history=session.messages,
-        age_group="13-18",  # TODO: Get from user profile
-        language=request.language
-    )
-    
-    # Add AI response to history
+    return session
+
+
+def _follow_up_crisis(request: ConversationRequest, session: SessionHistory, reply: str, risk_level: RiskLevel):
+    """The vetted crisis reply is already sent; personalize it in the background."""
+    if ai_service.is_crisis(risk_level):
+        crisis_followup.schedule(
+            user_id=request.user_id,
+            user_message=request.message,
+            risk_level=risk_level,
+            reply=reply,
+            history=session.messages[:-2],  # before this turn's message and reply
+            session_id=session.session_id
+        )
+
+
+def _finish_turn(session: SessionHistory, ai_response: str, risk_level: RiskLevel):
+    """Record the AI response and roll up the session risk level."""
     ai_msg = Message(
         role=MessageRole.ASSISTANT,
         content=ai_response,
@@ -65,6 +65,55 @@ async def chat(request: ConversationRequest):
         session.risk_level = risk_level
     
     session.updated_at = datetime.now()
+    chat_sessions.record(session, ai_msg)
+
+
+async def stream_chat_turn(request: ConversationRequest, session: SessionHistory = None) -> AsyncIterator[dict]:
+    """
+    Run one chat turn as a stream of frames (risk, token..., done).
+    Shared by the SSE endpoint and the Socket.IO `chat_message` event.
+    Pass `session` when the turn was already started (_start_turn).
+    """
+    if session is None:
+        session = await _start_turn(request)
+    risk_level = RiskLevel.NONE
+    
+    async for frame in ai_service.stream_response(
+        user_message=request.message,
+        conversation_history=session.messages,
+        age_group="13-18",  # TODO: Get from user profile
+        language=request.language
+    ):
+        if frame["type"] == "risk":
+            risk_level = RiskLevel(frame["risk_level"])
+            frame["session_id"] = session.session_id
+        elif frame["type"] == "done":
+            _finish_turn(session, frame["message"], risk_level)
+            _follow_up_crisis(request, session, frame["message"], risk_level)
+        
+        yield frame
+
+
+@router.post("/chat", response_model=ConversationResponse)
+async def chat(request: ConversationRequest):
+    """
+    Send a message and get AI response.
+    High and critical risk are answered at once with the vetted crisis
+    reply; a personalized follow-up arrives later as `crisis_followup`.
+    """
+    session = await _start_turn(request)
+    session_id = session.session_id
+    
+    # Get AI response with risk assessment
+    ai_response, risk_level = await ai_service.get_response(
+        user_message=request.message,
+        conversation_history=session.messages,
+        age_group="13-18",  # TODO: Get from user profile
+        language=request.language
+    )
+    
+    _finish_turn(session, ai_response, risk_level)
+    _follow_up_crisis(request, session, ai_response, risk_level)
     
     # Get crisis resources if needed
     resources = ai_service.get_crisis_resources(risk_level) if risk_level.value != "none" else None
@@ -79,20 +128,40 @@ async def chat(request: ConversationRequest):
     )
 
 
+@router.post("/chat/stream")
+async def chat_stream(request: ConversationRequest):
+    """
+    Send a message and stream the AI response as Server-Sent Events.
+    The first event carries the risk assessment and crisis resources.
+    """
+    # Started before the response so an unknown user still gets a 404
+    session = await _start_turn(request)
+    
+    async def event_stream():
+        async for frame in stream_chat_turn(request, session):
+            yield f"event: {frame['type']}\ndata: {json.dumps(frame)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/history/{session_id}", response_model=SessionHistory)
 async def get_history(session_id: str):
     """Get conversation history for a session."""
-    if session_id not in sessions:
+    session = await chat_sessions.get_history(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    return sessions[session_id]
+    return session
 
 
 @router.delete("/session/{session_id}")
 async def delete_session(session_id: str):
     """Delete a conversation session."""
-    if session_id in sessions:
-        del sessions[session_id]
+    if await chat_sessions.delete(session_id):
         return {"message": "Session deleted successfully"}
     
     raise HTTPException(status_code=404, detail="Session not found")
@@ -5,7 +5,8 @@ import uuid
 
 from models.db_models import MoodEntry
 from database import get_db
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(prefix="/api/mood", tags=["mood"])
 
@@ -15,7 +16,7 @@ async def log_mood(
     mood_score: int = Body(...),
     emotions: List[str] = Body(default=[]),
     note: str = Body(default=""),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Log a user's mood."""
     new_entry = MoodEntry(
@@ -27,8 +28,8 @@ async def log_mood(
     )
     
     db.add(new_entry)
-    db.commit()
-    db.refresh(new_entry)
+    await db.commit()
+    await db.refresh(new_entry)
     
     return {
         "message": "Mood logged successfully",
@@ -44,15 +45,18 @@ async def log_mood(
 async def get_mood_history(
     user_id: int,
     days: int = 30,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get mood history for a user."""
     cutoff_date = datetime.now() - timedelta(days=days)
     
-    entries = db.query(MoodEntry).filter(
-        MoodEntry.user_id == user_id,
-        MoodEntry.date >= cutoff_date
-    ).order_by(MoodEntry.date.asc()).all()
+    result = await db.execute(
+        select(MoodEntry).where(
+            MoodEntry.user_id == user_id,
+            MoodEntry.date >= cutoff_date
+        ).order_by(MoodEntry.date.asc())
+    )
+    entries = result.scalars().all()
     
     return [
         {
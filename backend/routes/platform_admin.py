@@ -1,11 +1,18 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select, func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Any, Optional
+from datetime import datetime
 from pydantic import BaseModel
 from database import get_db
 from models.db_models import User, UserRole
 from models.platform_config import PlatformConfig, AuditLog
+from services.platform_config_cache import platform_config
+from services.audit_log import audit_log
+from services.auth_service import get_current_platform_admin
+from services.principal_cache import Principal
+from services.llm_scheduler import llm_scheduler
 import json
 
 router = APIRouter(prefix="/api/platform-admin", tags=["platform_admin"])
@@ -29,6 +36,22 @@ class ConfigResponse(BaseModel):
     description: Optional[str]
     updated_at: Any
 
+class AuditLogResponse(BaseModel):
+    id: int
+    user_id: Optional[str]
+    action: str
+    resource: Optional[str]
+    details: Optional[Any]
+    ip_address: Optional[str]
+    timestamp: datetime
+    
+    class Config:
+        from_attributes = True
+
+class AuditLogPage(BaseModel):
+    items: List[AuditLogResponse]
+    next_cursor: Optional[str] = None
+
 # Default configurations to seed if missing
 DEFAULT_CONFIGS = {
     "ai_model_config": {
@@ -67,7 +90,8 @@ DEFAULT_CONFIGS = {
         "value": {
             "global_limit": 1000,
             "student_limit": 100,
-            "school_limit": 5000
+            "school_limit": 5000,
+            "window_seconds": 60
         },
         "category": "api",
         "description": "API Rate limiting configuration"
@@ -150,47 +174,35 @@ DEFAULT_CONFIGS = {
 
 @router.on_event("startup")
 async def seed_default_configs():
-    """Seed default configurations on startup"""
-    from database import SessionLocal
-    db = SessionLocal()
+    """Seed missing default configurations on startup (one bulk upsert)"""
     try:
-        for key, data in DEFAULT_CONFIGS.items():
-            exists = db.query(PlatformConfig).filter(PlatformConfig.key == key).first()
-            if not exists:
-                config = PlatformConfig(
-                    key=key,
-                    value=data["value"],
-                    category=data["category"],
-                    description=data["description"]
-                )
-                db.add(config)
-        db.commit()
+        await platform_config.seed(DEFAULT_CONFIGS)
     except Exception as e:
         print(f"Error seeding configs: {e}")
-    finally:
-        db.close()
+
+@router.on_event("startup")
+async def replay_audit_spill():
+    """Write out audit events a crashed worker left in the spill directory"""
+    await audit_log.start()
 
 @router.get("/configs", response_model=List[ConfigResponse])
-async def get_all_configs(category: str = None, db: Session = Depends(get_db)):
+async def get_all_configs(category: str = None):
     """Get all system configurations"""
-    query = db.query(PlatformConfig)
-    if category:
-        query = query.filter(PlatformConfig.category == category)
-    return query.all()
+    return await platform_config.entries(category)
 
 @router.get("/configs/{key}", response_model=ConfigResponse)
-async def get_config(key: str, db: Session = Depends(get_db)):
+async def get_config(key: str):
     """Get a specific configuration"""
-    config = db.query(PlatformConfig).filter(PlatformConfig.key == key).first()
+    config = await platform_config.entry(key)
     if not config:
         raise HTTPException(status_code=404, detail="Configuration not found")
     return config
 
 @router.post("/configs", response_model=ConfigResponse)
-async def create_config(config: ConfigCreate, db: Session = Depends(get_db)):
+async def create_config(config: ConfigCreate, db: AsyncSession = Depends(get_db)):
     """Create a new configuration"""
-    exists = db.query(PlatformConfig).filter(PlatformConfig.key == config.key).first()
-    if exists:
+    result = await db.execute(select(PlatformConfig.id).where(PlatformConfig.key == config.key))
+    if result.first():
         raise HTTPException(status_code=400, detail="Configuration key already exists")
     
     new_config = PlatformConfig(
@@ -202,50 +214,96 @@ async def create_config(config: ConfigCreate, db: Session = Depends(get_db)):
         updated_by="admin" # In real app, get from auth context
     )
     db.add(new_config)
-    db.commit()
-    db.refresh(new_config)
+    await db.commit()
+    await db.refresh(new_config)
+    await platform_config.invalidate()
     
-    # Log audit
-    log = AuditLog(
-        user_id=1, # Mock admin ID
+    # Log audit (queued, bulk-inserted by the audit writer)
+    await audit_log.record(
         action="create_config",
+        user_id="1", # Mock admin ID
         resource=config.key,
         details={"value": str(config.value)}
     )
-    db.add(log)
-    db.commit()
     
     return new_config
 
 @router.put("/configs/{key}", response_model=ConfigResponse)
-async def update_config(key: str, update: ConfigUpdate, db: Session = Depends(get_db)):
+async def update_config(key: str, update: ConfigUpdate, db: AsyncSession = Depends(get_db)):
     """Update an existing configuration"""
-    config = db.query(PlatformConfig).filter(PlatformConfig.key == key).first()
+    result = await db.execute(select(PlatformConfig).where(PlatformConfig.key == key))
+    config = result.scalars().first()
     if not config:
         raise HTTPException(status_code=404, detail="Configuration not found")
     
     config.value = update.value
     config.updated_by = update.updated_by
     
-    db.commit()
-    db.refresh(config)
+    await db.commit()
+    await db.refresh(config)
+    await platform_config.invalidate()
     
-    # Log audit
-    log = AuditLog(
-        user_id=1, # Mock admin ID
+    # Log audit (queued, bulk-inserted by the audit writer)
+    await audit_log.record(
         action="update_config",
+        user_id="1", # Mock admin ID
         resource=key,
         details={"value": str(update.value)}
     )
-    db.add(log)
-    db.commit()
     
     return config
 
+@router.get("/audit-logs", response_model=AuditLogPage)
+async def get_audit_logs(
+    user_id: Optional[str] = None,
+    action: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_platform_admin)
+):
+    """Audit events, newest first; pass next_cursor back to get the next page"""
+    query = select(AuditLog)
+    if user_id:
+        query = query.where(AuditLog.user_id == user_id)
+    if action:
+        query = query.where(AuditLog.action == action)
+    if start:
+        query = query.where(AuditLog.timestamp >= start)
+    if end:
+        query = query.where(AuditLog.timestamp < end)
+    if cursor:
+        # Keyset pagination on (timestamp, id): no OFFSET scans on deep pages
+        try:
+            ts, last_id = cursor.rsplit("_", 1)
+            ts, last_id = datetime.fromisoformat(ts), int(last_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(or_(
+            AuditLog.timestamp < ts,
+            and_(AuditLog.timestamp == ts, AuditLog.id < last_id)
+        ))
+    
+    query = query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(limit + 1)
+    rows = (await db.execute(query)).scalars().all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1].timestamp.isoformat()}_{rows[-1].id}"
+    return {"items": rows, "next_cursor": next_cursor}
+
+@router.get("/llm-scheduler")
+async def get_llm_scheduler_metrics(current_user: Principal = Depends(get_current_platform_admin)):
+    """LLM queue depth, in-flight calls, shed counts and wait times per priority class"""
+    return llm_scheduler.metrics()
+
 @router.get("/stats")
-async def get_platform_stats(db: Session = Depends(get_db)):
+async def get_platform_stats(db: AsyncSession = Depends(get_db)):
     """Get high-level platform statistics"""
-    total_users = db.query(User).count()
+    total_users = await db.scalar(select(func.count(User.id)))
     total_schools = 12 # Mock for now as School model might be empty
     active_subs = 150
     api_calls_today = 45000
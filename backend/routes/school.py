@@ -1,17 +1,21 @@
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-import csv
-import io
+import tempfile
 import uuid
 from datetime import datetime, timedelta
 
 from database import get_db
 from models.db_models import School, User, UserRole, SubscriptionTier
 from services.auth_service import get_current_user
+from services.principal_cache import Principal
+from services.student_import import student_importer
 
 router = APIRouter(prefix="/api/school", tags=["school"])
 
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
 @router.post("/register", status_code=status.HTTP_201_CREATED)
 async def register_school(
     name: str,
@@ -19,14 +23,14 @@ async def register_school(
     state: str,
     contact_email: str,
     contact_phone: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Register a new school and generate a license key.
     """
     # Check if school already exists
-    existing_school = db.query(School).filter(School.name == name).first()
-    if existing_school:
+    result = await db.execute(select(School.id).where(School.name == name))
+    if result.first():
         raise HTTPException(status_code=400, detail="School already registered")
 
     # Generate license key
@@ -44,8 +48,8 @@ async def register_school(
     )
     
     db.add(new_school)
-    db.commit()
-    db.refresh(new_school)
+    await db.commit()
+    await db.refresh(new_school)
     
     return {
         "message": "School registered successfully",
@@ -58,12 +62,11 @@ async def register_school(
 async def import_students(
     school_id: int,
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
-    Bulk import students from CSV file.
-    CSV Format: email, full_name, grade_level
+    Bulk import students from CSV file as a background job.
+    CSV Format: email, full_name, grade_level[, temp_password]
     """
     # Verify permissions (must be school admin or platform admin)
     if current_user.role not in [UserRole.SCHOOL_ADMIN, UserRole.PLATFORM_ADMIN]:
@@ -75,60 +78,72 @@ async def import_students(
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="File must be a CSV")
 
-    content = await file.read()
-    decoded_content = content.decode('utf-8')
-    csv_reader = csv.DictReader(io.StringIO(decoded_content))
-    
-    imported_count = 0
-    errors = []
-    
-    for row in csv_reader:
-        try:
-            email = row.get('email')
-            full_name = row.get('full_name')
-            grade_level = row.get('grade_level')
-            
-            if not email:
-                continue
-                
-            # Check if user exists
-            if db.query(User).filter(User.email == email).first():
-                errors.append(f"User {email} already exists")
-                continue
-                
-            # Create student
-            # Note: In production, generate a temp password and email it
-            temp_password = "ChangeMe123!" 
-            hashed_pw = "hashed_placeholder" # You would use auth_service.get_password_hash(temp_password)
-            
-            new_student = User(
-                email=email,
-                full_name=full_name,
-                hashed_password=hashed_pw,
-                role=UserRole.STUDENT,
-                school_id=school_id,
-                grade_level=int(grade_level) if grade_level else None,
-                is_active=True
-            )
-            
-            db.add(new_student)
-            imported_count += 1
-            
-        except Exception as e:
-            errors.append(f"Error importing row {row}: {str(e)}")
-            
-    db.commit()
+    # Spool the upload to disk in chunks; the import job parses it from there
+    with tempfile.NamedTemporaryFile(prefix="roster-", suffix=".csv", delete=False) as spool:
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            spool.write(chunk)
+
+    job = await student_importer.start(school_id, spool.name, current_user.id)
     
     return {
-        "message": f"Import completed. {imported_count} students added.",
-        "errors": errors
+        "message": "Import started. Poll the job or watch it over Socket.IO.",
+        "job_id": job["job_id"],
+        "status": job["status"]
     }
 
+@router.get("/import-jobs/{job_id}")
+async def get_import_job(
+    job_id: str,
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Progress of a student import started by /import-students.
+    """
+    job = await student_importer.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+
+    if current_user.role not in [UserRole.SCHOOL_ADMIN, UserRole.PLATFORM_ADMIN]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+        
+    if current_user.role == UserRole.SCHOOL_ADMIN and current_user.school_id != job["school_id"]:
+        raise HTTPException(status_code=403, detail="Not authorized for this school")
+
+    return job
+
+@router.post("/import-jobs/{job_id}/credentials")
+async def take_import_credentials(
+    job_id: str,
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Temporary passwords generated by a finished import, as
+    [{email, temp_password}]. Returned once; later calls get 410.
+    """
+    job = await student_importer.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+
+    if current_user.role not in [UserRole.SCHOOL_ADMIN, UserRole.PLATFORM_ADMIN]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+        
+    if current_user.role == UserRole.SCHOOL_ADMIN and current_user.school_id != job["school_id"]:
+        raise HTTPException(status_code=403, detail="Not authorized for this school")
+
+    if job["finished_at"] is None:
+        raise HTTPException(status_code=409, detail="Import still running")
+
+    credentials = await student_importer.take_credentials(job_id)
+    if credentials is None:
+        raise HTTPException(status_code=410, detail="No credentials to hand out (already taken or none generated)")
+
+    return {"job_id": job_id, "credentials": credentials}
+
 @router.get("/dashboard/{school_id}")
 async def get_school_dashboard(
     school_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get school dashboard statistics.
@@ -140,12 +155,16 @@ async def get_school_dashboard(
     if current_user.role == UserRole.SCHOOL_ADMIN and current_user.school_id != school_id:
         raise HTTPException(status_code=403, detail="Not authorized for this school")
 
-    school = db.query(School).filter(School.id == school_id).first()
+    school = await db.get(School, school_id)
     if not school:
         raise HTTPException(status_code=404, detail="School not found")
         
-    student_count = db.query(User).filter(User.school_id == school_id, User.role == UserRole.STUDENT).count()
-    counselor_count = db.query(User).filter(User.school_id == school_id, User.role == UserRole.COUNSELOR).count()
+    student_count = await db.scalar(
+        select(func.count(User.id)).where(User.school_id == school_id, User.role == UserRole.STUDENT)
+    )
+    counselor_count = await db.scalar(
+        select(func.count(User.id)).where(User.school_id == school_id, User.role == UserRole.COUNSELOR)
+    )
     
     # Mock stats for demo (replace with real aggregations)
     avg_engagement = 85
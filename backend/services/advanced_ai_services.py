@@ -1,16 +1,54 @@
-import openai
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
+import time
 import numpy as np
-from collections import defaultdict
+from collections import Counter, defaultdict
 
-from config import settings
 from models.advanced_features import (
     MentalHealthBaseline, MentalHealthDeviation, 
     ConceptGap, TutoringSession, LearningDisabilityIndicators
 )
+from config import settings
+from models.conversation import RiskLevel
+from services.ai_service import AIService
+from services.keyword_matcher import keyword_matcher
+from services.llm_gateway import llm_gateway
+from services.llm_scheduler import LLMPriority
+from services.rolling_stats import RollingStats
+from services.timeseries_store import TimeSeriesStore
+from services.sentiment import sentiment_scorer
+from services.stage_graph import StageGraph
 
-openai.api_key = settings.OPENAI_API_KEY
+
+class UserSignals:
+    """Rolling mood, typing speed and session frequency for one user (fixed size)"""
+    
+    SESSION_GAP_SECONDS = 30 * 60
+    MAX_SESSIONS_PER_DAY = 24.0
+    
+    __slots__ = ("mood", "typing_speed", "sessions_per_day", "last_message_at", "session_started_at")
+    
+    def __init__(self):
+        self.mood = RollingStats()
+        self.typing_speed = RollingStats()
+        self.sessions_per_day = RollingStats()
+        self.last_message_at: Optional[float] = None
+        self.session_started_at: Optional[float] = None
+    
+    def observe(self, sentiment: float, typing_speed: Optional[float], now: float):
+        """Fold one message into the rolling statistics in O(1)"""
+        self.mood.push(sentiment)
+        if typing_speed:
+            self.typing_speed.push(typing_speed)
+        
+        # A message after a long enough silence starts a new session; the
+        # gap since the previous session start gives the current frequency
+        if self.last_message_at is None or now - self.last_message_at > self.SESSION_GAP_SECONDS:
+            if self.session_started_at is not None:
+                gap_days = max(now - self.session_started_at, 1.0) / 86400
+                self.sessions_per_day.push(min(1 / gap_days, self.MAX_SESSIONS_PER_DAY))
+            self.session_started_at = now
+        self.last_message_at = now
 
 
 class MentalHealthMonitor:
@@ -19,9 +57,46 @@ class MentalHealthMonitor:
     Tracks baseline, detects deviations, triggers interventions
     """
     
+    DEPRESSION_MARKERS = {
+        'hopelessness': ['nothing matters', 'no point', 'give up', 'hopeless*', 'pointless'],
+        'anhedonia': ['don\'t care', 'not interested', 'boring', 'meh', 'whatever'],
+        'fatigue': ['tired', 'exhausted', 'no energy', 'can\'t do', 'too much'],
+        'worthlessness': ['useless', 'failure', 'stupid', 'worthless', 'hate myself'],
+        'isolation': ['alone', 'no one', 'nobody cares', 'lonely']
+    }
+    
+    ANXIETY_MARKERS = {
+        'worry': ['worried', 'anxious', 'scared', 'afraid', 'nervous'],
+        'panic': ['panic', 'can\'t breathe', 'heart racing', 'overwhelming'],
+        'catastrophizing': ['terrible', 'disaster', 'worst', 'always', 'never'],
+        'avoidance': ['can\'t do it', 'too much', 'avoid', 'skip']
+    }
+    
+    CRISIS_TERMS = {
+        'language': [
+            'kill myself', 'killing myself', 'end it', 'suicid*', 'self harm',
+            'self harming', 'self harmed', 'cut myself', 'cutting myself',
+            'die', 'dies', 'died', 'not worth living', 'better off dead'
+        ]
+    }
+    
+    MOOD_HISTORY_RETENTION_DAYS = 90
+    MOOD_HISTORY_LIMIT = 5000
+    
+    # Smallest standard deviations used for z-scores, so a very steady user
+    # doesn't turn a tiny change into a huge deviation
+    MOOD_STD_FLOOR = 0.05
+    TYPING_STD_FLOOR_RATIO = 0.1
+    SESSION_STD_FLOOR = 0.25
+    
     def __init__(self):
         self.baselines = {}  # user_id -> MentalHealthBaseline
-        self.mood_history = defaultdict(list)
+        self.mood_history = TimeSeriesStore(
+            ("sentiment", "risk_score"),
+            retention_seconds=self.MOOD_HISTORY_RETENTION_DAYS * 86400,
+            max_events=self.MOOD_HISTORY_LIMIT
+        )
+        self.signals = defaultdict(UserSignals)  # user_id -> UserSignals
         
     async def analyze_session(
         self, 
@@ -29,30 +104,35 @@ class MentalHealthMonitor:
         message: str,
         voice_tone: dict = None,
         typing_speed: float = None
-    ) -> Tuple[float, str, bool]:
+    ) -> Tuple[float, str, bool, str]:
         """
         Analyze current session for mental health indicators
-        Returns: (risk_score, risk_level, needs_intervention)
+        Returns: (risk_score, risk_level, needs_intervention, sentiment_tier)
         """
-        # Sentiment analysis
-        sentiment = await self._analyze_sentiment(message)
+        # One pass over the text for every marker table
+        hits = keyword_matcher.match(message)
+        
+        # Sentiment analysis (local model, LLM only for ambiguous messages;
+        # never for crisis language, which must not wait on the model)
+        if hits["crisis.language"]:
+            sentiment_result = sentiment_scorer.score(message)
+        else:
+            sentiment_result = await sentiment_scorer.analyze(message)
+        sentiment = sentiment_result.score
         
         # Depression markers
-        depression_score = self._check_depression_markers(message)
+        depression_score = self._check_depression_markers(hits)
         
         # Anxiety markers
-        anxiety_score = self._check_anxiety_markers(message)
+        anxiety_score = self._check_anxiety_markers(hits)
         
         # Hopelessness/crisis language
-        crisis_score = self._check_crisis_language(message)
+        crisis_score = self._check_crisis_language(hits)
         
-        # Compare to baseline
-        if user_id in self.baselines:
-            deviation = self._calculate_deviation(
-                user_id, sentiment, depression_score, anxiety_score
-            )
-        else:
-            deviation = 0
+        # Update rolling statistics and compare to baseline
+        now = time.time()
+        self.signals[user_id].observe(sentiment, typing_speed, now)
+        deviation = self._calculate_deviation(user_id)
         
         # Calculate overall risk
         risk_score = (depression_score * 0.4 + 
@@ -74,178 +154,95 @@ class MentalHealthMonitor:
             needs_intervention = False
         
         # Store mood
-        self.mood_history[user_id].append({
-            'timestamp': datetime.now(),
-            'sentiment': sentiment,
-            'risk_score': risk_score
-        })
+        self.mood_history.append(user_id, now, sentiment=sentiment, risk_score=risk_score)
         
-        return risk_score, risk_level, needs_intervention
+        return risk_score, risk_level, needs_intervention, sentiment_result.tier
     
-    async def _analyze_sentiment(self, text: str) -> float:
-        """Use GPT to analyze sentiment deeply"""
-        try:
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-4",
-                messages=[{
-                    "role": "system",
-                    "content": "Analyze the emotional tone. Return only a number 0-10 where 0=very negative, 5=neutral, 10=very positive."
-                }, {
-                    "role": "user",
-                    "content": text
-                }],
-                temperature=0.3,
-                max_tokens=10
-            )
-            
-            sentiment = float(response.choices[0].message.content.strip())
-            return min(max(sentiment, 0), 10) / 10  # Normalize to 0-1
-            
-        except:
-            return 0.5  # Default neutral
-    
-    def _check_depression_markers(self, text: str) -> float:
+    def _check_depression_markers(self, hits: Counter) -> float:
         """Check for depression indicators"""
-        markers = {
-            'hopelessness': ['nothing matters', 'no point', 'give up', 'hopeless', 'pointless'],
-            'anhedonia': ['don\'t care', 'not interested', 'boring', 'meh', 'whatever'],
-            'fatigue': ['tired', 'exhausted', 'no energy', 'can\'t do', 'too much'],
-            'worthlessness': ['useless', 'failure', 'stupid', 'worthless', 'hate myself'],
-            'isolation': ['alone', 'no one', 'nobody cares', 'lonely']
-        }
-        
-        text_lower = text.lower()
         score = 0
         
-        for category, words in markers.items():
-            if any(word in text_lower for word in words):
+        for category in self.DEPRESSION_MARKERS:
+            if hits[f"depression.{category}"]:
                 score += 0.2
         
         return min(score, 1.0)
     
-    def _check_anxiety_markers(self, text: str) -> float:
+    def _check_anxiety_markers(self, hits: Counter) -> float:
         """Check for anxiety indicators"""
-        markers = {
-            'worry': ['worried', 'anxious', 'scared', 'afraid', 'nervous'],
-            'panic': ['panic', 'can\'t breathe', 'heart racing', 'overwhelming'],
-            'catastrophizing': ['terrible', 'disaster', 'worst', 'always', 'never'],
-            'avoidance': ['can\'t do it', 'too much', 'avoid', 'skip']
-        }
-        
-        text_lower = text.lower()
         score = 0
         
-        for category, words in markers.items():
-            if any(word in text_lower for word in words):
+        for category in self.ANXIETY_MARKERS:
+            if hits[f"anxiety.{category}"]:
                 score += 0.25
         
         return min(score, 1.0)
     
-    def _check_crisis_language(self, text: str) -> float:
+    def _check_crisis_language(self, hits: Counter) -> float:
         """Check for self-harm or suicidal ideation"""
-        crisis_terms = [
-            'kill myself', 'end it', 'suicide', 'self harm',
-            'cut myself', 'die', 'not worth living', 'better off dead'
-        ]
-        
-        text_lower = text.lower()
-        
-        if any(term in text_lower for term in crisis_terms):
+        if hits["crisis.language"]:
             return 1.0
         
         return 0.0
     
-    def _calculate_deviation(
-        self, 
-        user_id: str, 
-        current_sentiment: float,
-        depression_score: float,
-        anxiety_score: float
-    ) -> float:
-        """Calculate deviation from baseline"""
-        if user_id not in self.baselines:
+    def _calculate_deviation(self, user_id: str) -> float:
+        """
+        Calculate deviation from baseline as the largest z-score among
+        mood drop, typing speed change and session frequency drop
+        """
+        baseline = self.baselines.get(user_id)
+        signals = self.signals.get(user_id)
+        if baseline is None or signals is None:
             return 0
         
-        baseline = self.baselines[user_id]
+        # baseline_mood is on a 1-10 scale, sentiment on 0-1
+        mood_drop = -signals.mood.zscore(baseline.baseline_mood / 10, self.MOOD_STD_FLOOR)
         
-        # Get recent history (last 7 days)
-        recent = [m for m in self.mood_history[user_id] 
-                 if m['timestamp'] > datetime.now() - timedelta(days=7)]
+        typing_change = 0.0
+        if signals.typing_speed.count:
+            typical_wpm = baseline.typical_typing_speed_wpm
+            typing_change = abs(signals.typing_speed.zscore(
+                typical_wpm, max(typical_wpm * self.TYPING_STD_FLOOR_RATIO, 1.0)
+            ))
         
-        if not recent:
-            return 0
-        
-        avg_recent_sentiment = np.mean([m['sentiment'] for m in recent])
-        
-        # Calculate mood drop from baseline
-        mood_drop = baseline.baseline_mood - avg_recent_sentiment
+        session_drop = 0.0
+        if signals.sessions_per_day.count:
+            session_drop = -signals.sessions_per_day.zscore(
+                baseline.typical_session_frequency, self.SESSION_STD_FLOOR
+            )
         
-        return max(mood_drop, 0)
+        return max(mood_drop, typing_change, session_drop, 0)
     
     async def generate_intervention(
         self, 
         risk_level: str,
         context: str
     ) -> str:
-        """Generate appropriate AI intervention response"""
+        """
+        Generate appropriate AI intervention response.
+        Critical and high risk get the vetted crisis reply at once, without
+        a model call; crisis_followup personalizes it in the background.
+        """
         
-        if risk_level == "critical":
-            prompt = f"""You are a crisis counselor AI. A student is showing signs of severe distress or suicidal ideation.
-
-Context: {context}
-
-Respond with:
-1. Immediate validation and support
-2. Grounding technique or breathing exercise
-3. Offer to connect them to immediate help
-4. Provide crisis hotline numbers
-
-Be warm, non-judgmental, and urgent about safety."""
-
-        elif risk_level == "high":
-            prompt = f"""A student is showing elevated signs of depression or anxiety.
-
-Context: {context}
-
-Respond with:
-1. Empathetic acknowledgment
-2. One small, achievable coping skill
-3. Encourage them to talk about it
-4. Suggest connecting with counselor
-
-Be supportive and gentle."""
-
-        else:
-            prompt = f"""A student may be experiencing some stress.
+        if risk_level in ("critical", "high"):
+            return AIService.CRISIS_INTERVENTIONS[RiskLevel(risk_level)]
+        
+        prompt = f"""A student may be experiencing some stress.
 
 Context: {context}
 
 Respond with casual check-in and light support."""
         
         try:
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-4",
+            return await llm_gateway.chat(
                 messages=[
                     {"role": "system", "content": "You are EggJam AI, a compassionate mental health support assistant."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.7,
                 max_tokens=300
             )
             
-            return response.choices[0].message.content
-            
         except Exception as e:
-            # Fallback responses
-            if risk_level == "critical":
-                return """I'm really concerned about you right now. What you're feeling is real and important. 
-
-Let's take a moment together - can you try taking 3 deep breaths with me?
-
-I want to connect you with someone who can help immediately. The National Crisis Helpline is 08046110007. They're available 24/7.
-
-You're not alone. I'm here. Will you talk to me about what's happening?"""
-            
             return "I'm here to listen. How are you feeling right now?"
 
 
@@ -265,26 +262,60 @@ class AcademicTutor:
         """
         Main tutoring function
         Returns: teaching response, identified gaps, follow-up questions
+        
+        Classification and gap identification run concurrently; the
+        teaching response waits for both and practice only for the gaps.
+        All stages share one deadline and degrade to fallbacks if they miss it.
         """
+        graph = StageGraph()
         
-        # First, understand what they're asking
-        understanding = await self._classify_question(question, subject)
+        # Understand what they're asking
+        graph.add(
+            "classify",
+            lambda: self._classify_question(question, subject),
+            fallback=lambda: self._default_classification(subject)
+        )
         
         # Identify if there's a concept gap
-        gaps = await self._identify_concept_gaps(question, subject, grade_level)
+        graph.add(
+            "gaps",
+            lambda: self._identify_concept_gaps(question, subject, grade_level),
+            fallback=list
+        )
         
         # Generate Socratic teaching response
-        teaching_response = await self._generate_teaching_response(
-            question, subject, understanding, gaps, grade_level
+        graph.add(
+            "teaching",
+            lambda classify, gaps: self._generate_teaching_response(
+                question, subject, classify, gaps, grade_level
+            ),
+            depends_on=("classify", "gaps"),
+            fallback=lambda classify, gaps: self._fallback_teaching_response(subject)
         )
         
+        graph.add(
+            "practice",
+            lambda gaps: self._suggest_practice(subject, gaps),
+            depends_on=("gaps",),
+            fallback=lambda gaps: []
+        )
+        
+        results, metadata = await graph.run(settings.TUTOR_DEADLINE_SECONDS)
+        
         return {
-            'response': teaching_response,
-            'identified_gaps': gaps,
-            'suggested_practice': await self._suggest_practice(subject, gaps),
-            'encouragement': self._generate_encouragement()
+            'response': results["teaching"],
+            'identified_gaps': results["gaps"],
+            'suggested_practice': results["practice"],
+            'encouragement': self._generate_encouragement(),
+            'metadata': metadata
         }
     
+    def _default_classification(self, subject: str) -> Dict:
+        return {"type": "general_confusion", "specific_topic": subject, "difficulty": "intermediate"}
+    
+    def _fallback_teaching_response(self, subject: str) -> str:
+        return f"Great question! Let's think about this together. What do you already know about {subject}? Let's start from there."
+    
     async def _classify_question(self, question: str, subject: str) -> Dict:
         """Understand what type of help they need"""
         prompt = f"""Classify this student question:
@@ -300,16 +331,16 @@ Return JSON:
 }}"""
 
         try:
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-4",
+            content = await llm_gateway.chat(
                 messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
+                temperature=0.3,
+                priority=LLMPriority.TUTORING
             )
             
             import json
-            return json.loads(response.choices[0].message.content)
+            return json.loads(content)
         except:
-            return {"type": "general_confusion", "specific_topic": subject, "difficulty": "intermediate"}
+            return self._default_classification(subject)
     
     async def _identify_concept_gaps(
         self, 
@@ -331,14 +362,14 @@ What prerequisite concepts might they be missing? Return JSON array:
 ]"""
 
         try:
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-4",
+            content = await llm_gateway.chat(
                 messages=[{"role": "user", "content": prompt}],
-                temperature=0.4
+                temperature=0.4,
+                priority=LLMPriority.TUTORING
             )
             
             import json
-            gaps_data = json.loads(response.choices[0].message.content)
+            gaps_data = json.loads(content)
             
             return [
                 ConceptGap(
@@ -384,20 +415,17 @@ Respond using the Socratic Method:
 Keep response under 150 words."""
 
         try:
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-4",
+            return await llm_gateway.chat(
                 messages=[
                     {"role": "system", "content": "You are a patient, Socratic tutor who helps students discover answers."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.7,
-                max_tokens=300
+                max_tokens=300,
+                priority=LLMPriority.TUTORING
             )
             
-            return response.choices[0].message.content
-            
         except Exception as e:
-            return f"Great question! Let's think about this together. What do you already know about {subject}? Let's start from there."
+            return self._fallback_teaching_response(subject)
     
     async def _suggest_practice(self, subject: str, gaps: List[ConceptGap]) -> List[str]:
         """Suggest practice problems or resources"""
@@ -430,5 +458,9 @@ Keep response under 150 words."""
 
 
 # Singleton instances
+keyword_matcher.register("depression", MentalHealthMonitor.DEPRESSION_MARKERS)
+keyword_matcher.register("anxiety", MentalHealthMonitor.ANXIETY_MARKERS)
+keyword_matcher.register("crisis", MentalHealthMonitor.CRISIS_TERMS)
+
 mental_health_monitor = MentalHealthMonitor()
 academic_tutor = AcademicTutor()
@@ -1,13 +1,10 @@
-import openai
-from typing import List, Tuple
+from typing import AsyncIterator, List, Tuple
 from datetime import datetime
 import re
 
-from config import settings
 from models.conversation import Message, MessageRole, RiskLevel
-
-# Initialize OpenAI client
-openai.api_key = settings.OPENAI_API_KEY
+from services.keyword_matcher import keyword_matcher
+from services.llm_gateway import llm_gateway, LLMError
 
 
 class AIService:
@@ -33,14 +30,32 @@ class AIService:
     
     # Crisis keywords for risk detection
     CRISIS_KEYWORDS = {
-        "critical": ["suicide", "kill myself", "end my life", "want to die", "not worth living"],
-        "high": ["self-harm", "hurt myself", "cutting", "harm", "hopeless"],
-        "medium": ["depressed", "anxiety attack", "can't cope", "overwhelming", "can't go on"],
-        "low": ["stressed", "worried", "sad", "anxious", "upset"]
+        "critical": ["suicid*", "kill myself", "killing myself", "end my life", "ending my life",
+                     "want to die", "not worth living"],
+        "high": ["self-harm", "self-harming", "self-harmed", "hurt myself", "hurting myself", "cutting",
+                 "harm", "harms", "harmed", "harming", "hopeless*"],
+        "medium": ["depressed", "anxiety attack", "anxiety attacks", "can't cope", "overwhelming", "can't go on"],
+        "low": ["stressed", "distressed", "worried", "sad", "sadly", "sadness", "anxious*", "upset*"]
     }
     
-    def __init__(self):
-        self.model = settings.OPENAI_MODEL
+    # Vetted replies for high and critical risk, sent without waiting on the
+    # model; a personalized follow-up is generated afterwards (crisis_followup)
+    CRISIS_INTERVENTIONS = {
+        RiskLevel.CRITICAL: """I'm really concerned about you right now. What you're feeling is real and important. 
+
+Let's take a moment together - can you try taking 3 deep breaths with me?
+
+I want to connect you with someone who can help immediately. The National Crisis Helpline is 08046110007. They're available 24/7.
+
+You're not alone. I'm here. Will you talk to me about what's happening?""",
+        RiskLevel.HIGH: """Thank you for telling me this. It sounds like things are really hard right now, and you don't have to handle it alone.
+
+Try this with me: name 5 things you can see, 4 you can hear and 3 you can touch. It can help slow things down a little.
+
+Talking to a counselor or someone you trust can really help - the helplines below are free and confidential.
+
+I'm still here. What's weighing on you the most right now?"""
+    }
     
     async def get_response(
         self, 
@@ -61,28 +76,71 @@ class AIService:
         Returns:
             Tuple of (AI response, risk level)
         """
+        # Assess risk level before any model call
+        risk_level = self._assess_risk(user_message)
+        
+        # Crisis fast path: answer now, never behind the model
+        if self.is_crisis(risk_level):
+            return self.CRISIS_INTERVENTIONS[risk_level], risk_level
+        
         # Build messages for OpenAI
         messages = self._build_messages(user_message, conversation_history, age_group)
         
         # Get AI response
         try:
-            response = await openai.ChatCompletion.acreate(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500
-            )
-            
-            ai_response = response.choices[0].message.content
+            ai_response = await llm_gateway.chat(messages, max_tokens=500)
             
         except Exception as e:
             print(f"OpenAI API Error: {e}")
             ai_response = "I'm here to listen. Could you tell me more about what you're experiencing?"
         
-        # Assess risk level
+        return ai_response, risk_level
+    
+    async def stream_response(
+        self,
+        user_message: str,
+        conversation_history: List[Message],
+        age_group: str = "13-18",
+        language: str = "en"
+    ) -> AsyncIterator[dict]:
+        """
+        Stream the AI response as frames.
+        
+        Risk is assessed before the model is called, so the first frame
+        always carries the risk level and any crisis resources:
+            {"type": "risk", "risk_level", "suggested_resources", "needs_counselor_attention"}
+            {"type": "token", "content"}  (repeated)
+            {"type": "done", "message"}
+        """
         risk_level = self._assess_risk(user_message)
+        yield {
+            "type": "risk",
+            "risk_level": risk_level.value,
+            "suggested_resources": self.get_crisis_resources(risk_level) if risk_level != RiskLevel.NONE else None,
+            "needs_counselor_attention": risk_level in (RiskLevel.HIGH, RiskLevel.CRITICAL)
+        }
+        
+        if self.is_crisis(risk_level):
+            reply = self.CRISIS_INTERVENTIONS[risk_level]
+            yield {"type": "token", "content": reply}
+            yield {"type": "done", "message": reply}
+            return
         
-        return ai_response, risk_level
+        messages = self._build_messages(user_message, conversation_history, age_group)
+        tokens: List[str] = []
+        
+        try:
+            async for token in llm_gateway.stream_chat(messages, max_tokens=500):
+                tokens.append(token)
+                yield {"type": "token", "content": token}
+        except LLMError as e:
+            print(f"OpenAI API Error: {e}")
+            if not tokens:
+                fallback = "I'm here to listen. Could you tell me more about what you're experiencing?"
+                tokens.append(fallback)
+                yield {"type": "token", "content": fallback}
+        
+        yield {"type": "done", "message": "".join(tokens)}
     
     def _build_messages(
         self, 
@@ -107,33 +165,28 @@ class AIService:
         
         return messages
     
+    @staticmethod
+    def is_crisis(risk_level: RiskLevel) -> bool:
+        """High and critical risk take the crisis fast path."""
+        return risk_level in (RiskLevel.HIGH, RiskLevel.CRITICAL)
+    
     def _assess_risk(self, message: str) -> RiskLevel:
         """
         Assess mental health risk level from user message.
         
         This is a basic keyword-based approach. In production, use ML models.
         """
-        message_lower = message.lower()
-        
-        # Check for critical risk
-        for keyword in self.CRISIS_KEYWORDS["critical"]:
-            if keyword in message_lower:
-                return RiskLevel.CRITICAL
-        
-        # Check for high risk
-        for keyword in self.CRISIS_KEYWORDS["high"]:
-            if keyword in message_lower:
-                return RiskLevel.HIGH
-        
-        # Check for medium risk
-        for keyword in self.CRISIS_KEYWORDS["medium"]:
-            if keyword in message_lower:
-                return RiskLevel.MEDIUM
-        
-        # Check for low risk
-        for keyword in self.CRISIS_KEYWORDS["low"]:
-            if keyword in message_lower:
-                return RiskLevel.LOW
+        hits = keyword_matcher.match(message)
+        
+        # Highest matching tier wins
+        if hits["risk.critical"]:
+            return RiskLevel.CRITICAL
+        if hits["risk.high"]:
+            return RiskLevel.HIGH
+        if hits["risk.medium"]:
+            return RiskLevel.MEDIUM
+        if hits["risk.low"]:
+            return RiskLevel.LOW
         
         return RiskLevel.NONE
     
@@ -160,5 +213,7 @@ class AIService:
             return []
 
 
+keyword_matcher.register("risk", AIService.CRISIS_KEYWORDS)
+
 # Global instance
 ai_service = AIService()
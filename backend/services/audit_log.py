@@ -0,0 +1,360 @@
+import asyncio
+import glob
+import json
+import os
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from config import settings
+from database import AsyncSessionLocal
+from models.platform_config import AuditLog
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: no cross-worker spill recovery
+    fcntl = None
+
+
+class AuditLogWriter:
+    """
+    Audit events are appended to a local spill file (one JSON line each)
+    and put on a bounded queue; a background task bulk-inserts them into
+    audit_logs, AUDIT_BATCH_SIZE rows per INSERT or whatever arrived within
+    AUDIT_FLUSH_INTERVAL_MS.
+
+    `record` never waits: once AUDIT_QUEUE_SIZE events are pending, new
+    ones are only in the spill file and the writer reads them back from
+    there when the queue drains, so a slow or unavailable database costs
+    disk rather than memory or request latency. A batch that fails
+    AUDIT_MAX_RETRIES times in a row is moved to failed-audit-{owner}.jsonl
+    (not replayed automatically) so one bad batch can't stall the log.
+    The spill file rotates every AUDIT_SEGMENT_EVENTS events and a segment
+    is deleted once all its events are committed. Segments left behind by a
+    worker that died (its lock file is no longer held) are replayed by
+    `start`; delivery is at-least-once, so an event committed just before a
+    crash can appear twice.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, spill_dir: str = None, queue_size: int = None,
+                 batch_size: int = None, interval_ms: float = None, segment_events: int = None,
+                 max_retries: int = None):
+        self._sessions = session_factory
+        self.spill_dir = spill_dir or settings.AUDIT_SPILL_DIR
+        self.batch_size = batch_size or settings.AUDIT_BATCH_SIZE
+        self.interval = (interval_ms or settings.AUDIT_FLUSH_INTERVAL_MS) / 1000
+        self.segment_events = segment_events or settings.AUDIT_SEGMENT_EVENTS
+        self.max_retries = max_retries or settings.AUDIT_MAX_RETRIES
+        self._queue: "asyncio.Queue[Tuple[int, Dict]]" = asyncio.Queue(maxsize=queue_size or settings.AUDIT_QUEUE_SIZE)
+        self._inflight: List[Tuple[int, Dict]] = []
+        self._flush_lock = asyncio.Lock()
+        self._writer: Optional[asyncio.Task] = None
+        self._started = False
+
+        # Spill state: this worker's files are audit-{owner}-{n}.jsonl,
+        # guarded by audit-{owner}.lock for as long as the worker lives
+        self._owner = uuid.uuid4().hex[:12]
+        self._lock_fd: Optional[int] = None
+        self._segment_fd: Optional[int] = None
+        self._segment_index = 0
+        self._segment_count = 0
+        self._closed_segments: Deque[Tuple[str, int]] = deque()
+        self._seq = 0
+        self._committed = 0
+        # First event that is only in the spill file (the queue was full)
+        self._overflow_from: Optional[int] = None
+
+    # ----- spill files -----
+
+    def _path(self, owner: str, index: int = None) -> str:
+        name = f"audit-{owner}.lock" if index is None else f"audit-{owner}-{index:06d}.jsonl"
+        return os.path.join(self.spill_dir, name)
+
+    def _open_spill(self):
+        if self._lock_fd is not None:
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        # Lock under a temporary name first so a starting worker never sees
+        # our lock file unlocked and mistakes us for a crashed one
+        tmp = self._path(self._owner) + ".tmp"
+        self._lock_fd = os.open(tmp, os.O_CREAT | os.O_RDWR, 0o600)
+        if fcntl is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.replace(tmp, self._path(self._owner))
+
+    def _spill(self, seq: int, row: Dict):
+        self._open_spill()
+        if self._segment_fd is None:
+            self._segment_index += 1
+            self._segment_count = 0
+            self._segment_fd = os.open(
+                self._path(self._owner, self._segment_index), os.O_CREAT | os.O_WRONLY | os.O_APPEND, 0o600
+            )
+        line = json.dumps({"seq": seq, **row}, default=str) + "\n"
+        # One write() per event: a crash leaves at most a torn last line
+        os.write(self._segment_fd, line.encode())
+        self._segment_count += 1
+        if self._segment_count >= self.segment_events:
+            self._rotate()
+
+    def _rotate(self):
+        os.close(self._segment_fd)
+        self._segment_fd = None
+        self._closed_segments.append((self._path(self._owner, self._segment_index), self._seq))
+
+    def _release_segments(self):
+        """Delete spill segments whose events are all committed"""
+        if self._segment_fd is not None and self._committed >= self._seq:
+            self._rotate()
+        while self._closed_segments and self._closed_segments[0][1] <= self._committed:
+            path, _ = self._closed_segments.popleft()
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _read_events(path: str) -> List[Tuple[int, Dict]]:
+        events = []
+        with open(path) as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue  # torn write from the crash
+                seq = event.pop("seq", 0)
+                if event.get("timestamp"):
+                    event["timestamp"] = datetime.fromisoformat(event["timestamp"])
+                events.append((seq, event))
+        return events
+
+    @classmethod
+    def _read_segment(cls, path: str) -> List[Dict]:
+        return [row for _, row in cls._read_events(path)]
+
+    def _read_backlog(self, start: int, limit: int) -> List[Tuple[int, Dict]]:
+        """Up to `limit` of this worker's spilled events from seq `start` on"""
+        events = []
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, f"audit-{self._owner}-*.jsonl"))):
+            for seq, row in self._read_events(path):
+                if seq >= start:
+                    events.append((seq, row))
+                    if len(events) >= limit:
+                        return events
+        return events
+
+    def _dead_letter(self, batch: List[Tuple[int, Dict]]):
+        path = os.path.join(self.spill_dir, f"failed-audit-{self._owner}.jsonl")
+        try:
+            with open(path, "a") as f:
+                for seq, row in batch:
+                    f.write(json.dumps({"seq": seq, **row}, default=str) + "\n")
+            print(f"Gave up writing {len(batch)} audit events, moved them to {path}")
+        except Exception as e:
+            print(f"Gave up writing {len(batch)} audit events and could not save them: {e}")
+
+    async def start(self):
+        """Replay spill files left by workers that exited without flushing"""
+        if self._started:
+            return
+        self._started = True
+        try:
+            self._open_spill()
+        except Exception as e:
+            print(f"Audit spill directory unavailable: {e}")
+            return
+
+        for lock_path in glob.glob(os.path.join(self.spill_dir, "audit-*.lock")):
+            owner = os.path.basename(lock_path)[len("audit-"):-len(".lock")]
+            if owner == self._owner:
+                continue
+            try:
+                fd = os.open(lock_path, os.O_RDWR)
+            except FileNotFoundError:
+                continue  # another worker is replaying it
+            try:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue  # owner is alive
+                if await self._replay(owner):
+                    os.remove(lock_path)
+            finally:
+                os.close(fd)
+
+    async def _replay(self, owner: str) -> bool:
+        replayed = 0
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, f"audit-{owner}-*.jsonl"))):
+            rows = await asyncio.to_thread(self._read_segment, path)
+            for i in range(0, len(rows), self.batch_size):
+                if not await self._insert(rows[i:i + self.batch_size]):
+                    return False
+            os.remove(path)
+            replayed += len(rows)
+        if replayed:
+            print(f"Replayed {replayed} audit events left by worker {owner}")
+        return True
+
+    # ----- queue and writer -----
+
+    async def record(self, action: str, user_id: Optional[str] = None, resource: Optional[str] = None,
+                     details: Optional[Dict[str, Any]] = None, ip_address: Optional[str] = None):
+        """Queue an audit event; past AUDIT_QUEUE_SIZE pending it stays in the spill file only"""
+        row = {
+            "user_id": str(user_id) if user_id is not None else None,
+            "action": action,
+            "resource": resource,
+            "details": details,
+            "ip_address": ip_address,
+            "timestamp": datetime.utcnow()
+        }
+        self._seq += 1
+        try:
+            self._spill(self._seq, row)
+            spilled = True
+        except Exception as e:
+            print(f"Audit spill write failed, event kept in memory only: {e}")
+            spilled = False
+        self._start_writer()
+        # Behind a backlog on disk, new events queue up behind it, in order
+        if self._overflow_from is None:
+            try:
+                self._queue.put_nowait((self._seq, row))
+                return
+            except asyncio.QueueFull:
+                if spilled:
+                    self._overflow_from = self._seq
+                    return
+        elif spilled:
+            return
+        print(f"Audit queue full and spill file unavailable, dropped event {action}")
+
+    async def _refill(self):
+        """Queue events that went only to the spill file while the queue was full"""
+        start, room = self._overflow_from, self._queue.maxsize - self._queue.qsize()
+        if start is None or room <= 0:
+            return
+        events = await asyncio.to_thread(self._read_backlog, start, room)
+        if self._overflow_from != start:
+            return  # another refill got there first
+        for event in events:
+            self._queue.put_nowait(event)
+        if not events or events[-1][0] >= self._seq:
+            self._overflow_from = None
+        else:
+            self._overflow_from = events[-1][0] + 1
+
+    def _start_writer(self):
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._write_loop())
+
+    async def _fill_batch(self):
+        loop = asyncio.get_running_loop()
+        if not self._inflight:
+            if self._queue.empty() and self._overflow_from is not None:
+                await self._refill()
+            self._inflight.append(await self._queue.get())
+        deadline = loop.time() + self.interval
+        while len(self._inflight) < self.batch_size:
+            if not self._queue.empty():
+                self._inflight.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                self._inflight.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _write_loop(self):
+        delay = 1.0
+        failures = 0
+        while True:
+            await self._fill_batch()
+            async with self._flush_lock:
+                written = await self._write(self._inflight)
+                if not written and failures + 1 >= self.max_retries:
+                    self._dead_letter(self._inflight)
+                    self._mark_committed(self._inflight)
+                    written = True
+            if written:
+                self._inflight = []
+                delay = 1.0
+                failures = 0
+            else:
+                # Keep the batch; new events pile up in the spill file meanwhile
+                failures += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+    async def _insert(self, rows: List[Dict]) -> bool:
+        try:
+            async with self._sessions() as db:
+                await db.execute(insert(AuditLog), rows)
+                await db.commit()
+            return True
+        except Exception as e:
+            print(f"Audit log write failed, will retry: {e}")
+            return False
+
+    async def _write(self, batch: List[Tuple[int, Dict]]) -> bool:
+        if not batch:
+            return True
+        if not await self._insert([row for _, row in batch]):
+            return False
+        self._mark_committed(batch)
+        return True
+
+    def _mark_committed(self, batch: List[Tuple[int, Dict]]):
+        if batch:
+            self._committed = max(self._committed, batch[-1][0])
+            self._release_segments()
+
+    async def flush(self):
+        """Write everything queued so far (the writer keeps running)"""
+        async with self._flush_lock:
+            pending, self._inflight = self._inflight, []
+            while True:
+                while not self._queue.empty():
+                    pending.append(self._queue.get_nowait())
+                for i in range(0, len(pending), self.batch_size):
+                    if not await self._write(pending[i:i + self.batch_size]):
+                        # Put the rest back in front of anything the writer picked up since
+                        self._inflight = pending[i:] + self._inflight
+                        return
+                pending = []
+                if self._overflow_from is None:
+                    return
+                await self._refill()
+
+    async def close(self):
+        """Stop the writer and flush; anything unwritten stays in the spill file"""
+        if self._writer is not None:
+            # Holding the lock means the writer is not midway through a write
+            async with self._flush_lock:
+                self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        await self.flush()
+        self._inflight = []
+        if self._segment_fd is not None:
+            os.close(self._segment_fd)
+            self._segment_fd = None
+        if self._lock_fd is not None:
+            if self._committed >= self._seq:
+                os.remove(self._path(self._owner))
+            # Closing releases the lock; leftovers are replayed on next start
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+
+# Global instance
+audit_log = AuditLogWriter()
@@ -1,17 +1,18 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import settings
-from database import get_db
+from database import AsyncSessionLocal, get_db
 from models.db_models import User, UserRole
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from services.jwks import jwks_cache, verified_tokens
+from services.password_hasher import password_hasher
+from services.principal_cache import Principal, current_principal, principal_cache
+from services.user_counters import user_counters
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -26,14 +27,15 @@ class AuthService:
     """Authentication and authorization service"""
     
     @staticmethod
-    def verify_password(plain_password: str, hashed_password: str) -> bool:
-        """Verify a password against its hash"""
-        return pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(plain_password: str, hashed_password: str) -> bool:
+        """Verify a password against its hash (on the hashing pool)"""
+        matches, _ = await password_hasher.verify_and_update(plain_password, hashed_password)
+        return matches
     
     @staticmethod
-    def get_password_hash(password: str) -> str:
-        """Hash a password"""
-        return pwd_context.hash(password)
+    async def get_password_hash(password: str) -> str:
+        """Hash a password at BCRYPT_ROUNDS (on the hashing pool)"""
+        return await password_hasher.hash(password)
     
     @staticmethod
     def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -51,38 +53,64 @@ class AuthService:
         return encoded_jwt
     
     @staticmethod
-    def verify_token(token: str) -> dict:
-        """Verify and decode JWT token"""
-        try:
-            # Try verifying with local secret (HS256)
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    async def verify_token(token: str) -> Optional[dict]:
+        """
+        Verify and decode a JWT: our own HS256 tokens against SECRET_KEY,
+        Clerk RS256 tokens against the JWKS_URL key set. Verified claims are
+        cached until `exp`, so repeat calls skip the signature check.
+        """
+        payload = verified_tokens.get(token)
+        if payload is not None:
             return payload
-        except JWTError:
-            # FOR DEMO ONLY: If verification fails (e.g. Clerk RS256 token),
-            # decode without verification to allow the app to work.
-            # IN PRODUCTION: You must verify against Clerk's JWKS.
-            try:
-                print("⚠️ DEMO MODE: Accepting unverified token (Clerk)")
-                return jwt.get_unverified_claims(token)
-            except Exception:
+        
+        try:
+            header = jwt.get_unverified_header(token)
+            algorithm = header.get("alg")
+            
+            if algorithm == ALGORITHM:
+                payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            elif algorithm == "RS256":
+                key = await jwks_cache.get_key(header.get("kid"))
+                if key is None:
+                    return None
+                payload = jwt.decode(
+                    token,
+                    key,
+                    algorithms=["RS256"],
+                    issuer=settings.JWT_ISSUER or None,
+                    options={"verify_aud": False}
+                )
+            else:
                 return None
+        except JWTError:
+            return None
+        
+        verified_tokens.put(token, payload)
+        return payload
     
     @staticmethod
-    def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+    async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
         """Authenticate user by email and password"""
-        user = db.query(User).filter(User.email == email).first()
+        result = await db.execute(select(User).where(User.email == email))
+        user = result.scalars().first()
         
         if not user:
             return None
         
-        if not AuthService.verify_password(password, user.hashed_password):
+        matches, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+        if not matches:
             return None
         
+        # Stored at a different bcrypt cost: upgrade it now that we have the password
+        if new_hash:
+            user.hashed_password = new_hash
+            await db.commit()
+        
         return user
     
     @staticmethod
-    def create_user(
-        db: Session,
+    async def create_user(
+        db: AsyncSession,
         email: str,
         password: str,
         full_name: str,
@@ -92,11 +120,11 @@ class AuthService:
         """Create a new user"""
         
         # Check if user already exists
-        existing_user = db.query(User).filter(User.email == email).first()
-        if existing_user:
+        result = await db.execute(select(User.id).where(User.email == email))
+        if result.first():
             raise ValueError("User with this email already exists")
         
-        hashed_password = AuthService.get_password_hash(password)
+        hashed_password = await AuthService.get_password_hash(password)
         
         user = User(
             email=email,
@@ -107,55 +135,75 @@ class AuthService:
         )
         
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
         
         return user
     
     @staticmethod
-    def update_last_login(db: Session, user_id: int):
-        """Update user's last login timestamp"""
-        user = db.query(User).filter(User.id == user_id).first()
-        if user:
-            user.last_login = datetime.utcnow()
-            db.commit()
+    def update_last_login(user_id: str):
+        """Record the user's last login (written with the next counter flush)"""
+        user_counters.set(user_id, "last_login", datetime.utcnow())
 
 
-# Dependency to get current user
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user"""
+async def principal_for_token(token: str, db: AsyncSession = None) -> Optional[Principal]:
+    """
+    The Principal behind a token, or None if the token is invalid or its
+    user is gone. Cached per token, so repeat calls skip both token
+    verification and the users lookup (`db` is only opened on a miss).
+    """
+    await principal_cache.sync()
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
     
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+    payload = await AuthService.verify_token(token)
+    if payload is None or payload.get("sub") is None:
+        return None
     
-    payload = AuthService.verify_token(token)
-    if payload is None:
-        raise credentials_exception
+    query = select(User.id, User.role, User.school_id, User.is_active).where(User.id == payload["sub"])
+    if db is None:
+        async with AsyncSessionLocal() as session:
+            row = (await session.execute(query)).first()
+    else:
+        row = (await db.execute(query)).first()
+    if row is None:
+        return None
     
-    user_id: int = payload.get("sub")
-    if user_id is None:
-        raise credentials_exception
+    principal = Principal(id=row.id, role=row.role, school_id=row.school_id, is_active=row.is_active)
+    principal_cache.put(token, principal, payload.get("exp"))
+    return principal
+
+
+# Dependency to get current user
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> Principal:
+    """
+    Get current authenticated user as a Principal (id, role, school_id,
+    is_active), via principal_for_token.
+    """
+    principal = await principal_for_token(token, db)
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise credentials_exception
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
-    if not user.is_active:
+    if not principal.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     
-    return user
+    current_principal.set(principal)
+    return principal
 
 
 # Dependency to get current active user
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Principal = Depends(get_current_user)
+) -> Principal:
     """Get current active user"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -165,7 +213,7 @@ async def get_current_active_user(
 # Role-based access control decorators
 def require_role(*allowed_roles: UserRole):
     """Dependency to check if user has required role"""
-    async def role_checker(current_user: User = Depends(get_current_user)) -> User:
+    async def role_checker(current_user: Principal = Depends(get_current_user)) -> Principal:
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -177,26 +225,32 @@ def require_role(*allowed_roles: UserRole):
 
 # Specific role dependencies
 async def get_current_student(
-    current_user: User = Depends(require_role(UserRole.STUDENT))
-) -> User:
+    current_user: Principal = Depends(require_role(UserRole.STUDENT))
+) -> Principal:
     return current_user
 
 
 async def get_current_parent(
-    current_user: User = Depends(require_role(UserRole.PARENT))
-) -> User:
+    current_user: Principal = Depends(require_role(UserRole.PARENT))
+) -> Principal:
     return current_user
 
 
 async def get_current_counselor(
-    current_user: User = Depends(require_role(UserRole.COUNSELOR, UserRole.ADMIN))
-) -> User:
+    current_user: Principal = Depends(require_role(UserRole.COUNSELOR, UserRole.ADMIN))
+) -> Principal:
     return current_user
 
 
 async def get_current_admin(
-    current_user: User = Depends(require_role(UserRole.ADMIN, UserRole.SCHOOL_ADMIN))
-) -> User:
+    current_user: Principal = Depends(require_role(UserRole.ADMIN, UserRole.SCHOOL_ADMIN))
+) -> Principal:
+    return current_user
+
+
+async def get_current_platform_admin(
+    current_user: Principal = Depends(require_role(UserRole.PLATFORM_ADMIN))
+) -> Principal:
     return current_user
 
 
@@ -211,9 +265,9 @@ class EmailService:
         return AuthService.create_access_token(data, timedelta(hours=24))
     
     @staticmethod
-    def verify_email_token(token: str) -> Optional[str]:
+    async def verify_email_token(token: str) -> Optional[str]:
         """Verify email token and return email"""
-        payload = AuthService.verify_token(token)
+        payload = await AuthService.verify_token(token)
         if payload and payload.get("type") == "verify":
             return payload.get("email")
         return None
@@ -247,22 +301,23 @@ class PasswordResetService:
         return AuthService.create_access_token(data, timedelta(hours=1))
     
     @staticmethod
-    def verify_reset_token(token: str) -> Optional[str]:
+    async def verify_reset_token(token: str) -> Optional[str]:
         """Verify reset token and return email"""
-        payload = AuthService.verify_token(token)
+        payload = await AuthService.verify_token(token)
         if payload and payload.get("type") == "reset":
             return payload.get("email")
         return None
     
     @staticmethod
-    def reset_password(db: Session, email: str, new_password: str) -> bool:
+    async def reset_password(db: AsyncSession, email: str, new_password: str) -> bool:
         """Reset user password"""
-        user = db.query(User).filter(User.email == email).first()
+        result = await db.execute(select(User).where(User.email == email))
+        user = result.scalars().first()
         if not user:
             return False
         
-        user.hashed_password = AuthService.get_password_hash(new_password)
-        db.commit()
+        user.hashed_password = await AuthService.get_password_hash(new_password)
+        await db.commit()
         
         return True
 
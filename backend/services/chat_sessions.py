@@ -0,0 +1,318 @@
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from config import settings
+from database import AsyncSessionLocal
+from models.conversation import Message, MessageRole, RiskLevel, SessionHistory
+from models.db_models import Conversation, Message as MessageRow, RiskLevel as DbRiskLevel, User
+
+# The API says "medium" where the database enum says "moderate"
+_TO_DB_RISK = {RiskLevel.MEDIUM: DbRiskLevel.MODERATE}
+_FROM_DB_RISK = {DbRiskLevel.MODERATE: RiskLevel.MEDIUM}
+
+
+def _to_db_risk(level: Optional[RiskLevel]) -> DbRiskLevel:
+    level = RiskLevel(level or RiskLevel.NONE)
+    return _TO_DB_RISK.get(level) or DbRiskLevel(level.value)
+
+
+def _from_db_risk(level: Optional[DbRiskLevel]) -> RiskLevel:
+    level = level or DbRiskLevel.NONE
+    return _FROM_DB_RISK.get(level) or RiskLevel(level.value)
+
+
+class UnknownUserError(Exception):
+    """Raised when a session is started for a user id that isn't in `users`."""
+
+
+class ChatSessionRepository:
+    """
+    Chat sessions backed by the `conversations` / `messages` tables.
+
+    Active sessions sit in a bounded LRU; a miss rehydrates the session from
+    the database. New messages are queued and written by a background task
+    every CHAT_FLUSH_BATCH_SIZE messages or CHAT_FLUSH_INTERVAL_MS, whichever
+    comes first, so a chat turn never waits on an INSERT.
+
+    A session this worker has seen in the database is never inserted again:
+    if its row is gone at flush time another worker deleted it, so the
+    queued messages are dropped and the session is evicted.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, cache_size: int = None,
+                 batch_size: int = None, interval_ms: float = None, max_pending: int = None):
+        self._sessions = session_factory
+        self.cache_size = cache_size or settings.CHAT_SESSION_CACHE_SIZE
+        self.batch_size = batch_size or settings.CHAT_FLUSH_BATCH_SIZE
+        self.interval = (interval_ms or settings.CHAT_FLUSH_INTERVAL_MS) / 1000.0
+        self.max_pending = max_pending or settings.CHAT_MAX_PENDING_MESSAGES
+
+        self._cache: "OrderedDict[str, SessionHistory]" = OrderedDict()
+        # Queued message rows, plus the session each one belongs to
+        self._pending: List[Dict] = []
+        self._dirty: Dict[str, SessionHistory] = {}
+        # Sessions known to have a row, among the cached and queued ones
+        self._persisted: Set[str] = set()
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._writer: Optional[asyncio.Task] = None
+
+    # ----- hot cache -----
+
+    def _remember(self, session: SessionHistory):
+        self._cache[session.session_id] = session
+        self._cache.move_to_end(session.session_id)
+        while len(self._cache) > self.cache_size:
+            evicted, _ = self._cache.popitem(last=False)
+            if evicted not in self._dirty:
+                self._persisted.discard(evicted)
+
+    async def get(self, session_id: str) -> Optional[SessionHistory]:
+        """Session from the hot cache, or rehydrated from the database"""
+        session = self._cache.get(session_id)
+        if session is not None:
+            self._cache.move_to_end(session_id)
+            return session
+
+        # An evicted session may still have queued writes
+        if session_id in self._dirty:
+            await self.flush()
+
+        session = await self._load(session_id)
+        if session is not None:
+            self._remember(session)
+        return session
+
+    async def get_or_create(self, session_id: str, user_id: str) -> SessionHistory:
+        """
+        The session, or a new one for `user_id`. Conversations reference
+        users, so a new session for an unknown user raises UnknownUserError
+        here rather than failing (and being dropped) at flush time.
+        """
+        session = await self.get(session_id)
+        if session is None:
+            async with self._sessions() as db:
+                if await db.scalar(select(User.id).where(User.id == user_id)) is None:
+                    raise UnknownUserError(user_id)
+            now = datetime.now()
+            session = SessionHistory(
+                session_id=session_id,
+                user_id=user_id,
+                messages=[],
+                risk_level=RiskLevel.NONE,
+                created_at=now,
+                updated_at=now
+            )
+            self._remember(session)
+        return session
+
+    async def get_history(self, session_id: str) -> Optional[SessionHistory]:
+        """
+        Authoritative history: writes queued here are flushed and the session
+        is re-read, so turns recorded by other workers are included.
+        """
+        await self.flush()
+        session = await self._load(session_id)
+        if session is not None:
+            self._remember(session)
+        else:
+            self._cache.pop(session_id, None)
+            self._persisted.discard(session_id)
+        return session
+
+    # ----- write-behind -----
+
+    def record(self, session: SessionHistory, message: Message):
+        """Queue `message` (already appended to `session`) for the next flush"""
+        self._remember(session)
+        self._dirty[session.session_id] = session
+        self._pending.append({
+            "session_id": session.session_id,
+            "role": message.role.value if isinstance(message.role, MessageRole) else message.role,
+            "content": message.content,
+            "timestamp": message.timestamp or datetime.now(),
+            "risk_level": _to_db_risk(message.risk_level)
+        })
+
+        if len(self._pending) > self.max_pending:
+            dropped = len(self._pending) - self.max_pending
+            del self._pending[:dropped]
+            print(f"Chat write-behind backlog full, dropped {dropped} oldest messages")
+
+        self._start_writer()
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    def _start_writer(self):
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._write_loop())
+
+    async def _write_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write every queued message; safe to call from anywhere"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            rows, self._pending = self._pending, []
+            sessions, self._dirty = self._dirty, {}
+
+            try:
+                await self._write(rows, sessions)
+            except IntegrityError:
+                # One bad session (e.g. unknown user, or a concurrent insert of
+                # the same session by another worker) must not sink the batch
+                await self._write_each(rows, sessions)
+            except Exception as e:
+                print(f"Chat write-behind flush failed, will retry: {e}")
+                self._pending = rows + self._pending
+                self._dirty = {**sessions, **self._dirty}
+                return
+            for session_id in sessions:
+                if session_id not in self._cache and session_id not in self._dirty:
+                    self._persisted.discard(session_id)
+
+    async def _write_each(self, rows: List[Dict], sessions: Dict[str, SessionHistory]):
+        for session_id, session in sessions.items():
+            session_rows = [r for r in rows if r["session_id"] == session_id]
+            try:
+                await self._write(session_rows, {session_id: session})
+            except Exception as e:
+                print(f"Dropping {len(session_rows)} chat messages for session {session_id}: {e}")
+
+    async def _write(self, rows: List[Dict], sessions: Dict[str, SessionHistory]):
+        async with self._sessions() as db:
+            existing = dict((await db.execute(
+                select(Conversation.session_id, Conversation.id)
+                .where(Conversation.session_id.in_(list(sessions)))
+            )).all())
+
+            deleted = [i for i in sessions if i not in existing and i in self._persisted]
+            for session_id in deleted:
+                # Deleted by another worker since we last saw it
+                self._cache.pop(session_id, None)
+                self._persisted.discard(session_id)
+                print(f"Dropping chat messages for deleted session {session_id}")
+
+            new = [s for s in sessions.values() if s.session_id not in existing and s.session_id not in deleted]
+            if new:
+                await db.execute(insert(Conversation), [
+                    {
+                        "session_id": s.session_id,
+                        "user_id": s.user_id,
+                        "started_at": s.created_at,
+                        "max_risk_level": _to_db_risk(s.risk_level)
+                    }
+                    for s in new
+                ])
+                existing.update((await db.execute(
+                    select(Conversation.session_id, Conversation.id)
+                    .where(Conversation.session_id.in_([s.session_id for s in new]))
+                )).all())
+
+            for session_id, session in sessions.items():
+                if session_id in existing and session.risk_level != RiskLevel.NONE:
+                    await db.execute(
+                        update(Conversation)
+                        .where(Conversation.id == existing[session_id])
+                        .values(max_risk_level=_to_db_risk(session.risk_level))
+                    )
+
+            messages = [
+                {
+                    "conversation_id": existing[r["session_id"]],
+                    "role": r["role"],
+                    "content": r["content"],
+                    "timestamp": r["timestamp"],
+                    "risk_level": r["risk_level"]
+                }
+                for r in rows if r["session_id"] in existing
+            ]
+            if messages:
+                await db.execute(insert(MessageRow), messages)
+            await db.commit()
+            self._persisted.update(existing)
+
+    # ----- reads / deletes -----
+
+    async def _load(self, session_id: str) -> Optional[SessionHistory]:
+        async with self._sessions() as db:
+            conversation = (await db.execute(
+                select(Conversation).where(Conversation.session_id == session_id)
+            )).scalar_one_or_none()
+            if conversation is None:
+                return None
+            self._persisted.add(session_id)
+
+            rows = (await db.execute(
+                select(MessageRow)
+                .where(MessageRow.conversation_id == conversation.id)
+                .order_by(MessageRow.timestamp, MessageRow.id)
+            )).scalars().all()
+
+        messages = [
+            Message(
+                role=MessageRole(row.role),
+                content=row.content,
+                timestamp=row.timestamp,
+                risk_level=_from_db_risk(row.risk_level) if row.role == MessageRole.ASSISTANT.value else None
+            )
+            for row in rows
+        ]
+        started_at = conversation.started_at or datetime.now()
+        return SessionHistory(
+            session_id=session_id,
+            user_id=conversation.user_id,
+            messages=messages,
+            risk_level=_from_db_risk(conversation.max_risk_level),
+            created_at=started_at,
+            updated_at=messages[-1].timestamp if messages else started_at
+        )
+
+    async def delete(self, session_id: str) -> bool:
+        """Delete a session everywhere; True if it existed"""
+        async with self._flush_lock:
+            cached = self._cache.pop(session_id, None) is not None
+            queued = self._dirty.pop(session_id, None) is not None
+            self._persisted.discard(session_id)
+            self._pending = [r for r in self._pending if r["session_id"] != session_id]
+
+        async with self._sessions() as db:
+            conversation_id = (await db.execute(
+                select(Conversation.id).where(Conversation.session_id == session_id)
+            )).scalar_one_or_none()
+            if conversation_id is not None:
+                await db.execute(delete(MessageRow).where(MessageRow.conversation_id == conversation_id))
+                await db.execute(delete(Conversation).where(Conversation.id == conversation_id))
+                await db.commit()
+
+        return conversation_id is not None or cached or queued
+
+    async def close(self):
+        """Stop the writer and flush what is left (called on app shutdown)"""
+        if self._writer is not None:
+            # Holding the lock means the writer is not midway through a flush
+            async with self._flush_lock:
+                self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        await self.flush()
+
+
+# Global instance
+chat_sessions = ChatSessionRepository()
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime
+from typing import List, Optional, Set
+
+from models.conversation import Message, MessageRole, RiskLevel
+from services.ai_service import ai_service
+from services.chat_sessions import chat_sessions
+from services.llm_gateway import LLMError, llm_gateway
+from services.llm_scheduler import LLMPriority
+
+
+class CrisisFollowUp:
+    """
+    Personalized follow-ups for students who got the vetted crisis reply.
+
+    The reply itself is sent at once (AIService.CRISIS_INTERVENTIONS); this
+    asks the model, at crisis priority and in the background, for a
+    follow-up that responds to what the student actually wrote. It is
+    appended to the chat session (when there is one) and pushed to the
+    student's sockets as `crisis_followup`. If the model fails the vetted
+    reply stands on its own.
+    """
+
+    PROMPTS = {
+        RiskLevel.CRITICAL: """You are a crisis counselor AI. A student is showing signs of severe distress or suicidal ideation.
+They have already been given crisis hotline numbers and the reply above.
+
+Write a short follow-up that responds to what they actually said:
+1. Immediate validation and support
+2. Grounding technique or breathing exercise
+3. Offer to connect them to immediate help
+
+Be warm, non-judgmental, and urgent about safety. Under 120 words.""",
+        RiskLevel.HIGH: """A student is showing elevated signs of depression or anxiety.
+They have already been given helpline numbers and the reply above.
+
+Write a short follow-up that responds to what they actually said:
+1. Empathetic acknowledgment
+2. One small, achievable coping skill
+3. Encourage them to talk about it
+4. Suggest connecting with counselor
+
+Be supportive and gentle. Under 120 words."""
+    }
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+
+    def schedule(
+        self,
+        user_id: str,
+        user_message: str,
+        risk_level: RiskLevel,
+        reply: str,
+        history: Optional[List[Message]] = None,
+        session_id: Optional[str] = None,
+        age_group: str = "13-18"
+    ):
+        """Start the follow-up without waiting for it"""
+        task = asyncio.get_running_loop().create_task(
+            self._follow_up(user_id, user_message, risk_level, reply, list(history or []), session_id, age_group)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _follow_up(self, user_id, user_message, risk_level, reply, history, session_id, age_group):
+        messages = ai_service._build_messages(user_message, history, age_group)
+        messages.append({"role": "assistant", "content": reply})
+        messages.append({"role": "system", "content": self.PROMPTS[risk_level]})
+
+        try:
+            content = await llm_gateway.chat(messages, max_tokens=300, priority=LLMPriority.CRISIS)
+        except LLMError as e:
+            print(f"Crisis follow-up not generated for {user_id}: {e}")
+            return
+
+        if session_id:
+            session = await chat_sessions.get(session_id)
+            if session is not None:
+                message = Message(
+                    role=MessageRole.ASSISTANT,
+                    content=content,
+                    timestamp=datetime.now(),
+                    risk_level=risk_level
+                )
+                session.messages.append(message)
+                session.updated_at = datetime.now()
+                chat_sessions.record(session, message)
+
+        from socket_manager import socket_manager
+        await socket_manager.broadcast_to_user(user_id, "crisis_followup", {
+            "session_id": session_id,
+            "risk_level": risk_level.value,
+            "message": content,
+            "suggested_resources": ai_service.get_crisis_resources(risk_level)
+        })
+
+    async def close(self):
+        """Cancel follow-ups still waiting on the model (called on app shutdown)"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Global instance
+crisis_followup = CrisisFollowUp()
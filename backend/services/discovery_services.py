@@ -1,15 +1,17 @@
-import openai
 from typing import List, Dict, Optional
 from datetime import datetime
+import numpy as np
 
-from config import settings
 from models.advanced_features import (
     StrengthProfile, CareerPathway, PurposeDiscoveryResult,
     ScreenTimeData, DetoxGoal, LearningDisabilityIndicators,
     CognitiveTestResult
 )
-
-openai.api_key = settings.OPENAI_API_KEY
+from services.keyword_matcher import keyword_matcher
+from services.llm_gateway import llm_gateway
+from services.llm_scheduler import LLMPriority
+from services.state_store import state_store
+from services.timeseries_store import TimeSeriesStore
 
 
 class PurposeDiscoveryService:
@@ -68,14 +70,14 @@ Rate each strength 0-10:
 Return JSON with scores."""
 
         try:
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-4",
+            content = await llm_gateway.chat(
                 messages=[{"role": "user", "content": prompt}],
-                temperature=0.4
+                temperature=0.4,
+                priority=LLMPriority.BACKGROUND
             )
             
             import json
-            scores = json.loads(response.choices[0].message.content)
+            scores = json.loads(content)
             
             return StrengthProfile(
                 empathy_score=scores.get('empathy', 5) / 10,
@@ -129,15 +131,14 @@ For each career, provide:
 Return as JSON array."""
 
         try:
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-4",
+            content = await llm_gateway.chat(
                 messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=2000
+                max_tokens=2000,
+                priority=LLMPriority.BACKGROUND
             )
             
             import json
-            careers_data = json.loads(response.choices[0].message.content)
+            careers_data = json.loads(content)
             
             careers = []
             for idx, career in enumerate(careers_data):
@@ -201,15 +202,14 @@ Make it exciting and relevant, not generic.
 Return as JSON: {{"subject": "explanation"}}"""
 
         try:
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-4",
+            content = await llm_gateway.chat(
                 messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=800
+                max_tokens=800,
+                priority=LLMPriority.BACKGROUND
             )
             
             import json
-            return json.loads(response.choices[0].message.content)
+            return json.loads(content)
             
         except:
             return {subject: f"{subject} provides important foundational skills for your future career." for subject in subjects}
@@ -246,18 +246,25 @@ Return as JSON: {{"subject": "explanation"}}"""
 class DigitalDetoxService:
     """Helps students manage screen time and digital addiction"""
     
-    def __init__(self):
-        self.user_baselines = {}  # user_id -> baseline screen time
-        self.goals = {}  # user_id -> DetoxGoal
+    # Baselines and goals are kept in the shared state store
+    def _baseline_key(self, user_id: str) -> str:
+        return f"detox:baseline:{user_id}"
+    
+    def _goal_key(self, user_id: str) -> str:
+        return f"detox:goal:{user_id}"
     
-    def set_baseline(self, user_id: str, daily_minutes: int):
+    async def get_goal(self, user_id: str) -> Optional[DetoxGoal]:
+        data = await state_store.get(self._goal_key(user_id))
+        return DetoxGoal.model_validate(data) if data else None
+    
+    async def set_baseline(self, user_id: str, daily_minutes: int):
         """Set initial baseline screen time"""
-        self.user_baselines[user_id] = daily_minutes
+        await state_store.set(self._baseline_key(user_id), daily_minutes)
         
         # Create initial goal (10% reduction)
         target = int(daily_minutes * 0.9)
         
-        self.goals[user_id] = DetoxGoal(
+        goal = DetoxGoal(
             user_id=user_id,
             baseline_daily_minutes=daily_minutes,
             target_daily_minutes=target,
@@ -266,16 +273,19 @@ class DigitalDetoxService:
             alternative_activities=[],
             milestone_rewards=[]
         )
+        await state_store.set(self._goal_key(user_id), goal.model_dump(mode="json"))
     
-    def log_screen_time(self, user_id: str, data: ScreenTimeData):
-        """Log daily screen time"""
-        if user_id in self.goals:
-            goal = self.goals[user_id]
+    async def log_screen_time(self, user_id: str, data: ScreenTimeData) -> Optional[DetoxGoal]:
+        """Log daily screen time; returns the updated goal (None if no baseline yet)"""
+        goal = await self.get_goal(user_id)
+        if goal:
             goal.current_daily_minutes = data.total_minutes
             goal.reduction_percentage = (
                 (goal.baseline_daily_minutes - data.total_minutes) / 
                 goal.baseline_daily_minutes * 100
             )
+            await state_store.set(self._goal_key(user_id), goal.model_dump(mode="json"))
+        return goal
     
     async def get_personalized_tips(
         self,
@@ -297,15 +307,14 @@ Give 5 specific, actionable tips to reduce screen time that:
 Return as JSON array of tip strings."""
 
         try:
-            response = await openai.ChatCompletion.acreate(
-                model="gpt-4",
+            content = await llm_gateway.chat(
                 messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=500
+                max_tokens=500,
+                priority=LLMPriority.BACKGROUND
             )
             
             import json
-            return json.loads(response.choices[0].message.content)
+            return json.loads(content)
             
         except:
             return [
@@ -346,8 +355,20 @@ Return as JSON array of tip strings."""
 class LearningDisabilityDetector:
     """Detects potential learning disabilities through interaction patterns"""
     
+    # Common dyslexia patterns
+    REVERSAL_PATTERNS = {
+        'common': ['teh', 'taht', 'thier', 'freind']
+    }
+    
+    TYPING_HISTORY_RETENTION_DAYS = 180
+    TYPING_HISTORY_LIMIT = 2000
+    
     def __init__(self):
-        self.typing_patterns = {}
+        self.typing_patterns = TimeSeriesStore(
+            ("wpm", "reversals", "spelling_errors"),
+            retention_seconds=self.TYPING_HISTORY_RETENTION_DAYS * 86400,
+            max_events=self.TYPING_HISTORY_LIMIT
+        )
         self.cognitive_scores = {}
     
     def analyze_typing_pattern(
@@ -358,9 +379,6 @@ class LearningDisabilityDetector:
     ):
         """Analyze typing for dyslexia/dysgraphia markers"""
         
-        if user_id not in self.typing_patterns:
-            self.typing_patterns[user_id] = []
-        
         # Calculate metrics
         words = text.split()
         wpm = len(words) / (typing_time_seconds / 60) if typing_time_seconds > 0 else 0
@@ -369,25 +387,17 @@ class LearningDisabilityDetector:
         letter_reversals = self._count_reversals(text)
         spelling_errors = self._count_spelling_errors(text)
         
-        self.typing_patterns[user_id].append({
-            'wpm': wpm,
-            'reversals': letter_reversals,
-            'spelling_errors': spelling_errors,
-            'timestamp': datetime.now()
-        })
+        self.typing_patterns.append(
+            user_id,
+            wpm=wpm,
+            reversals=letter_reversals,
+            spelling_errors=spelling_errors
+        )
     
     def _count_reversals(self, text: str) -> int:
         """Count common letter reversals (b/d, p/q, etc.)"""
         # This is simplified - real implementation would use ML
-        reversals = 0
-        text_lower = text.lower()
-        
-        # Common dyslexia patterns
-        patterns = ['teh', 'taht', 'thier', 'freind']
-        for pattern in patterns:
-            reversals += text_lower.count(pattern)
-        
-        return reversals
+        return keyword_matcher.match(text)["reversal.common"]
     
     def _count_spelling_errors(self, text: str) -> int:
         """Estimate spelling errors"""
@@ -401,7 +411,7 @@ class LearningDisabilityDetector:
         """Generate comprehensive screening report"""
         
         # Analyze collected data
-        typing_data = self.typing_patterns.get(user_id, [])
+        typing_data = self.typing_patterns.last(user_id, 10)
         cognitive_data = self.cognitive_scores.get(user_id, [])
         
         # Calculate probabilities
@@ -426,34 +436,31 @@ class LearningDisabilityDetector:
     
     def _calculate_adhd_probability(
         self, 
-        typing_data: List[Dict],
+        typing_data: np.ndarray,
         cognitive_data: List[CognitiveTestResult]
     ) -> float:
-        """Calculate ADHD probability from patterns"""
+        """Calculate ADHD probability from patterns (typing_data: most recent events)"""
         # Simplified - real implementation would use ML model
         
-        if not typing_data:
+        if len(typing_data) == 0:
             return 0.0
         
         # Check for ADHD markers: inconsistent performance, attention lapses
         variation = 0.0
         if len(typing_data) > 5:
-            wpms = [d['wpm'] for d in typing_data[-10:]]
-            import statistics
-            variation = statistics.stdev(wpms) if len(wpms) > 1 else 0
+            variation = float(np.std(typing_data["wpm"][-10:], ddof=1))
         
         # High variation suggests attention inconsistency
         if variation > 20:
             return 0.5
         return 0.2
     
-    def _calculate_dyslexia_probability(self, typing_data: List[Dict]) -> float:
+    def _calculate_dyslexia_probability(self, typing_data: np.ndarray) -> float:
         """Calculate dyslexia probability"""
-        if not typing_data:
+        if len(typing_data) == 0:
             return 0.0
         
-        recent = typing_data[-10:]
-        avg_reversals = sum(d['reversals'] for d in recent) / len(recent)
+        avg_reversals = float(typing_data["reversals"][-10:].mean())
         
         if avg_reversals > 3:
             return 0.7
@@ -481,4 +488,6 @@ This is not a diagnosis - only a licensed professional can diagnose. However, ea
 # Singleton instances
 purpose_discovery_service = PurposeDiscoveryService()
 digital_detox_service = DigitalDetoxService()
+keyword_matcher.register("reversal", LearningDisabilityDetector.REVERSAL_PATTERNS)
+
 learning_disability_detector = LearningDisabilityDetector()
@@ -1,11 +1,11 @@
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from services.state_store import state_store
+
 class ExamAnxietyService:
     def __init__(self):
-        # In-memory storage for demo purposes
-        self.user_progress: Dict[str, Dict] = {}
-        self.exposure_history: Dict[str, List] = {}
+        # Progress and exposure history are kept in the shared state store
         
         self.levels = [
             {
@@ -53,15 +53,23 @@ class ExamAnxietyService:
     def get_levels(self) -> List[Dict]:
         return self.levels
 
-    def get_user_progress(self, user_id: str) -> Dict:
-        if user_id not in self.user_progress:
-            self.user_progress[user_id] = {
+    def _progress_key(self, user_id: str) -> str:
+        return f"exam_anxiety:progress:{user_id}"
+
+    def _history_key(self, user_id: str) -> str:
+        return f"exam_anxiety:history:{user_id}"
+
+    async def get_user_progress(self, user_id: str) -> Dict:
+        progress = await state_store.get(self._progress_key(user_id))
+        if progress is None:
+            progress = {
                 "completed_levels": [],
                 "current_level": 1,
                 "highest_anxiety": 0,
                 "lowest_anxiety": 0
             }
-        return self.user_progress[user_id]
+            await state_store.set(self._progress_key(user_id), progress)
+        return progress
 
     def start_exposure_session(self, user_id: str, level: int) -> Dict:
         # Generate mock questions for the session
@@ -81,10 +89,7 @@ class ExamAnxietyService:
             "started_at": datetime.now().isoformat()
         }
 
-    def submit_exposure_results(self, user_id: str, session_data: Dict) -> Dict:
-        if user_id not in self.exposure_history:
-            self.exposure_history[user_id] = []
-            
+    async def submit_exposure_results(self, user_id: str, session_data: Dict) -> Dict:
         # Record history
         history_entry = {
             "timestamp": datetime.now().isoformat(),
@@ -93,12 +98,13 @@ class ExamAnxietyService:
             "post_anxiety": session_data.get("post_anxiety"),
             "duration": session_data.get("duration_seconds")
         }
-        self.exposure_history[user_id].append(history_entry)
+        await state_store.append(self._history_key(user_id), history_entry)
         
         # Update progress
-        progress = self.get_user_progress(user_id)
+        progress = await self.get_user_progress(user_id)
         if session_data.get("level") not in progress["completed_levels"]:
             progress["completed_levels"].append(session_data.get("level"))
+            await state_store.set(self._progress_key(user_id), progress)
             
         # Unlock next level logic could go here
         
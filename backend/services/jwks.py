@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from config import settings
+
+
+class JWKSCache:
+    """
+    Signing keys from a JWKS source (an http(s) URL or a local file), held in
+    memory and looked up by `kid`.
+
+    Keys younger than `refresh_seconds` are served as-is. Older keys are
+    still served (stale-while-revalidate) while one background task fetches
+    the set again; past `max_stale_seconds` a lookup waits for the fetch.
+    An unknown `kid` (key rotation) triggers an immediate fetch, at most
+    once per MIN_FETCH_INTERVAL so made-up kids can't hammer the source.
+    Tests can pass `loader`, an async callable returning the JWKS document.
+    """
+
+    MIN_FETCH_INTERVAL = 30.0
+
+    def __init__(self, source: str = None, refresh_seconds: float = None, max_stale_seconds: float = None,
+                 loader: Optional[Callable[[], Awaitable[Dict]]] = None):
+        self.source = source if source is not None else settings.JWKS_URL
+        self.refresh_seconds = refresh_seconds or settings.JWKS_REFRESH_SECONDS
+        self.max_stale_seconds = max_stale_seconds or settings.JWKS_MAX_STALE_SECONDS
+        self._loader = loader
+        self._keys: Dict[str, Dict] = {}
+        self._fetched_at = 0.0
+        self._attempted_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.source) or self._loader is not None
+
+    async def _load(self) -> Dict:
+        if self._loader is not None:
+            return await self._loader()
+        if self.source.startswith(("http://", "https://")):
+            async with httpx.AsyncClient(timeout=5.0) as client:
+                response = await client.get(self.source)
+                response.raise_for_status()
+                return response.json()
+
+        def read():
+            with open(self.source) as f:
+                return json.load(f)
+        return await asyncio.to_thread(read)
+
+    async def refresh(self) -> bool:
+        """Fetch the key set; on failure the current keys are kept"""
+        async with self._lock:
+            self._attempted_at = time.monotonic()
+            try:
+                document = await self._load()
+                keys = {k["kid"]: k for k in document.get("keys", []) if k.get("kid")}
+            except Exception as e:
+                print(f"JWKS refresh failed: {e}")
+                return False
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+            return True
+
+    def _refresh_in_background(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self.refresh())
+
+    async def get_key(self, kid: Optional[str]) -> Optional[Dict]:
+        if not self.configured or not kid:
+            return None
+
+        age = time.monotonic() - self._fetched_at
+        if not self._keys or age > self.max_stale_seconds:
+            await self.refresh()
+        elif age > self.refresh_seconds:
+            self._refresh_in_background()
+
+        key = self._keys.get(kid)
+        if key is None and time.monotonic() - self._attempted_at > self.MIN_FETCH_INTERVAL:
+            await self.refresh()
+            key = self._keys.get(kid)
+        return key
+
+
+class VerifiedTokenCache:
+    """
+    sha256(token) -> decoded claims, kept until the token's `exp`
+    (LRU-bounded), so a token is only verified once.
+    """
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size if max_size is not None else settings.VERIFIED_TOKEN_CACHE_SIZE
+        self._entries: "OrderedDict[bytes, Tuple[Dict, float]]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[Dict]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        claims, exp = entry
+        if exp <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return claims
+
+    def put(self, token: str, claims: Dict):
+        # Tokens without an expiry are verified every time
+        exp = claims.get("exp")
+        if not exp or self.max_size <= 0:
+            return
+        self._entries[self._key(token)] = (claims, float(exp))
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+# Global instances
+jwks_cache = JWKSCache()
+verified_tokens = VerifiedTokenCache()
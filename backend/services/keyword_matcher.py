@@ -0,0 +1,156 @@
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+
+def _build_normalize_table() -> bytes:
+    """Byte table that maps ASCII non-word characters to spaces (UTF-8 letters pass through)"""
+    table = bytearray(range(256))
+    for i in range(128):
+        ch = chr(i)
+        if not (ch.isalnum() or ch in "_'"):
+            table[i] = ord(" ")
+    return bytes(table)
+
+
+class _UnicodeSeparators(dict):
+    """str.translate table: non-ASCII punctuation, symbols and spaces become spaces"""
+
+    def __missing__(self, codepoint: int):
+        category = unicodedata.category(chr(codepoint))
+        value = " " if codepoint > 127 and category[0] in "PSZ" else chr(codepoint)
+        self[codepoint] = value
+        return value
+
+
+class KeywordMatcher:
+    """
+    One compiled matcher for every keyword table in the platform.
+
+    Services register their tables under a namespace at import time
+    (e.g. "risk" -> {"critical": [...], ...}) and ask for all category hits
+    of a message in a single pass. Matching is on whole words, so "die"
+    does not fire inside "diet", and "self-harm" matches "self harm". A
+    single word ending in "*" matches as a prefix ("hopeless*" also fires on
+    "hopelessness"); inflections of a phrase are listed explicitly.
+
+    The text is lowercased, normalized and split into tokens once, with the
+    character-level work done by bytes.translate/split in C. Non-ASCII
+    punctuation, symbols and emoji are spaces too (“quotes”, "…"), and
+    quotes around a word are stripped, so "'suicide'" is "suicide". Candidate
+    keywords come from one set intersection with the message's tokens
+    (phrases are indexed by their first token), and only those candidates
+    are counted against the joined token stream. Prefixes are looked up
+    by slicing each distinct token to every registered prefix length.
+    """
+
+    _NORMALIZE = _build_normalize_table()
+    _UNICODE_SEPARATORS = _UnicodeSeparators()
+
+    def __init__(self):
+        self._tables: Dict[str, Tuple[str, ...]] = {}
+        self._compiled = False
+        self._words: Dict[bytes, Tuple[bytes, List[str]]] = {}
+        self._phrases_by_first: Dict[bytes, List[Tuple[bytes, Tuple[bytes, ...], List[str]]]] = {}
+        self._prefixes: Dict[bytes, List[str]] = {}
+        self._prefix_lengths: Tuple[int, ...] = ()
+
+    def register(self, namespace: str, table: Dict[str, Iterable[str]]):
+        """Add a keyword table; categories become "<namespace>.<category>" """
+        for category, keywords in table.items():
+            self._tables[f"{namespace}.{category}"] = tuple(keywords)
+        self._compiled = False
+
+    def _tokenize(self, text: str) -> List[bytes]:
+        text = text.lower().replace("’", "'")
+        if not text.isascii():
+            text = text.translate(self._UNICODE_SEPARATORS)
+        tokens = text.encode("utf-8").translate(self._NORMALIZE).split()
+        if "'" in text:
+            # Quotes around a word ("'suicide'") aren't part of it; "can't" keeps its own
+            tokens = [t for t in (token.strip(b"'") for token in tokens) if t]
+        return tokens
+
+    def _compile(self):
+        word_categories = defaultdict(list)
+        phrases: Dict[bytes, List[str]] = defaultdict(list)
+        prefixes: Dict[bytes, List[str]] = defaultdict(list)
+
+        for category, keywords in self._tables.items():
+            for keyword in keywords:
+                tokens = self._tokenize(keyword)
+                if len(tokens) == 1 and keyword.endswith("*"):
+                    if category not in prefixes[tokens[0]]:
+                        prefixes[tokens[0]].append(category)
+                elif len(tokens) == 1:
+                    if category not in word_categories[tokens[0]]:
+                        word_categories[tokens[0]].append(category)
+                elif tokens:
+                    phrase = b" ".join(tokens)
+                    if category not in phrases[phrase]:
+                        phrases[phrase].append(category)
+
+        # Tokens are joined with two spaces in match(), so back-to-back
+        # occurrences of a keyword don't share a separator
+        phrases_by_first = defaultdict(list)
+        for phrase, categories in phrases.items():
+            tokens = tuple(phrase.split())
+            padded = b" " + b"  ".join(tokens) + b" "
+            phrases_by_first[tokens[0]].append((padded, tokens[1:], categories))
+
+        self._words = {
+            word: (b" " + word + b" ", categories)
+            for word, categories in word_categories.items()
+        }
+        self._phrases_by_first = dict(phrases_by_first)
+        self._prefixes = dict(prefixes)
+        self._prefix_lengths = tuple(sorted({len(prefix) for prefix in prefixes}))
+        self._compiled = True
+
+    def match(self, text: str) -> Counter:
+        """Number of keyword hits per category for `text`"""
+        if not self._compiled:
+            self._compile()
+
+        tokens = self._tokenize(text)
+        present = set(tokens)
+        words = present & self._words.keys()
+        phrase_starts = present & self._phrases_by_first.keys()
+        prefixed = [
+            (token, self._prefixes[token[:length]])
+            for token in present
+            for length in self._prefix_lengths
+            if len(token) >= length and token[:length] in self._prefixes
+        ]
+
+        hits = Counter()
+        if not words and not phrase_starts and not prefixed:
+            return hits
+
+        joined = b"  " + b"  ".join(tokens) + b"  "
+
+        for word in words:
+            padded, categories = self._words[word]
+            found = joined.count(padded)
+            for category in categories:
+                hits[category] += found
+
+        for first in phrase_starts:
+            for padded, rest, categories in self._phrases_by_first[first]:
+                if not all(token in present for token in rest):
+                    continue
+                found = joined.count(padded)
+                if found:
+                    for category in categories:
+                        hits[category] += found
+
+        for token, categories in prefixed:
+            found = joined.count(b" " + token + b" ")
+            for category in categories:
+                hits[category] += found
+
+        return hits
+
+
+# Global instance shared by all services
+keyword_matcher = KeywordMatcher()
@@ -0,0 +1,255 @@
+import asyncio
+import json
+import random
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from config import settings
+from services.llm_scheduler import LLMPriority, llm_scheduler
+from services.platform_config_cache import platform_config
+
+
+class LLMError(Exception):
+    """Raised when a completion could not be produced (not configured, timeout, provider error)."""
+
+
+class LLMOverloaded(LLMError):
+    """Shed by the scheduler: the queue wait would exceed the call's budget."""
+
+
+class LLMGateway:
+    """
+    Single entry point for chat completions.
+
+    Owns one pooled async HTTP client, admits calls through the priority
+    scheduler (crisis, chat, tutoring, background), caps in-flight requests
+    per model, enforces a deadline per call (covering queueing and retries)
+    and retries transient failures with jittered exponential backoff.
+    Model, temperature and max_tokens come from the `ai_model_config`
+    PlatformConfig row.
+    """
+
+    CONFIG_KEY = "ai_model_config"
+    RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+    BACKOFF_BASE_SECONDS = 0.25
+    BACKOFF_CAP_SECONDS = 4.0
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        # A custom transport (e.g. httpx.MockTransport) lets benchmarks run against a local stub model
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def is_configured(self) -> bool:
+        if self._transport is not None:
+            return True
+        key = settings.OPENAI_API_KEY
+        return bool(key) and key != "demo-key-not-configured"
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=settings.OPENAI_BASE_URL,
+                headers={"Authorization": f"Bearer {settings.OPENAI_API_KEY}"},
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_MAX_CONNECTIONS
+                ),
+                timeout=httpx.Timeout(settings.LLM_TIMEOUT_SECONDS, connect=5.0),
+                transport=self._transport
+            )
+        return self._client
+
+    async def close(self):
+        """Release pooled connections (called on app shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_model_config(self) -> Dict:
+        """Current `ai_model_config` value, served from the platform config cache"""
+        value = await platform_config.get(self.CONFIG_KEY)
+        return value if isinstance(value, dict) else {}
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        if model not in self._semaphores:
+            self._semaphores[model] = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY_PER_MODEL)
+        return self._semaphores[model]
+
+    async def _build_payload(
+        self,
+        messages: List[dict],
+        temperature: Optional[float],
+        max_tokens: Optional[int]
+    ) -> dict:
+        """
+        Resolve request parameters. The configured model is always used;
+        call-site temperature overrides the configured default, and the
+        configured max_tokens acts as a platform-wide ceiling.
+        """
+        config = await self.get_model_config()
+
+        payload = {
+            "model": config.get("model") or settings.OPENAI_MODEL,
+            "messages": messages,
+            "temperature": temperature if temperature is not None else config.get("temperature", 0.7)
+        }
+
+        config_max_tokens = config.get("max_tokens")
+        if max_tokens is not None and config_max_tokens:
+            payload["max_tokens"] = min(max_tokens, config_max_tokens)
+        elif max_tokens is not None or config_max_tokens:
+            payload["max_tokens"] = max_tokens or config_max_tokens
+
+        return payload
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.BACKOFF_CAP_SECONDS, self.BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+    async def chat(
+        self,
+        messages: List[dict],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        priority: LLMPriority = LLMPriority.CHAT
+    ) -> str:
+        """
+        Run a chat completion and return the assistant message content.
+        Raises LLMError on any failure (LLMOverloaded when shed) so callers
+        can use their fallbacks.
+        """
+        if not self.is_configured:
+            raise LLMError("OpenAI API key not configured")
+
+        payload = await self._build_payload(messages, temperature, max_tokens)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or settings.LLM_TIMEOUT_SECONDS)
+
+        ticket = await llm_scheduler.acquire(priority, max_wait=deadline - loop.time())
+        if ticket is None:
+            raise LLMOverloaded(f"LLM queue too long for {priority.name.lower()} request")
+        succeeded = False
+        try:
+            result = await self._chat_attempts(payload, deadline)
+            succeeded = True
+            return result
+        finally:
+            llm_scheduler.release(ticket, succeeded)
+
+    async def _chat_attempts(self, payload: dict, deadline: float) -> str:
+        loop = asyncio.get_running_loop()
+        last_error: Optional[Exception] = None
+
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+
+            try:
+                return await asyncio.wait_for(self._request(payload), timeout=remaining)
+            except asyncio.TimeoutError:
+                raise LLMError(f"LLM call exceeded its deadline after {attempt + 1} attempt(s)")
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code not in self.RETRYABLE_STATUS:
+                    raise LLMError(f"LLM provider returned {e.response.status_code}") from e
+                last_error = e
+            except httpx.TransportError as e:
+                last_error = e
+
+            if attempt < settings.LLM_MAX_RETRIES:
+                delay = min(self._backoff(attempt), max(deadline - loop.time(), 0))
+                await asyncio.sleep(delay)
+
+        raise LLMError(f"LLM call failed: {last_error}")
+
+    async def stream_chat(
+        self,
+        messages: List[dict],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        priority: LLMPriority = LLMPriority.CHAT
+    ) -> AsyncIterator[str]:
+        """
+        Stream a chat completion, yielding content deltas as they arrive.
+        The deadline covers the whole stream. Streams are not retried, since
+        tokens may already have been forwarded to the client.
+        """
+        if not self.is_configured:
+            raise LLMError("OpenAI API key not configured")
+
+        payload = await self._build_payload(messages, temperature, max_tokens)
+        payload["stream"] = True
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or settings.LLM_TIMEOUT_SECONDS)
+
+        async def next_line(lines: AsyncIterator[str]) -> str:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise LLMError("LLM stream exceeded its deadline")
+            try:
+                return await asyncio.wait_for(lines.__anext__(), timeout=remaining)
+            except asyncio.TimeoutError:
+                raise LLMError("LLM stream exceeded its deadline")
+
+        ticket = await llm_scheduler.acquire(priority, max_wait=deadline - loop.time())
+        if ticket is None:
+            raise LLMOverloaded(f"LLM queue too long for {priority.name.lower()} request")
+
+        try:
+            await asyncio.wait_for(self._semaphore(payload["model"]).acquire(), timeout=deadline - loop.time())
+        except asyncio.TimeoutError:
+            llm_scheduler.release(ticket, succeeded=False)
+            raise LLMError("LLM stream exceeded its deadline while queued")
+
+        succeeded = False
+        try:
+            async with self.client.stream("POST", "/chat/completions", json=payload) as response:
+                response.raise_for_status()
+                lines = response.aiter_lines()
+                while True:
+                    try:
+                        line = await next_line(lines)
+                    except StopAsyncIteration:
+                        break
+
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+
+                    try:
+                        delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    except (ValueError, KeyError, IndexError, TypeError) as e:
+                        raise LLMError(f"Malformed stream chunk: {e}") from e
+                    if delta:
+                        yield delta
+            succeeded = True
+        except httpx.HTTPStatusError as e:
+            raise LLMError(f"LLM provider returned {e.response.status_code}") from e
+        except httpx.TransportError as e:
+            raise LLMError(f"LLM stream failed: {e}") from e
+        finally:
+            self._semaphore(payload["model"]).release()
+            llm_scheduler.release(ticket, succeeded)
+
+    async def _request(self, payload: dict) -> str:
+        async with self._semaphore(payload["model"]):
+            response = await self.client.post("/chat/completions", json=payload)
+            response.raise_for_status()
+            data = response.json()
+
+        try:
+            return data["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError) as e:
+            raise LLMError(f"Malformed completion response: {e}") from e
+
+
+# Global instance
+llm_gateway = LLMGateway()
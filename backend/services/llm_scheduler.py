@@ -0,0 +1,211 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Deque, Dict, List, Optional, Tuple
+
+from config import settings
+from services.principal_cache import current_principal
+
+
+class LLMPriority(IntEnum):
+    """Lower value is served first"""
+    CRISIS = 0      # at-risk students (high/critical risk, crisis language)
+    CHAT = 1        # regular conversation turns
+    TUTORING = 2    # academic tutor
+    BACKGROUND = 3  # challenge, quest and discovery generation
+
+
+@dataclass
+class Ticket:
+    priority: LLMPriority
+    started: float
+
+
+class _ClassStats:
+    def __init__(self):
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = 0
+        self.waits: Deque[float] = deque(maxlen=1000)
+
+
+class LLMScheduler:
+    """
+    Admission control in front of the LLM provider.
+
+    At most `capacity` calls run at once. A free slot goes to the most
+    urgent class that has callers waiting and is under its quota (a share
+    of capacity, so lower classes can never take every slot from crisis
+    and chat). Within a class, schools are served by start-time fair
+    queuing, so one school flooding the queue delays itself, not others.
+
+    A caller is shed (acquire returns None) when its predicted wait, from
+    the queue ahead of it and the recent call duration, exceeds its wait
+    budget, or when it actually waits that long. Crisis calls are never
+    shed on prediction, only when their own deadline runs out.
+    """
+
+    QUOTAS = {
+        LLMPriority.CRISIS: 1.0,
+        LLMPriority.CHAT: 0.8,
+        LLMPriority.TUTORING: 0.5,
+        LLMPriority.BACKGROUND: 0.25,
+    }
+    MAX_WAIT_SECONDS = {
+        LLMPriority.CRISIS: None,  # only the call's own deadline
+        LLMPriority.CHAT: 5.0,
+        LLMPriority.TUTORING: 8.0,
+        LLMPriority.BACKGROUND: 3.0,
+    }
+
+    def __init__(self, capacity: int = None, quotas: Dict[LLMPriority, float] = None,
+                 max_wait_seconds: Dict[LLMPriority, Optional[float]] = None):
+        self.capacity = capacity or settings.LLM_MAX_CONCURRENCY_PER_MODEL
+        shares = {**self.QUOTAS, **(quotas or {})}
+        self.quotas = {p: max(1, int(self.capacity * shares[p])) for p in LLMPriority}
+        self.max_wait = {**self.MAX_WAIT_SECONDS, **(max_wait_seconds or {})}
+        self._in_flight = 0
+        self._stats = {p: _ClassStats() for p in LLMPriority}
+        # Per class: heap of (virtual start tag, seq, future)
+        self._queues: Dict[LLMPriority, List[Tuple[float, int, asyncio.Future]]] = {p: [] for p in LLMPriority}
+        self._virtual_time = {p: 0.0 for p in LLMPriority}
+        self._last_tag: Dict[Tuple[LLMPriority, str], float] = {}
+        self._seq = itertools.count()
+        self._service_time = 1.0  # EWMA of call duration, seconds
+
+    @staticmethod
+    def fairness_key() -> str:
+        """The current request's school (from its principal), else one shared bucket"""
+        principal = current_principal.get()
+        if principal is not None and principal.school_id is not None:
+            return f"school:{principal.school_id}"
+        return "default"
+
+    def _can_run(self, priority: LLMPriority) -> bool:
+        return self._in_flight < self.capacity and self._stats[priority].in_flight < self.quotas[priority]
+
+    def _ahead(self, priority: LLMPriority) -> int:
+        return sum(self._stats[p].queued for p in LLMPriority if p <= priority)
+
+    def predicted_wait(self, priority: LLMPriority) -> float:
+        if self._ahead(priority) == 0 and self._can_run(priority):
+            return 0.0
+        slots = min(self.quotas[priority], self.capacity)
+        return (self._ahead(priority) + 1) / slots * self._service_time
+
+    def _grant(self, priority: LLMPriority) -> Ticket:
+        stats = self._stats[priority]
+        self._in_flight += 1
+        stats.in_flight += 1
+        stats.admitted += 1
+        return Ticket(priority, time.monotonic())
+
+    def _dispatch(self):
+        while self._in_flight < self.capacity:
+            for priority in LLMPriority:
+                queue = self._queues[priority]
+                while queue and queue[0][2].done():
+                    heapq.heappop(queue)  # gave up waiting
+                if queue and self._stats[priority].in_flight < self.quotas[priority]:
+                    tag, _, waiter = heapq.heappop(queue)
+                    self._virtual_time[priority] = tag
+                    self._stats[priority].queued -= 1
+                    waiter.set_result(self._grant(priority))
+                    break
+            else:
+                return
+
+    async def acquire(self, priority: LLMPriority, key: str = None,
+                      max_wait: Optional[float] = None) -> Optional[Ticket]:
+        """
+        Wait for a slot; None means shed (the caller should use its fallback).
+        `max_wait` (e.g. the call's remaining deadline) tightens the class budget.
+        """
+        stats = self._stats[priority]
+        if self._ahead(priority) == 0 and self._can_run(priority):
+            stats.waits.append(0.0)
+            return self._grant(priority)
+
+        budget = self.max_wait[priority]
+        if max_wait is not None:
+            budget = max_wait if budget is None else min(budget, max_wait)
+        if priority != LLMPriority.CRISIS and budget is not None and self.predicted_wait(priority) > budget:
+            stats.shed += 1
+            return None
+
+        # Start-time fair queuing: a school's next request is tagged after
+        # its previous one, so a backlog from one school doesn't push others back
+        key = key or self.fairness_key()
+        tag = max(self._virtual_time[priority], self._last_tag.get((priority, key), 0.0)) + 1.0
+        self._last_tag[(priority, key)] = tag
+        if len(self._last_tag) > 10000:
+            self._forget_idle_keys()
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queues[priority], (tag, next(self._seq), waiter))
+        stats.queued += 1
+        queued_at = time.monotonic()
+        try:
+            ticket = await asyncio.wait_for(waiter, budget)
+        except asyncio.TimeoutError:
+            stats.queued -= 1
+            stats.shed += 1
+            return None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(waiter.result())  # granted as the caller went away
+            else:
+                stats.queued -= 1
+            raise
+        stats.waits.append(time.monotonic() - queued_at)
+        return ticket
+
+    def _forget_idle_keys(self):
+        self._last_tag = {
+            (p, k): tag for (p, k), tag in self._last_tag.items() if tag > self._virtual_time[p]
+        }
+
+    def release(self, ticket: Ticket, succeeded: bool = True):
+        stats = self._stats[ticket.priority]
+        self._in_flight -= 1
+        stats.in_flight -= 1
+        if succeeded:
+            duration = time.monotonic() - ticket.started
+            self._service_time += 0.2 * (duration - self._service_time)
+        self._dispatch()
+
+    def metrics(self) -> Dict:
+        def percentile(values: List[float], q: float) -> float:
+            if not values:
+                return 0.0
+            ordered = sorted(values)
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+        return {
+            "capacity": self.capacity,
+            "in_flight": self._in_flight,
+            "service_time_ms": round(self._service_time * 1000, 1),
+            "classes": {
+                priority.name.lower(): {
+                    "quota": self.quotas[priority],
+                    "in_flight": stats.in_flight,
+                    "queue_depth": stats.queued,
+                    "admitted": stats.admitted,
+                    "shed": stats.shed,
+                    "predicted_wait_ms": round(self.predicted_wait(priority) * 1000, 1),
+                    "wait_ms_p50": percentile(list(stats.waits), 0.5),
+                    "wait_ms_p95": percentile(list(stats.waits), 0.95),
+                    "wait_ms_max": percentile(list(stats.waits), 1.0),
+                }
+                for priority, stats in self._stats.items()
+            }
+        }
+
+
+# Global instance
+llm_scheduler = LLMScheduler()
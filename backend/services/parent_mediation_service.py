@@ -1,6 +1,14 @@
 from typing import Dict, List, Optional
 
+from services.keyword_matcher import keyword_matcher
+
 class ParentMediationService:
+    TONE_MARKERS = {
+        'aggressive': ['fault', 'never', 'always', 'hate', 'stupid'],
+        'defensive': ['but', 'not my fault', 'you said'],
+        'constructive': ['feel', 'need', 'help', 'understand', 'together']
+    }
+
     def __init__(self):
         self.templates = [
             {
@@ -24,16 +32,13 @@ class ParentMediationService:
         ]
 
     def analyze_tone(self, message: str) -> Dict:
-        lower_text = message.lower()
-        aggressive = ['fault', 'never', 'always', 'hate', 'stupid']
-        defensive = ['but', 'not my fault', 'you said']
-        open_words = ['feel', 'need', 'help', 'understand', 'together']
+        hits = keyword_matcher.match(message)
         
-        if any(w in lower_text for w in aggressive):
+        if hits["tone.aggressive"]:
             return {"type": "aggressive", "color": "#ef4444", "label": "🔴 Aggressive"}
-        elif any(w in lower_text for w in defensive):
+        elif hits["tone.defensive"]:
             return {"type": "defensive", "color": "#f59e0b", "label": "🟡 Defensive"}
-        elif any(w in lower_text for w in open_words):
+        elif hits["tone.constructive"]:
             return {"type": "constructive", "color": "#10b981", "label": "🟢 Constructive"}
         
         return {"type": "neutral", "color": "#6b7280", "label": "⚪ Neutral"}
@@ -58,4 +63,6 @@ class ParentMediationService:
     def get_templates(self) -> List[Dict]:
         return self.templates
 
+keyword_matcher.register("tone", ParentMediationService.TONE_MARKERS)
+
 parent_mediation_service = ParentMediationService()
@@ -0,0 +1,152 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from config import settings
+
+
+@lru_cache(maxsize=None)
+def _context(rounds: int):
+    # Any hash at another cost is reported as needing an update, so raising
+    # or lowering BCRYPT_ROUNDS migrates users on their next login
+    from passlib.context import CryptContext
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds
+    )
+
+
+def _hash_batch(passwords: List[str], rounds: int) -> List[str]:
+    """Runs in a pool worker: bcrypt is CPU-bound and holds the GIL"""
+    context = _context(rounds)
+    return [context.hash(p) for p in passwords]
+
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    try:
+        return _context(rounds).verify_and_update(password, hashed)
+    except (ValueError, TypeError):
+        # Not a hash we recognise (e.g. a placeholder)
+        return False, None
+
+
+def _warm() -> bool:
+    _context(settings.BCRYPT_ROUNDS)
+    return True
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing and verification on a process pool, so password work
+    uses every core and never stalls the event loop.
+    """
+
+    CHUNK_SIZE = 64
+
+    def __init__(self, workers: Optional[int] = None, rounds: Optional[int] = None):
+        self.workers = workers or settings.PASSWORD_HASH_WORKERS or None
+        self.rounds = rounds or settings.BCRYPT_ROUNDS
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn, not fork: forking a process with a running event loop
+            # and helper threads can deadlock the child
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    async def warm(self):
+        """Start the workers and load passlib so the first login doesn't pay for it"""
+        await asyncio.gather(*[self._run(_warm) for _ in range(self.workers or os.cpu_count() or 1)])
+
+    async def hash(self, password: str, rounds: Optional[int] = None) -> str:
+        return (await self._run(_hash_batch, [password], rounds or self.rounds))[0]
+
+    async def hash_many(self, passwords: List[str], rounds: Optional[int] = None) -> List[str]:
+        """Hash `passwords` (in order), split into chunks across the pool"""
+        chunks = [passwords[i:i + self.CHUNK_SIZE] for i in range(0, len(passwords), self.CHUNK_SIZE)]
+        results = await asyncio.gather(*[
+            self._run(_hash_batch, chunk, rounds or self.rounds) for chunk in chunks
+        ])
+        return [h for chunk in results for h in chunk]
+
+    async def verify_and_update(self, password: str, hashed: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """
+        (matches, new_hash). `new_hash` is set when the stored hash used a
+        different bcrypt cost and should be replaced.
+        """
+        if not hashed:
+            return False, None
+        return await self._run(_verify_and_update, password, hashed, self.rounds)
+
+    def close(self):
+        """Shut the pool down (called on app shutdown)"""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+class AdmissionLimiter:
+    """
+    Caps concurrent password work. Up to `limit` requests run at once and
+    up to `max_waiting` more queue for at most `timeout` seconds; beyond
+    that the request is refused with 503 and a Retry-After hint rather than
+    piling more bcrypt work onto an already saturated pool.
+    """
+
+    def __init__(self, limit: int, max_waiting: int, timeout: float, retry_after: int = 2):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    def _reject(self):
+        self.rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins right now, please retry shortly",
+            headers={"Retry-After": str(self.retry_after)}
+        )
+
+    async def __aenter__(self):
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            self._reject()
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._reject()
+        finally:
+            self.waiting -= 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+
+
+# Global instances
+password_hasher = PasswordHasher()
+login_admission = AdmissionLimiter(
+    limit=settings.LOGIN_MAX_CONCURRENT,
+    max_waiting=settings.LOGIN_MAX_WAITING,
+    timeout=settings.LOGIN_QUEUE_TIMEOUT_SECONDS
+)
@@ -1,61 +1,123 @@
+import asyncio
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from services.state_store import state_store
+
 class PeerCircleService:
-    def __init__(self):
-        # In-memory storage
-        self.circles = [
-            {
-                "id": "1",
-                "name": "Gaming Buddies",
-                "interest": "Gaming",
-                "members": ["user2", "user3"],
-                "max_members": 10,
-                "description": "Connect with fellow gamers, share tips, and organize gaming sessions",
-                "is_anonymous": False,
-                "challenges": ["Play together", "Share game reviews"],
-                "created_at": datetime.now().isoformat()
-            },
-            {
-                "id": "2",
-                "name": "Exam Warriors",
-                "interest": "Study Support",
-                "members": ["user4", "user5"],
-                "max_members": 15,
-                "description": "Support each other through exam stress with study tips and motivation",
-                "is_anonymous": True,
-                "challenges": ["Daily study check-in", "Share study techniques"],
-                "created_at": datetime.now().isoformat()
-            }
-        ]
-        self.messages: Dict[str, List] = {}  # circle_id -> list of messages
-        
-        # Seed some messages
-        self.messages["1"] = [
+    # Circles, members and messages live in the shared state store:
+    #   peer:circles                    ordered set of circle ids
+    #   peer:circle:{id}                circle details
+    #   peer:circle:{id}:members        ordered set of user ids
+    #   peer:circle:{id}:messages       list of messages
+    CIRCLES_KEY = "peer:circles"
+    CIRCLE_SEQ_KEY = "peer:circle_seq"
+    SEEDED_KEY = "peer:seeded"  # claimed by the worker that seeds
+    SEEDED_READY_KEY = "peer:seeded:ready"  # set once the seed data is written
+    SEED_WAIT_SECONDS = 5.0
+
+    DEFAULT_CIRCLES = [
+        {
+            "id": "1",
+            "name": "Gaming Buddies",
+            "interest": "Gaming",
+            "members": ["user2", "user3"],
+            "max_members": 10,
+            "description": "Connect with fellow gamers, share tips, and organize gaming sessions",
+            "is_anonymous": False,
+            "challenges": ["Play together", "Share game reviews"]
+        },
+        {
+            "id": "2",
+            "name": "Exam Warriors",
+            "interest": "Study Support",
+            "members": ["user4", "user5"],
+            "max_members": 15,
+            "description": "Support each other through exam stress with study tips and motivation",
+            "is_anonymous": True,
+            "challenges": ["Daily study check-in", "Share study techniques"]
+        }
+    ]
+
+    DEFAULT_MESSAGES = {
+        "1": [
             {
                 "id": "msg1",
                 "user_id": "user2",
                 "username": "GamerOne",
                 "content": "Anyone up for a match?",
-                "timestamp": datetime.now().isoformat(),
                 "is_anonymous": False
             }
         ]
+    }
+
+    def __init__(self):
+        self._seeded = False
+
+    def _circle_key(self, circle_id: str) -> str:
+        return f"peer:circle:{circle_id}"
 
-    def get_circles(self, interest: str = None) -> List[Dict]:
+    def _members_key(self, circle_id: str) -> str:
+        return f"peer:circle:{circle_id}:members"
+
+    def _messages_key(self, circle_id: str) -> str:
+        return f"peer:circle:{circle_id}:messages"
+
+    async def _ensure_seeded(self):
+        """Seed the default circles once across all workers"""
+        if self._seeded:
+            return
+        if await state_store.add_member(self.SEEDED_KEY, "default"):
+            now = datetime.now().isoformat()
+            for circle in self.DEFAULT_CIRCLES:
+                await self._save_circle({**circle, "created_at": now})
+                await state_store.incr(self.CIRCLE_SEQ_KEY)
+            for circle_id, messages in self.DEFAULT_MESSAGES.items():
+                for message in messages:
+                    await state_store.append(self._messages_key(circle_id), {**message, "timestamp": now})
+                    await state_store.incr(self._messages_key(circle_id) + ":seq")
+            await state_store.set(self.SEEDED_READY_KEY, True)
+        else:
+            # Another worker (or request) is seeding; don't read half-written circles
+            waited = 0.0
+            while not await state_store.get(self.SEEDED_READY_KEY):
+                if waited >= self.SEED_WAIT_SECONDS:
+                    # Seeder died, or the store was seeded before the ready key existed
+                    print("Peer circle seeding did not finish in time, continuing without it")
+                    await state_store.set(self.SEEDED_READY_KEY, True)
+                    break
+                await asyncio.sleep(0.05)
+                waited += 0.05
+        self._seeded = True
+
+    async def _save_circle(self, circle: Dict):
+        details = {k: v for k, v in circle.items() if k != "members"}
+        await state_store.set(self._circle_key(circle["id"]), details)
+        for user_id in circle.get("members", []):
+            await state_store.add_member(self._members_key(circle["id"]), user_id)
+        await state_store.add_member(self.CIRCLES_KEY, circle["id"])
+
+    async def _with_members(self, circle: Dict) -> Dict:
+        circle["members"] = await state_store.members(self._members_key(circle["id"]))
+        return circle
+
+    async def get_circles(self, interest: str = None) -> List[Dict]:
+        await self._ensure_seeded()
+        circle_ids = await state_store.members(self.CIRCLES_KEY)
+        circles = [c for c in await state_store.get_many([self._circle_key(i) for i in circle_ids]) if c]
         if interest and interest.lower() != "all":
-            return [c for c in self.circles if c["interest"].lower() == interest.lower()]
-        return self.circles
+            circles = [c for c in circles if (c["interest"] or "").lower() == interest.lower()]
+        return [await self._with_members(c) for c in circles]
 
-    def get_circle(self, circle_id: str) -> Optional[Dict]:
-        for circle in self.circles:
-            if circle["id"] == circle_id:
-                return circle
-        return None
+    async def get_circle(self, circle_id: str) -> Optional[Dict]:
+        await self._ensure_seeded()
+        circle = await state_store.get(self._circle_key(circle_id))
+        return await self._with_members(circle) if circle else None
 
-    def create_circle(self, data: Dict) -> Dict:
+    async def create_circle(self, data: Dict) -> Dict:
+        await self._ensure_seeded()
         new_circle = {
-            "id": str(len(self.circles) + 1),
+            "id": str(await state_store.incr(self.CIRCLE_SEQ_KEY)),
             "name": data.get("name"),
             "interest": data.get("interest"),
             "members": [data.get("creator_id")],
@@ -65,40 +127,49 @@ class PeerCircleService:
             "challenges": [],
             "created_at": datetime.now().isoformat()
         }
-        self.circles.append(new_circle)
+        await self._save_circle(new_circle)
         return new_circle
 
-    def join_circle(self, circle_id: str, user_id: str) -> Dict:
-        circle = self.get_circle(circle_id)
+    async def join_circle(self, circle_id: str, user_id: str) -> Dict:
+        circle = await self.get_circle(circle_id)
         if not circle:
             return {"error": "Circle not found"}
-            
+
         if user_id in circle["members"]:
             return {"message": "Already a member"}
-            
+
         if len(circle["members"]) >= circle["max_members"]:
             return {"error": "Circle is full"}
-            
-        circle["members"].append(user_id)
+
+        # Adding is atomic; if concurrent joins overfilled the circle, the
+        # latest joiners (end of the ordered set) back out
+        await state_store.add_member(self._members_key(circle_id), user_id)
+        members = await state_store.members(self._members_key(circle_id))
+        if user_id not in members[:circle["max_members"]]:
+            await state_store.remove_member(self._members_key(circle_id), user_id)
+            return {"error": "Circle is full"}
+
+        circle["members"] = members
         return {"success": True, "circle": circle}
 
-    def get_messages(self, circle_id: str) -> List[Dict]:
-        return self.messages.get(circle_id, [])
+    async def get_messages(self, circle_id: str) -> List[Dict]:
+        await self._ensure_seeded()
+        return await state_store.get_list(self._messages_key(circle_id))
+
+    async def send_message(self, circle_id: str, message_data: Dict) -> Dict:
+        await self._ensure_seeded()
+        seq = await state_store.incr(self._messages_key(circle_id) + ":seq")
 
-    def send_message(self, circle_id: str, message_data: Dict) -> Dict:
-        if circle_id not in self.messages:
-            self.messages[circle_id] = []
-            
         new_message = {
-            "id": f"msg_{len(self.messages[circle_id]) + 1}",
+            "id": f"msg_{seq}",
             "user_id": message_data.get("user_id"),
             "username": message_data.get("username"),
             "content": message_data.get("content"),
             "timestamp": datetime.now().isoformat(),
             "is_anonymous": message_data.get("is_anonymous", False)
         }
-        
-        self.messages[circle_id].append(new_message)
+
+        await state_store.append(self._messages_key(circle_id), new_message)
         return new_message
 
 peer_circle_service = PeerCircleService()
@@ -1,24 +1,19 @@
-import openai
 from typing import List, Dict
 from datetime import datetime, timedelta
 import json
 import random
 
-from config import settings
 from models.challenge import (
     PersonalizedChallengeRequest, Challenge, Quest, ChallengeType,
     SkillCategory, DifficultyLevel, PersonalGrowthPlan
 )
-
-openai.api_key = settings.OPENAI_API_KEY
+from services.llm_gateway import llm_gateway
+from services.llm_scheduler import LLMPriority
 
 
 class PersonalizedChallengeService:
     """Generate truly unique, AI-powered personalized challenges."""
     
-    def __init__(self):
-        self.model = settings.OPENAI_MODEL
-    
     async def generate_daily_challenges(
         self, 
         request: PersonalizedChallengeRequest,
@@ -31,17 +26,17 @@ class PersonalizedChallengeService:
         prompt = self._build_challenge_prompt(request, count)
         
         try:
-            response = await openai.ChatCompletion.acreate(
-                model=self.model,
+            content = await llm_gateway.chat(
                 messages=[
                     {"role": "system", "content": "You are a creative challenge designer who creates unique, personalized growth challenges for students."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.9,  # High creativity
-                max_tokens=2000
+                max_tokens=2000,
+                priority=LLMPriority.BACKGROUND
             )
             
-            challenges_data = json.loads(response.choices[0].message.content)
+            challenges_data = json.loads(content)
             challenges = self._parse_challenges(challenges_data, request)
             
             return challenges
@@ -181,17 +176,17 @@ Make it EXCITING and AGE-APPROPRIATE!
 """
         
         try:
-            response = await openai.ChatCompletion.acreate(
-                model=self.model,
+            content = await llm_gateway.chat(
                 messages=[
                     {"role": "system", "content": "You are a creative game designer creating engaging quests for students."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.95,
-                max_tokens=1500
+                max_tokens=1500,
+                priority=LLMPriority.BACKGROUND
             )
             
-            quest_data = json.loads(response.choices[0].message.content)
+            quest_data = json.loads(content)
             
             return Quest(
                 id=f"quest-{user_id}-{datetime.now().timestamp()}",
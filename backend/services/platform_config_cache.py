@@ -0,0 +1,187 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Type, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy import select
+
+from config import settings
+from database import AsyncSessionLocal, async_engine
+from models.platform_config import PlatformConfig
+from services.state_store import state_store
+
+
+# ----- typed views of the configs the platform enforces -----
+
+class AIModelConfig(BaseModel):
+    provider: str = "openai"
+    model: Optional[str] = None
+    temperature: float = 0.7
+    max_tokens: Optional[int] = None
+    fallback_provider: Optional[str] = None
+
+
+class FeatureFlags(BaseModel):
+    video_chat: bool = True
+    parent_portal: bool = True
+    beta_features: bool = False
+    maintenance_mode: bool = False
+
+
+class RateLimitConfig(BaseModel):
+    """Requests per `window_seconds`: per caller, per student, per school"""
+    global_limit: int = 1000
+    student_limit: int = 100
+    school_limit: int = 5000
+    window_seconds: float = 60.0
+    role_limits: Dict[str, int] = {}  # per-role overrides of global_limit
+    enabled: bool = True
+
+
+TYPED_CONFIGS: Dict[str, Type[BaseModel]] = {
+    "ai_model_config": AIModelConfig,
+    "feature_flags": FeatureFlags,
+    "api_rate_limits": RateLimitConfig,
+}
+
+T = TypeVar("T", bound=BaseModel)
+
+
+@dataclass(frozen=True)
+class ConfigEntry:
+    key: str
+    value: Any
+    category: Optional[str]
+    description: Optional[str]
+    is_encrypted: bool
+    updated_at: Optional[datetime]
+    updated_by: Optional[str]
+
+
+class PlatformConfigCache:
+    """
+    Every PlatformConfig row, loaded once and served from memory.
+
+    Writers bump a version counter in the shared state store
+    (`platform_config:version`); each worker compares it with the version
+    it loaded at most every PLATFORM_CONFIG_CHECK_SECONDS and reloads all
+    rows (one SELECT) when it moved. If the database is unreachable the
+    last loaded configs keep being served.
+    """
+
+    VERSION_KEY = "platform_config:version"
+
+    def __init__(self, session_factory=AsyncSessionLocal, check_seconds: float = None):
+        self._sessions = session_factory
+        self.check_seconds = check_seconds if check_seconds is not None else settings.PLATFORM_CONFIG_CHECK_SECONDS
+        self._entries: Dict[str, ConfigEntry] = {}
+        self._typed: Dict[str, BaseModel] = {}
+        self._version: Optional[int] = None
+        self._loaded = False
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _current_version(self) -> int:
+        return int(await state_store.get(self.VERSION_KEY) or 0)
+
+    async def _reload(self, version: int):
+        try:
+            async with self._sessions() as db:
+                rows = (await db.execute(select(PlatformConfig))).scalars().all()
+        except Exception as e:
+            print(f"Platform config load failed: {e}")
+            return
+        self._entries = {
+            row.key: ConfigEntry(
+                key=row.key,
+                value=row.value,
+                category=row.category,
+                description=row.description,
+                is_encrypted=bool(row.is_encrypted),
+                updated_at=row.updated_at,
+                updated_by=row.updated_by
+            )
+            for row in rows
+        }
+        self._typed = {}
+        self._version = version
+        self._loaded = True
+
+    async def refresh(self, force: bool = False):
+        """Reload if another worker (or this one) changed a config"""
+        if not force and self._loaded and time.monotonic() - self._checked_at < self.check_seconds:
+            return
+        async with self._lock:
+            if not force and self._loaded and time.monotonic() - self._checked_at < self.check_seconds:
+                return
+            version = await self._current_version()
+            if force or not self._loaded or version != self._version:
+                await self._reload(version)
+            self._checked_at = time.monotonic()
+
+    async def entries(self, category: Optional[str] = None) -> List[ConfigEntry]:
+        await self.refresh()
+        return [e for e in self._entries.values() if category is None or e.category == category]
+
+    async def entry(self, key: str) -> Optional[ConfigEntry]:
+        await self.refresh()
+        return self._entries.get(key)
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        entry = await self.entry(key)
+        return entry.value if entry is not None else default
+
+    async def typed(self, key: str, model: Type[T] = None) -> T:
+        """
+        The config parsed into its model (TYPED_CONFIGS, or `model`); a
+        missing or malformed row yields the model's defaults.
+        """
+        model = model or TYPED_CONFIGS[key]
+        await self.refresh()
+        parsed = self._typed.get(key)
+        if parsed is None or not isinstance(parsed, model):
+            value = self._entries[key].value if key in self._entries else None
+            try:
+                parsed = model.model_validate(value if isinstance(value, dict) else {})
+            except Exception as e:
+                print(f"Invalid {key} config, using defaults: {e}")
+                parsed = model()
+            self._typed[key] = parsed
+        return parsed
+
+    async def invalidate(self):
+        """Call after committing a config change: tells every worker to reload"""
+        version = await state_store.incr(self.VERSION_KEY)
+        async with self._lock:
+            await self._reload(version)
+            self._checked_at = time.monotonic()
+
+    async def seed(self, defaults: Dict[str, Dict]):
+        """Insert missing default configs in one statement; existing rows are left alone"""
+        if async_engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+        stmt = insert(PlatformConfig).values([
+            {
+                "key": key,
+                "value": data["value"],
+                "category": data["category"],
+                "description": data["description"],
+                "is_encrypted": False
+            }
+            for key, data in defaults.items()
+        ]).on_conflict_do_nothing(index_elements=["key"])
+
+        async with self._sessions() as db:
+            result = await db.execute(stmt)
+            await db.commit()
+        if result.rowcount:
+            await self.invalidate()
+
+
+# Global instance
+platform_config = PlatformConfigCache()
@@ -0,0 +1,152 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from config import settings
+from services.state_store import StateStore, state_store
+
+
+class PresenceService:
+    """
+    Who is online in each room, kept up to date on join, leave and disconnect.
+
+    Membership lives in the shared state store: per room an ordered set of
+    online users, an online count and, per user, a count of open sockets
+    (a user with two tabs, or on two workers, is one member). Only the
+    socket that takes a user's count from 0 to 1 or back records a change,
+    so each transition is reported once across workers.
+
+    A change doesn't push the roster: it is recorded in a per-room diff,
+    and every PRESENCE_FLUSH_MS the rooms that changed get one
+    `presence_diff` with who joined and left since the last push and the
+    shared count. A user who leaves and comes back within the interval
+    cancels out. A socket that joins gets the current roster once
+    (`presence_snapshot`).
+
+    With a pub/sub Socket.IO manager (several workers) and the memory state
+    backend there is no shared roster, so presence is disabled rather than
+    broadcasting one worker's partial counts. Sockets of a worker that
+    dies without disconnecting stay counted.
+    """
+
+    def __init__(self, emit: Callable[..., Awaitable] = None, flush_ms: float = None,
+                 store: StateStore = None, enabled: bool = None):
+        self._emit = emit or self._emit_to_room
+        self.interval = (flush_ms if flush_ms is not None else settings.PRESENCE_FLUSH_MS) / 1000
+        self._store = store or state_store
+        if enabled is None:
+            enabled = settings.SOCKETIO_MANAGER == "memory" or settings.STATE_BACKEND != "memory"
+        self.enabled = enabled
+        self._sid_rooms: Dict[str, Dict[str, str]] = {}  # sid -> room -> user_id it joined as
+        self._pending: Dict[str, Dict[str, bool]] = {}  # room -> user_id -> online
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    async def _emit_to_room(event: str, payload: Dict, room: str):
+        from socket_manager import sio
+        await sio.emit(event, payload, room=room)
+
+    @staticmethod
+    def _members_key(room: str) -> str:
+        return f"presence:{room}:members"
+
+    @staticmethod
+    def _count_key(room: str) -> str:
+        return f"presence:{room}:count"
+
+    @staticmethod
+    def _sockets_key(room: str, user_id: str) -> str:
+        return f"presence:{room}:sockets:{user_id}"
+
+    def _changed(self, room: str, user_id: str, online: bool):
+        changes = self._pending.setdefault(room, {})
+        if user_id in changes:
+            del changes[user_id]  # back to how the last push left it
+            if not changes:
+                del self._pending[room]
+        else:
+            changes[user_id] = online
+            if self._task is None or self._task.done():
+                self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def join(self, sid: str, user_id: str, room: str):
+        if not self.enabled:
+            return
+        rooms = self._sid_rooms.setdefault(sid, {})
+        if room in rooms:
+            return
+        rooms[room] = user_id
+
+        if await self._store.incr(self._sockets_key(room, user_id)) == 1:
+            await self._store.add_member(self._members_key(room), user_id)
+            await self._store.incr(self._count_key(room))
+            self._changed(room, user_id, True)
+        await self._emit("presence_snapshot", await self.snapshot(room), sid)
+
+    async def leave(self, sid: str, room: str):
+        rooms = self._sid_rooms.get(sid)
+        if not rooms or room not in rooms:
+            return
+        user_id = rooms.pop(room)
+        if not rooms:
+            del self._sid_rooms[sid]
+
+        sockets_key = self._sockets_key(room, user_id)
+        remaining = await self._store.incr(sockets_key, -1)
+        if remaining > 0:
+            return
+        if remaining < 0:
+            await self._store.set(sockets_key, 0)
+        await self._store.incr(self._count_key(room), -1)
+        await self._store.remove_member(self._members_key(room), user_id)
+        if (await self._store.get(sockets_key) or 0) > 0:
+            # A socket on another worker came online in between and reported it
+            await self._store.add_member(self._members_key(room), user_id)
+        else:
+            self._changed(room, user_id, False)
+
+    def rooms_of(self, sid: str) -> List[str]:
+        return list(self._sid_rooms.get(sid, ()))
+
+    async def drop(self, sid: str):
+        """Leave every room the socket was in (on disconnect)"""
+        for room in self.rooms_of(sid):
+            await self.leave(sid, room)
+
+    async def count(self, room: str) -> int:
+        return max(0, await self._store.get(self._count_key(room)) or 0)
+
+    async def snapshot(self, room: str) -> Dict:
+        members = sorted(await self._store.members(self._members_key(room)))
+        return {"room": room, "count": len(members), "members": members}
+
+    async def flush(self):
+        """Push the diffs recorded since the last flush"""
+        pending, self._pending = self._pending, {}
+        for room, changes in pending.items():
+            joined: List[str] = [u for u, online in changes.items() if online]
+            left: List[str] = [u for u, online in changes.items() if not online]
+            try:
+                await self._emit("presence_diff", {
+                    "room": room,
+                    "count": await self.count(room),
+                    "joined": joined,
+                    "left": left
+                }, room)
+            except Exception as e:
+                print(f"Presence push failed for {room}: {e}")
+
+    async def _run(self):
+        while self._pending:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def close(self):
+        """Stop the flusher (called on app shutdown)"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+# Global instance
+presence = PresenceService()
@@ -0,0 +1,197 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from config import settings
+from models.db_models import User, UserRole
+from services.state_store import state_store
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The parts of a User that authorization needs"""
+    id: str
+    role: UserRole
+    school_id: Optional[int]
+    is_active: bool
+
+
+# The principal behind the request being handled, once known (set by the
+# rate limiter for cached tokens and by get_current_user)
+current_principal: ContextVar[Optional[Principal]] = ContextVar("current_principal", default=None)
+
+
+class PrincipalCache:
+    """
+    Token signature -> Principal, bounded by PRINCIPAL_CACHE_SIZE (LRU) and
+    PRINCIPAL_CACHE_TTL_SECONDS (never past the token's own `exp`).
+
+    Entries for a user are dropped when their role or is_active changes in
+    this process. The commit also bumps a version counter in the shared
+    state store (`principal_cache:version`); every worker compares it with
+    the one it last saw at most every PRINCIPAL_CACHE_CHECK_SECONDS
+    (`sync`, called before lookups) and drops all its entries when it moved.
+    """
+
+    VERSION_KEY = "principal_cache:version"
+
+    def __init__(self, max_size: int = None, ttl_seconds: float = None, check_seconds: float = None):
+        self.max_size = max_size if max_size is not None else settings.PRINCIPAL_CACHE_SIZE
+        self.ttl = ttl_seconds if ttl_seconds is not None else settings.PRINCIPAL_CACHE_TTL_SECONDS
+        self.check_seconds = check_seconds if check_seconds is not None else settings.PRINCIPAL_CACHE_CHECK_SECONDS
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._publishing: Set[asyncio.Future] = set()
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        self._by_user: Dict[str, Set[str]] = {}
+        # Invalidation can arrive from sync sessions running in threads
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def signature(token: str) -> str:
+        return token.rsplit(".", 1)[-1]
+
+    def get(self, token: str) -> Optional[Principal]:
+        key = self.signature(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at <= time.time():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return principal
+
+    def put(self, token: str, principal: Principal, token_exp: Optional[float] = None):
+        if self.max_size <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if token_exp:
+            expires_at = min(expires_at, token_exp)
+
+        key = self.signature(token)
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (principal, expires_at)
+            self._by_user.setdefault(principal.id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._by_user.get(entry[0].id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_user[entry[0].id]
+
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            for key in list(self._by_user.get(str(user_id), ())):
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    async def sync(self):
+        """Drop everything if another worker invalidated a principal since the last check"""
+        self._loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        if now - self._checked_at < self.check_seconds:
+            return
+        self._checked_at = now
+        try:
+            version = int(await state_store.get(self.VERSION_KEY) or 0)
+        except Exception as e:
+            print(f"Principal cache version check failed: {e}")
+            return
+        if self._version is not None and version != self._version:
+            self.clear()
+        self._version = version
+
+    async def _bump(self):
+        try:
+            await state_store.incr(self.VERSION_KEY)
+        except Exception as e:
+            print(f"Principal cache invalidation not published: {e}")
+
+    def publish(self):
+        """Tell the other workers to drop their entries (safe from sync code and threads)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            future = loop.create_task(self._bump())
+        elif self._loop is not None and not self._loop.is_closed():
+            future = asyncio.run_coroutine_threadsafe(self._bump(), self._loop)
+        else:
+            # No event loop in this process (e.g. an admin script): publish inline
+            asyncio.run(self._bump())
+            return
+        self._publishing.add(future)
+        future.add_done_callback(self._publishing.discard)
+
+
+# Global instance
+principal_cache = PrincipalCache()
+
+
+# ----- invalidation hooks -----
+
+_PENDING_KEY = "principal_invalidations"
+
+
+def _on_auth_attribute_change(target: User, value, oldvalue, initiator):
+    if value == oldvalue or target.id is None:
+        return
+    principal_cache.invalidate_user(target.id)
+    # Drop again after commit, in case a request re-cached the old value in between
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(target.id)
+
+
+for _attribute in (User.role, User.is_active):
+    event.listen(_attribute, "set", _on_auth_attribute_change)
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_deleted(mapper, connection, target: User):
+    principal_cache.invalidate_user(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session):
+    user_ids = session.info.pop(_PENDING_KEY, ())
+    for user_id in user_ids:
+        principal_cache.invalidate_user(user_id)
+    if user_ids:
+        principal_cache.publish()
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_bulk_user_changes(orm_execute_state):
+    # Bulk UPDATE/DELETE on users can't say which rows it touched
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is User:
+            principal_cache.clear()
+            # A placeholder id, so the commit publishes the change
+            orm_execute_state.session.info.setdefault(_PENDING_KEY, set()).add("*")
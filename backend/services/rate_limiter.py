@@ -0,0 +1,255 @@
+import abc
+import json
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from models.db_models import UserRole
+from services.platform_config_cache import RateLimitConfig, platform_config
+from services.auth_service import principal_for_token
+from services.principal_cache import current_principal
+
+# (key, limit) pairs checked together for one request
+Limits = List[Tuple[str, int]]
+
+_STUDENT = UserRole.STUDENT.value
+
+
+def _window(now: float, window: float) -> Tuple[int, float]:
+    """Index of the current fixed window and how far into it `now` is (0..1)"""
+    position = now / window
+    index = int(position)
+    return index, position - index
+
+
+def _estimate(current: int, previous: int, elapsed: float) -> float:
+    """
+    Sliding-window count: all hits in the current window plus the share of
+    the previous window that still overlaps the last `window` seconds.
+    """
+    return previous * (1.0 - elapsed) + current
+
+
+class RateLimitBackend(abc.ABC):
+    """
+    Sliding-window counters (two fixed windows, weighted) keyed by string.
+
+    `hit` counts one request against every (key, limit) pair and returns 0
+    if all of them allow it. Otherwise nothing is counted and it returns
+    the seconds until the caller should retry.
+
+    RATE_LIMIT_BACKEND picks "memory" (per worker) or "redis" (shared;
+    RATE_LIMIT_REDIS_URL or REDIS_URL, `fakeredis://` for an in-process
+    stand-in).
+    """
+
+    @abc.abstractmethod
+    async def hit(self, limits: Limits, window: float) -> float:
+        ...
+
+
+class _Shard:
+    __slots__ = ("lock", "counts", "swept")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> [window index, hits in that window, hits in the one before]
+        self.counts: Dict[str, List[int]] = {}
+        self.swept = 0
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Counters in a dict split over lock-striped shards"""
+
+    def __init__(self, shards: int = 64):
+        # Power of two so a shard is picked with a mask
+        size = 1 << max(0, (shards - 1).bit_length())
+        self._mask = size - 1
+        self._shards = [_Shard() for _ in range(size)]
+
+    def _shard(self, key: str) -> _Shard:
+        return self._shards[hash(key) & self._mask]
+
+    @staticmethod
+    def _sweep(shard: _Shard, index: int):
+        # Once per window per shard: forget keys idle for a whole window
+        stale = [k for k, c in shard.counts.items() if c[0] < index - 1]
+        for k in stale:
+            del shard.counts[k]
+        shard.swept = index
+
+    async def hit(self, limits: Limits, window: float) -> float:
+        return self.hit_now(limits, window, time.time())
+
+    def hit_now(self, limits: Limits, window: float, now: float) -> float:
+        index, elapsed = _window(now, window)
+        shards, mask = self._shards, self._mask
+        counted = []
+        for key, limit in limits:
+            shard = shards[hash(key) & mask]
+            with shard.lock:
+                if shard.swept < index:
+                    self._sweep(shard, index)
+                counts = shard.counts.get(key)
+                if counts is None:
+                    counts = shard.counts[key] = [index, 0, 0]
+                elif counts[0] != index:
+                    previous = counts[1] if counts[0] == index - 1 else 0
+                    counts[0], counts[1], counts[2] = index, 0, previous
+                # _estimate() inlined: this runs on every request
+                if counts[2] * (1.0 - elapsed) + counts[1] + 1 > limit:
+                    rejected = True
+                else:
+                    counts[1] += 1
+                    rejected = False
+            if rejected:
+                # Give back what the earlier keys already counted
+                for counted_key, counted_counts in counted:
+                    with self._shard(counted_key).lock:
+                        if counted_counts[0] == index:
+                            counted_counts[1] -= 1
+                return max(window * (1.0 - elapsed), 1.0)
+            counted.append((key, counts))
+        return 0.0
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    Counters in Redis, shared by every worker: one pipelined round trip per
+    request (INCR + EXPIRE this window, GET the previous one, per key), and
+    a second one to undo the increments when the request is rejected.
+    If Redis is unreachable requests are let through.
+    """
+
+    def __init__(self, url: str = None, namespace: str = None):
+        from services.redis_client import get_redis
+        self.redis = get_redis(url or settings.RATE_LIMIT_REDIS_URL or None)
+        self.namespace = (namespace if namespace is not None else settings.STATE_KEY_PREFIX) + "ratelimit:"
+        self._failing = False
+
+    async def hit(self, limits: Limits, window: float) -> float:
+        index, elapsed = _window(time.time(), window)
+        ttl = int(math.ceil(window * 2))
+        keys = [f"{self.namespace}{key}:{index}" for key, _ in limits]
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for (key, _), current in zip(limits, keys):
+                pipe.incr(current)
+                pipe.expire(current, ttl)
+                pipe.get(f"{self.namespace}{key}:{index - 1}")
+            results = await pipe.execute()
+
+            rejected = False
+            for i, (_, limit) in enumerate(limits):
+                current, previous = results[3 * i], int(results[3 * i + 2] or 0)
+                if _estimate(current, previous, elapsed) > limit:
+                    rejected = True
+                    break
+            if rejected:
+                pipe = self.redis.pipeline(transaction=False)
+                for current in keys:
+                    pipe.decr(current)
+                await pipe.execute()
+            self._failing = False
+        except Exception as e:
+            if not self._failing:
+                print(f"Rate limiter Redis unavailable, not limiting: {e}")
+                self._failing = True
+            return 0.0
+        return max(window * (1.0 - elapsed), 1.0) if rejected else 0.0
+
+
+def create_rate_limit_backend(backend: str = None) -> RateLimitBackend:
+    backend = (backend or settings.RATE_LIMIT_BACKEND).lower()
+    if backend == "redis":
+        return RedisRateLimitBackend()
+    if backend == "memory":
+        return MemoryRateLimitBackend()
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND '{backend}' (expected memory or redis)")
+
+
+def limits_for(config: RateLimitConfig, principal, client: Optional[str]) -> Limits:
+    """
+    The counters one request is checked against: the caller (student_limit
+    for students, `role_limits` overrides per role, global_limit otherwise)
+    and, for school members, the school as a whole (school_limit).
+    Callers without a valid token count by IP.
+    """
+    if principal is None:
+        return [(f"ip:{client}", config.global_limit)]
+
+    # UserRole is a str enum, so it matches plain role names directly
+    limit = config.role_limits.get(principal.role)
+    if limit is None:
+        limit = config.student_limit if principal.role == _STUDENT else config.global_limit
+    limits = [(f"user:{principal.id}", limit)]
+    if principal.school_id is not None:
+        limits.append((f"school:{principal.school_id}", config.school_limit))
+    return limits
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware enforcing the `api_rate_limits` platform config
+    (read from the in-process config cache) over a sliding window of
+    `window_seconds`. Rejected requests get 429 with Retry-After.
+    """
+
+    EXEMPT_PATHS = {"/", "/health", "/docs", "/redoc", "/openapi.json"}
+
+    def __init__(self, app, backend: RateLimitBackend = None):
+        self.app = app
+        self.backend = backend
+
+    @staticmethod
+    def _bearer_token(scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                return token if scheme.lower() == "bearer" and token else None
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in self.EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        config = await platform_config.typed("api_rate_limits")
+        if not config.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        token = self._bearer_token(scope)
+        principal = None
+        if token:
+            try:
+                # Cached per token; a miss verifies it and loads the user once
+                principal = await principal_for_token(token)
+            except Exception as e:
+                print(f"Rate limiter could not resolve the caller, counting by IP: {e}")
+        if principal is not None:
+            current_principal.set(principal)
+        client = scope["client"][0] if scope.get("client") else None
+        backend = self.backend or rate_limiter
+        retry_after = await backend.hit(limits_for(config, principal, client), config.window_seconds)
+        if not retry_after:
+            await self.app(scope, receive, send)
+            return
+
+        body = json.dumps({"detail": "Rate limit exceeded"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(int(math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# Global instance
+rate_limiter = create_rate_limit_backend()
@@ -0,0 +1,40 @@
+from typing import Dict
+
+from config import settings
+
+_clients: Dict[str, object] = {}
+_fake_servers: Dict[str, object] = {}
+
+
+def fake_server(url: str):
+    """The in-process server behind a `fakeredis://` URL"""
+    if url not in _fake_servers:
+        from fakeredis import FakeServer
+        _fake_servers[url] = FakeServer()
+    return _fake_servers[url]
+
+
+def get_redis(url: str = None):
+    """
+    Shared asyncio Redis client for `url` (defaults to REDIS_URL).
+
+    A `fakeredis://` URL returns an in-process stand-in (needs the
+    `fakeredis` package), so tests and single-process local runs don't
+    need a Redis server. Each distinct fakeredis URL is its own server.
+    """
+    url = url or settings.REDIS_URL
+    if url not in _clients:
+        if url.startswith("fakeredis://"):
+            from fakeredis import aioredis as fake_redis
+            _clients[url] = fake_redis.FakeRedis(server=fake_server(url), decode_responses=True)
+        else:
+            import redis.asyncio as redis
+            _clients[url] = redis.from_url(url, decode_responses=True)
+    return _clients[url]
+
+
+async def close_redis():
+    """Close every shared client (called on app shutdown)"""
+    while _clients:
+        _, client = _clients.popitem()
+        await client.aclose()
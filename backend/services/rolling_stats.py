@@ -0,0 +1,71 @@
+import math
+
+import numpy as np
+
+
+class RollingStats:
+    """
+    Bounded per-signal statistics, updated in O(1) per observation.
+
+    Keeps the last `window` values in a preallocated ring buffer (with a
+    running sum for the window mean) and an exponentially weighted mean and
+    variance. Memory is fixed at construction no matter how many values
+    are pushed.
+    """
+
+    __slots__ = ("_buffer", "_next", "count", "_window_sum", "alpha", "ewma_mean", "ewma_var")
+
+    def __init__(self, window: int = 256, alpha: float = 0.05):
+        self._buffer = np.zeros(window, dtype=np.float64)
+        self._next = 0
+        self.count = 0
+        self._window_sum = 0.0
+        self.alpha = alpha
+        self.ewma_mean = 0.0
+        self.ewma_var = 0.0
+
+    @property
+    def window(self) -> int:
+        return len(self._buffer)
+
+    def push(self, value: float):
+        value = float(value)
+        window = len(self._buffer)
+
+        # Ring buffer: overwrite the oldest slot and adjust the running sum
+        if self.count >= window:
+            self._window_sum -= self._buffer[self._next]
+        self._buffer[self._next] = value
+        self._window_sum += value
+        self._next += 1
+        if self._next == window:
+            self._next = 0
+            # Re-sum once per lap so float error in the running sum can't accumulate
+            self._window_sum = float(self._buffer.sum())
+
+        # Exponentially weighted mean/variance (West's incremental form)
+        if self.count == 0:
+            self.ewma_mean = value
+            self.ewma_var = 0.0
+        else:
+            diff = value - self.ewma_mean
+            increment = self.alpha * diff
+            self.ewma_mean += increment
+            self.ewma_var = (1 - self.alpha) * (self.ewma_var + diff * increment)
+
+        self.count += 1
+
+    @property
+    def window_mean(self) -> float:
+        filled = min(self.count, len(self._buffer))
+        return self._window_sum / filled if filled else 0.0
+
+    @property
+    def ewma_std(self) -> float:
+        return math.sqrt(self.ewma_var)
+
+    def zscore(self, expected: float, std_floor: float) -> float:
+        """How many (EWMA) standard deviations the current level sits above `expected`"""
+        if self.count == 0:
+            return 0.0
+        return (self.ewma_mean - expected) / max(self.ewma_std, std_floor)
@@ -0,0 +1,168 @@
+import json
+import math
+import os
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+
+from config import settings
+from services.llm_gateway import llm_gateway
+from services.llm_scheduler import LLMPriority
+
+LEXICON_PATH = os.path.join(os.path.dirname(__file__), "data", "sentiment_lexicon.json")
+
+
+class SentimentResult(NamedTuple):
+    score: float        # 0 = very negative, 0.5 = neutral, 1 = very positive
+    confidence: float   # 0-1, how far the local score is from neutral
+    tier: str           # "local" or "llm"
+
+
+class SentimentScorer:
+    """
+    Lexicon-based sentiment model that runs in-process.
+
+    Valences come from the shipped lexicon (words and short phrases,
+    -4..+4). A negated word ("not happy") flips and damps its valence.
+    Phrase valences are the valence of the whole phrase: the weight of
+    each n-gram is stored net of the sub-terms it contains, so summing
+    n-gram counts never double counts.
+
+    Messages with sentiment-bearing words but a weak or mixed score fall
+    inside the uncertainty band and are sent to the LLM instead.
+    """
+
+    SCALE = 3.0  # raw valence that maps to roughly 0.88 / 0.12
+
+    def __init__(self, lexicon_path: str = LEXICON_PATH):
+        self.lexicon_path = lexicon_path
+        self._vectorizer: Optional[CountVectorizer] = None
+        self._analyzer = None
+        self._index: Dict[str, int] = {}
+        self._weights: Optional[np.ndarray] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._weights is not None
+
+    def load(self):
+        """Build the vectorizer and weight vector from the lexicon (called once at startup)"""
+        with open(self.lexicon_path) as f:
+            lexicon = json.load(f)
+
+        valences: Dict[str, float] = {}
+        for term, valence in lexicon["terms"].items():
+            valences[" ".join(self._tokenize(term))] = float(valence)
+
+        # Negated single words, unless the lexicon defines the phrase itself
+        damping = lexicon.get("negation_damping", 0.5)
+        for term, valence in list(valences.items()):
+            if " " in term:
+                continue
+            for negator in lexicon.get("negators", []):
+                valences.setdefault(f"{negator} {term}", -valence * damping)
+
+        vocabulary = sorted(valences, key=lambda t: (t.count(" "), t))
+        max_ngram = max(t.count(" ") for t in vocabulary) + 1
+        index = {term: i for i, term in enumerate(vocabulary)}
+
+        # Shorter n-grams first so sub-term weights are known when a phrase is reached
+        weights = np.zeros(len(vocabulary), dtype=np.float64)
+        for term in vocabulary:
+            tokens = term.split(" ")
+            contained = sum(
+                weights[index[sub]]
+                for sub in self._sub_ngrams(tokens)
+                if sub in index
+            )
+            weights[index[term]] = valences[term] - contained
+
+        self._vectorizer = CountVectorizer(
+            vocabulary=index,
+            ngram_range=(1, max_ngram),
+            token_pattern=r"(?u)\b\w[\w']*",
+            preprocessor=self._preprocess
+        )
+        self._analyzer = self._vectorizer.build_analyzer()
+        self._index = index
+        self._weights = weights
+
+    def score(self, text: str) -> SentimentResult:
+        """Score one message locally"""
+        if not self.is_loaded:
+            self.load()
+
+        raw = 0.0
+        hits = 0
+        for ngram in self._analyzer(text):
+            i = self._index.get(ngram)
+            if i is not None:
+                raw += self._weights[i]
+                hits += 1
+
+        return self._result(raw, hits)
+
+    def is_uncertain(self, result: SentimentResult) -> bool:
+        """Sentiment-bearing text whose local score is too weak or mixed to trust"""
+        return result.confidence > 0 and result.confidence < settings.SENTIMENT_UNCERTAINTY_BAND
+
+    async def analyze(self, text: str, priority: LLMPriority = LLMPriority.CRISIS) -> SentimentResult:
+        """
+        Local score, escalated to the LLM only inside the uncertainty band.
+        The escalation feeds the risk screen, so it is queued with crisis
+        work by default rather than behind chat turns.
+        If the LLM is unavailable the local score is kept.
+        """
+        result = self.score(text)
+        if not self.is_uncertain(result) or not llm_gateway.is_configured:
+            return result
+
+        try:
+            content = await llm_gateway.chat(
+                messages=[{
+                    "role": "system",
+                    "content": "Analyze the emotional tone. Return only a number 0-10 where 0=very negative, 5=neutral, 10=very positive."
+                }, {
+                    "role": "user",
+                    "content": text
+                }],
+                temperature=0.3,
+                max_tokens=10,
+                priority=priority
+            )
+            score = min(max(float(content.strip()), 0), 10) / 10
+            return SentimentResult(score, abs(score - 0.5) * 2, "llm")
+        except Exception as e:
+            print(f"LLM sentiment fallback to local score: {e}")
+            return result
+
+    def _result(self, raw: float, hits: int) -> SentimentResult:
+        if hits == 0:
+            return SentimentResult(0.5, 0.0, "local")
+        polarity = math.tanh(raw / self.SCALE)
+        return SentimentResult((polarity + 1) / 2, abs(polarity), "local")
+
+    @staticmethod
+    def _preprocess(text: str) -> str:
+        return text.lower().replace("’", "'")
+
+    def _tokenize(self, text: str) -> List[str]:
+        return CountVectorizer(
+            token_pattern=r"(?u)\b\w[\w']*",
+            preprocessor=self._preprocess
+        ).build_analyzer()(text)
+
+    @staticmethod
+    def _sub_ngrams(tokens: List[str]) -> List[str]:
+        """Every proper contiguous sub-sequence of `tokens`, with multiplicity"""
+        n = len(tokens)
+        return [
+            " ".join(tokens[start:start + size])
+            for size in range(1, n)
+            for start in range(n - size + 1)
+        ]
+
+
+# Global instance
+sentiment_scorer = SentimentScorer()
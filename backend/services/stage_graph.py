@@ -0,0 +1,78 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Tuple
+
+
+class StageGraph:
+    """
+    Small dependency-graph executor for multi-call AI pipelines.
+
+    Each stage starts as soon as the stages it depends on have finished, so
+    independent stages run concurrently and total latency follows the
+    longest dependency path. All stages share one request deadline; a stage
+    that errors or misses the deadline resolves to its fallback instead.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Tuple[Callable[..., Awaitable[Any]], Tuple[str, ...], Any]] = {}
+
+    def add(
+        self,
+        name: str,
+        fn: Callable[..., Awaitable[Any]],
+        depends_on: Iterable[str] = (),
+        fallback: Any = None
+    ) -> "StageGraph":
+        """
+        Register a stage. `fn` is called with the results of `depends_on`
+        as keyword arguments. `fallback` is either a value or a callable
+        taking the same keyword arguments.
+        """
+        deps = tuple(depends_on)
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self._stages[name] = (fn, deps, fallback)
+        return self
+
+    async def run(self, deadline_seconds: float) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Execute all stages within `deadline_seconds`.
+        Returns (results by stage name, metadata with per-stage latency and degraded stages).
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + deadline_seconds
+        tasks: Dict[str, asyncio.Task] = {}
+        latency_ms: Dict[str, float] = {}
+        degraded = []
+
+        async def run_stage(name: str):
+            fn, deps, fallback = self._stages[name]
+            inputs = {dep: await tasks[dep] for dep in deps}
+            stage_started = time.perf_counter()
+            try:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                return await asyncio.wait_for(fn(**inputs), timeout=remaining)
+            except Exception as e:
+                degraded.append({"stage": name, "reason": "deadline" if isinstance(e, asyncio.TimeoutError) else str(e)})
+                return fallback(**inputs) if callable(fallback) else fallback
+            finally:
+                latency_ms[name] = round((time.perf_counter() - stage_started) * 1000, 1)
+
+        # Stages are registered after their dependencies, so creating tasks
+        # in insertion order guarantees every awaited dependency exists
+        for name in self._stages:
+            tasks[name] = asyncio.create_task(run_stage(name))
+
+        values = await asyncio.gather(*tasks.values())
+
+        metadata = {
+            "stage_latency_ms": latency_ms,
+            "total_latency_ms": round((loop.time() - started) * 1000, 1),
+            "deadline_ms": round(deadline_seconds * 1000),
+            "degraded_stages": degraded
+        }
+        return dict(zip(tasks.keys(), values)), metadata
@@ -0,0 +1,397 @@
+import abc
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Integer, String, cast, delete, func, select, union
+
+from config import settings
+
+
+def _dump(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _load(raw: Optional[str]) -> Any:
+    return None if raw is None else json.loads(raw)
+
+
+class StateStore(abc.ABC):
+    """
+    Async shared-state API used instead of process-local dicts.
+
+    Three kinds of data live under string keys:
+      - values: get / set (optional TTL) / get_many / incr
+      - lists: append / get_list
+      - ordered sets: add_member / remove_member / members
+    Values must be JSON-serializable (use model_dump(mode="json") for
+    pydantic models). delete() and keys() cover all three kinds.
+
+    The backend is chosen by STATE_BACKEND: "memory" (single process),
+    "sql" (the app database) or "redis" (REDIS_URL; `fakeredis://` for an
+    in-process stand-in). Only sql and redis are shared across workers.
+    """
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Any:
+        ...
+
+    @abc.abstractmethod
+    async def get_many(self, keys: List[str]) -> List[Any]:
+        ...
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ...
+
+    @abc.abstractmethod
+    async def delete(self, key: str) -> bool:
+        ...
+
+    @abc.abstractmethod
+    async def keys(self, prefix: str) -> List[str]:
+        ...
+
+    @abc.abstractmethod
+    async def incr(self, key: str, amount: int = 1) -> int:
+        ...
+
+    @abc.abstractmethod
+    async def append(self, key: str, value: Any) -> int:
+        """Append to the list at `key`; returns the new length"""
+        ...
+
+    @abc.abstractmethod
+    async def get_list(self, key: str, start: int = 0, end: int = -1) -> List[Any]:
+        """List items from `start` to `end` inclusive (negative indexes count from the end)"""
+        ...
+
+    @abc.abstractmethod
+    async def add_member(self, key: str, member: str) -> bool:
+        """Add to the ordered set at `key`; False if it was already there"""
+        ...
+
+    @abc.abstractmethod
+    async def remove_member(self, key: str, member: str) -> bool:
+        ...
+
+    @abc.abstractmethod
+    async def members(self, key: str) -> List[str]:
+        """Set members in the order they were first added"""
+        ...
+
+    async def close(self):
+        pass
+
+
+def _slice(items: list, start: int, end: int) -> list:
+    stop = None if end == -1 else end + 1
+    return items[start:stop]
+
+
+class MemoryStateStore(StateStore):
+    """Process-local backend. Values are stored serialized so callers never share mutable objects."""
+
+    def __init__(self):
+        self._values: Dict[str, str] = {}
+        self._expires: Dict[str, float] = {}
+        self._lists: Dict[str, List[str]] = {}
+        self._members: Dict[str, Dict[str, None]] = {}
+
+    def _live(self, key: str) -> bool:
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._values.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._values
+
+    async def get(self, key: str) -> Any:
+        return _load(self._values[key]) if self._live(key) else None
+
+    async def get_many(self, keys: List[str]) -> List[Any]:
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._values[key] = _dump(value)
+        if ttl is None:
+            self._expires.pop(key, None)
+        else:
+            self._expires[key] = time.monotonic() + ttl
+
+    async def delete(self, key: str) -> bool:
+        existed = self._live(key) or key in self._lists or key in self._members
+        self._values.pop(key, None)
+        self._expires.pop(key, None)
+        self._lists.pop(key, None)
+        self._members.pop(key, None)
+        return existed
+
+    async def keys(self, prefix: str) -> List[str]:
+        found = {k for k in self._values if k.startswith(prefix) and self._live(k)}
+        found.update(k for k in self._lists if k.startswith(prefix))
+        found.update(k for k in self._members if k.startswith(prefix))
+        return sorted(found)
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        value = (await self.get(key) or 0) + amount
+        self._values[key] = _dump(value)
+        return value
+
+    async def append(self, key: str, value: Any) -> int:
+        items = self._lists.setdefault(key, [])
+        items.append(_dump(value))
+        return len(items)
+
+    async def get_list(self, key: str, start: int = 0, end: int = -1) -> List[Any]:
+        return [_load(raw) for raw in _slice(self._lists.get(key, []), start, end)]
+
+    async def add_member(self, key: str, member: str) -> bool:
+        members = self._members.setdefault(key, {})
+        if member in members:
+            return False
+        members[member] = None
+        return True
+
+    async def remove_member(self, key: str, member: str) -> bool:
+        members = self._members.get(key, {})
+        if member not in members:
+            return False
+        del members[member]
+        return True
+
+    async def members(self, key: str) -> List[str]:
+        return list(self._members.get(key, {}))
+
+
+class RedisStateStore(StateStore):
+    """Redis backend; ordered sets are sorted sets scored by insertion time"""
+
+    def __init__(self, url: str = None, namespace: str = None):
+        from services.redis_client import get_redis
+        self.redis = get_redis(url)
+        self.namespace = namespace if namespace is not None else settings.STATE_KEY_PREFIX
+
+    def _key(self, key: str) -> str:
+        return self.namespace + key
+
+    async def get(self, key: str) -> Any:
+        return _load(await self.redis.get(self._key(key)))
+
+    async def get_many(self, keys: List[str]) -> List[Any]:
+        if not keys:
+            return []
+        return [_load(raw) for raw in await self.redis.mget([self._key(k) for k in keys])]
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        await self.redis.set(self._key(key), _dump(value), px=int(ttl * 1000) if ttl else None)
+
+    async def delete(self, key: str) -> bool:
+        return bool(await self.redis.delete(self._key(key)))
+
+    async def keys(self, prefix: str) -> List[str]:
+        pattern = self._key(prefix).replace("\\", "\\\\")
+        for ch in "*?[]":
+            pattern = pattern.replace(ch, "\\" + ch)
+        found = [k[len(self.namespace):] async for k in self.redis.scan_iter(match=pattern + "*", count=500)]
+        return sorted(found)
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        return await self.redis.incrby(self._key(key), amount)
+
+    async def append(self, key: str, value: Any) -> int:
+        return await self.redis.rpush(self._key(key), _dump(value))
+
+    async def get_list(self, key: str, start: int = 0, end: int = -1) -> List[Any]:
+        return [_load(raw) for raw in await self.redis.lrange(self._key(key), start, end)]
+
+    async def add_member(self, key: str, member: str) -> bool:
+        return bool(await self.redis.zadd(self._key(key), {member: time.time()}, nx=True))
+
+    async def remove_member(self, key: str, member: str) -> bool:
+        return bool(await self.redis.zrem(self._key(key), member))
+
+    async def members(self, key: str) -> List[str]:
+        return await self.redis.zrange(self._key(key), 0, -1)
+
+
+class SQLStateStore(StateStore):
+    """
+    Backend on the application database (PostgreSQL or SQLite).
+    Tables are created on first use; expired values are treated as
+    missing and removed when read.
+    """
+
+    def __init__(self):
+        from database import AsyncSessionLocal, async_engine
+        self._sessions = AsyncSessionLocal
+        self._engine = async_engine
+        self._ready = False
+        self._ready_lock = asyncio.Lock()
+
+    def _insert(self, table):
+        if self._engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        return insert(table)
+
+    async def _ensure_tables(self):
+        if self._ready:
+            return
+        async with self._ready_lock:
+            if self._ready:
+                return
+            from database import Base
+            from models.state import StateEntry, StateListItem, StateMember
+            tables = [StateEntry.__table__, StateListItem.__table__, StateMember.__table__]
+            async with self._engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all, tables=tables)
+            self._ready = True
+
+    async def get(self, key: str) -> Any:
+        return (await self.get_many([key]))[0]
+
+    async def get_many(self, keys: List[str]) -> List[Any]:
+        from models.state import StateEntry
+        await self._ensure_tables()
+        if not keys:
+            return []
+
+        now = datetime.utcnow()
+        async with self._sessions() as db:
+            rows = (await db.execute(
+                select(StateEntry.key, StateEntry.value, StateEntry.expires_at)
+                .where(StateEntry.key.in_(keys))
+            )).all()
+
+            found, expired = {}, []
+            for key, value, expires_at in rows:
+                if expires_at is not None and expires_at <= now:
+                    expired.append(key)
+                else:
+                    found[key] = value
+
+            if expired:
+                await db.execute(delete(StateEntry).where(
+                    StateEntry.key.in_(expired), StateEntry.expires_at <= now
+                ))
+                await db.commit()
+
+        return [_load(found.get(key)) for key in keys]
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        from models.state import StateEntry
+        await self._ensure_tables()
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl) if ttl else None
+        stmt = self._insert(StateEntry.__table__).values(key=key, value=_dump(value), expires_at=expires_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={"value": stmt.excluded.value, "expires_at": stmt.excluded.expires_at}
+        )
+        async with self._sessions() as db:
+            await db.execute(stmt)
+            await db.commit()
+
+    async def delete(self, key: str) -> bool:
+        from models.state import StateEntry, StateListItem, StateMember
+        await self._ensure_tables()
+        async with self._sessions() as db:
+            deleted = 0
+            for model in (StateEntry, StateListItem, StateMember):
+                result = await db.execute(delete(model).where(model.key == key))
+                deleted += result.rowcount or 0
+            await db.commit()
+        return deleted > 0
+
+    async def keys(self, prefix: str) -> List[str]:
+        from models.state import StateEntry, StateListItem, StateMember
+        await self._ensure_tables()
+        pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        query = union(*[
+            select(model.key).where(model.key.like(pattern, escape="\\"))
+            for model in (StateEntry, StateListItem, StateMember)
+        ])
+        async with self._sessions() as db:
+            return sorted((await db.execute(query)).scalars().all())
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        from models.state import StateEntry
+        await self._ensure_tables()
+        table = StateEntry.__table__
+        stmt = self._insert(table).values(key=key, value=str(amount))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={"value": cast(cast(table.c.value, Integer) + amount, String)}
+        ).returning(table.c.value)
+        async with self._sessions() as db:
+            value = (await db.execute(stmt)).scalar_one()
+            await db.commit()
+        return int(value)
+
+    async def append(self, key: str, value: Any) -> int:
+        from models.state import StateListItem
+        await self._ensure_tables()
+        async with self._sessions() as db:
+            db.add(StateListItem(key=key, value=_dump(value)))
+            await db.flush()
+            length = await db.scalar(select(func.count()).where(StateListItem.key == key))
+            await db.commit()
+        return length
+
+    async def get_list(self, key: str, start: int = 0, end: int = -1) -> List[Any]:
+        from models.state import StateListItem
+        await self._ensure_tables()
+        query = select(StateListItem.value).where(StateListItem.key == key).order_by(StateListItem.id)
+        if start >= 0 and end >= 0:
+            query = query.offset(start).limit(max(end - start + 1, 0))
+        async with self._sessions() as db:
+            values = (await db.execute(query)).scalars().all()
+        if not (start >= 0 and end >= 0):
+            values = _slice(values, start, end)
+        return [_load(raw) for raw in values]
+
+    async def add_member(self, key: str, member: str) -> bool:
+        from models.state import StateMember
+        await self._ensure_tables()
+        stmt = self._insert(StateMember.__table__).values(key=key, member=member)
+        stmt = stmt.on_conflict_do_nothing(index_elements=["key", "member"])
+        async with self._sessions() as db:
+            result = await db.execute(stmt)
+            await db.commit()
+        return bool(result.rowcount)
+
+    async def remove_member(self, key: str, member: str) -> bool:
+        from models.state import StateMember
+        await self._ensure_tables()
+        async with self._sessions() as db:
+            result = await db.execute(
+                delete(StateMember).where(StateMember.key == key, StateMember.member == member)
+            )
+            await db.commit()
+        return bool(result.rowcount)
+
+    async def members(self, key: str) -> List[str]:
+        from models.state import StateMember
+        await self._ensure_tables()
+        async with self._sessions() as db:
+            result = await db.execute(
+                select(StateMember.member).where(StateMember.key == key).order_by(StateMember.id)
+            )
+            return list(result.scalars().all())
+
+
+def create_state_store(backend: str = None) -> StateStore:
+    backend = (backend or settings.STATE_BACKEND).lower()
+    if backend == "redis":
+        return RedisStateStore()
+    if backend == "sql":
+        return SQLStateStore()
+    if backend == "memory":
+        return MemoryStateStore()
+    raise ValueError(f"Unknown STATE_BACKEND '{backend}' (expected memory, sql or redis)")
+
+
+# Global instance
+state_store = create_state_store()
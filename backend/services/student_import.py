@@ -0,0 +1,204 @@
+import asyncio
+import csv
+import os
+import secrets
+import uuid
+from datetime import datetime
+from itertools import islice
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from config import settings
+from database import AsyncSessionLocal
+from models.db_models import User, UserRole
+from services.password_hasher import password_hasher
+from services.state_store import state_store
+
+
+class StudentImporter:
+    """
+    Streaming roster import.
+
+    The uploaded CSV is spooled to disk and parsed IMPORT_BATCH_SIZE rows at
+    a time. Each batch checks existing emails with one `IN (...)` query,
+    hashes temporary passwords on the process pool and inserts the new
+    students with a single executemany. Progress is kept in the state store
+    under `school:import:{job_id}` and pushed to the `import_{job_id}`
+    Socket.IO room after every batch.
+
+    Rows without a `temp_password` get a random one. Those are handed back
+    once, to the admin, through take_credentials(); they are never part of
+    the job record that gets polled and pushed.
+    """
+
+    JOB_TTL_SECONDS = 24 * 3600
+    MAX_REPORTED_ERRORS = 100
+
+    def __init__(self, session_factory=AsyncSessionLocal, batch_size: int = None, rounds: int = None):
+        self._sessions = session_factory
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.rounds = rounds or settings.TEMP_PASSWORD_BCRYPT_ROUNDS
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _job_key(self, job_id: str) -> str:
+        return f"school:import:{job_id}"
+
+    def _credentials_key(self, job_id: str) -> str:
+        return f"school:import:{job_id}:credentials"
+
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        return await state_store.get(self._job_key(job_id))
+
+    async def take_credentials(self, job_id: str) -> Optional[List[Dict]]:
+        """The generated temporary passwords of a finished job; None once taken"""
+        key = self._credentials_key(job_id)
+        credentials = await state_store.get(key)
+        if credentials is None or not await state_store.delete(key):
+            return None
+        return credentials
+
+    async def start(self, school_id: int, path: str, started_by: str) -> Dict:
+        """Queue an import of the CSV at `path` (deleted when done)"""
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "school_id": school_id,
+            "started_by": started_by,
+            "status": "queued",
+            "processed": 0,
+            "imported": 0,
+            "skipped": 0,
+            "error_count": 0,
+            "errors": [],
+            "generated_passwords": 0,
+            "started_at": datetime.now().isoformat(),
+            "finished_at": None
+        }
+        await self._publish(job)
+
+        task = asyncio.get_running_loop().create_task(self._run(job, path))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _publish(self, job: Dict):
+        await state_store.set(self._job_key(job["job_id"]), job, ttl=self.JOB_TTL_SECONDS)
+        try:
+            from socket_manager import sio
+            await sio.emit("import_progress", job, room=f"import_{job['job_id']}")
+        except Exception as e:
+            print(f"Import progress push failed: {e}")
+
+    def _error(self, job: Dict, message: str):
+        job["error_count"] += 1
+        if len(job["errors"]) < self.MAX_REPORTED_ERRORS:
+            job["errors"].append(message)
+
+    async def _run(self, job: Dict, path: str):
+        job["status"] = "running"
+        seen: Set[str] = set()
+        credentials: List[Dict] = []
+        try:
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                reader = csv.DictReader(f)
+                while True:
+                    rows = await asyncio.to_thread(lambda: list(islice(reader, self.batch_size)))
+                    if not rows:
+                        break
+                    await self._import_batch(job, rows, seen, credentials)
+                    await self._publish(job)
+            job["status"] = "completed"
+        except Exception as e:
+            job["status"] = "failed"
+            self._error(job, f"Import aborted: {e}")
+        finally:
+            os.unlink(path)
+            if credentials:
+                await state_store.set(self._credentials_key(job["job_id"]), credentials, ttl=self.JOB_TTL_SECONDS)
+            job["generated_passwords"] = len(credentials)
+            job["finished_at"] = datetime.now().isoformat()
+            await self._publish(job)
+
+    async def _import_batch(self, job: Dict, rows: List[Dict], seen: Set[str], credentials: List[Dict]):
+        candidates = []
+        for row in rows:
+            job["processed"] += 1
+            email = (row.get("email") or "").strip()
+            if not email:
+                continue
+            if email in seen:
+                job["skipped"] += 1
+                self._error(job, f"User {email} appears more than once")
+                continue
+            seen.add(email)
+
+            try:
+                grade_level = row.get("grade_level")
+                candidates.append({
+                    "id": str(uuid.uuid4()),
+                    "email": email,
+                    "full_name": row.get("full_name"),
+                    "temp_password": row.get("temp_password") or None,
+                    "role": UserRole.STUDENT,
+                    "school_id": job["school_id"],
+                    "grade_level": int(grade_level) if grade_level else None,
+                    "is_active": True
+                })
+            except Exception as e:
+                self._error(job, f"Error importing row {row}: {str(e)}")
+
+        candidates = await self._drop_existing(job, candidates)
+        if not candidates:
+            return
+
+        passwords = []
+        generated = {}
+        for candidate in candidates:
+            password = candidate.pop("temp_password")
+            if password is None:
+                password = generated[candidate["email"]] = secrets.token_urlsafe(12)
+            passwords.append(password)
+        hashes = await password_hasher.hash_many(passwords, self.rounds)
+        for candidate, hashed in zip(candidates, hashes):
+            candidate["hashed_password"] = hashed
+
+        try:
+            await self._insert(candidates)
+        except IntegrityError:
+            # Someone registered one of these emails since the check: recheck once
+            candidates = await self._drop_existing(job, candidates)
+            if candidates:
+                await self._insert(candidates)
+        job["imported"] += len(candidates)
+        credentials.extend(
+            {"email": c["email"], "temp_password": generated[c["email"]]}
+            for c in candidates if c["email"] in generated
+        )
+
+    async def _drop_existing(self, job: Dict, candidates: List[Dict]) -> List[Dict]:
+        if not candidates:
+            return candidates
+        async with self._sessions() as db:
+            existing = set((await db.execute(
+                select(User.email).where(User.email.in_([c["email"] for c in candidates]))
+            )).scalars())
+
+        for email in existing:
+            job["skipped"] += 1
+            self._error(job, f"User {email} already exists")
+        return [c for c in candidates if c["email"] not in existing]
+
+    async def _insert(self, candidates: List[Dict]):
+        async with self._sessions() as db:
+            await db.execute(insert(User), candidates)
+            await db.commit()
+
+    async def wait(self):
+        """Wait for in-flight imports (used on shutdown and by benchmarks)"""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+
+# Global instance
+student_importer = StudentImporter()
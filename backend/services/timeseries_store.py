@@ -0,0 +1,160 @@
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class TimeSeriesStore:
+    """
+    Compact in-memory per-user event history.
+
+    Each user's events live in one NumPy structured array: an epoch-second
+    timestamp (float64) plus float32 metrics, i.e. 8 + 4 * len(fields)
+    bytes per event. Arrays grow in fixed chunks. Events older than the
+    retention window are never returned, and are dropped from the array
+    (with those beyond `max_events`) when it fills up, or at a chunk
+    boundary once a chunk's worth has expired. Users with no event in the last `idle_seconds` (the
+    retention window by default) are dropped by a sweep that runs at most
+    every `sweep_seconds` on append, so memory stays bounded in the number
+    of active users too.
+
+    Events are expected to be appended in time order, which keeps every
+    range query a pair of binary searches.
+    """
+
+    def __init__(
+        self,
+        fields: Sequence[str],
+        retention_seconds: Optional[float] = None,
+        max_events: Optional[int] = None,
+        chunk_size: int = 64,
+        idle_seconds: Optional[float] = None,
+        sweep_seconds: float = 300.0
+    ):
+        self.fields = tuple(fields)
+        self.dtype = np.dtype([("ts", np.float64)] + [(name, np.float32) for name in self.fields])
+        self.retention_seconds = retention_seconds
+        self.max_events = max_events
+        self.chunk_size = chunk_size
+        self.idle_seconds = idle_seconds if idle_seconds is not None else retention_seconds
+        self.sweep_seconds = sweep_seconds
+        self._swept_at = time.monotonic()
+        self._series: Dict[str, np.ndarray] = {}
+        self._lengths: Dict[str, int] = {}
+
+    def __contains__(self, user_id: str) -> bool:
+        return self.count(user_id) > 0
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def count(self, user_id: str) -> int:
+        return len(self._view(user_id))
+
+    def append(self, user_id: str, timestamp: Optional[float] = None, **values: float):
+        """Record one event; missing metrics are stored as NaN"""
+        if self.idle_seconds is not None and time.monotonic() - self._swept_at >= self.sweep_seconds:
+            self.evict_idle()
+
+        series = self._series.get(user_id)
+        length = self._lengths.get(user_id, 0)
+
+        if series is None:
+            series = np.empty(self.chunk_size, dtype=self.dtype)
+        elif length == len(series) or (
+            length % self.chunk_size == 0 and self._expired(series, length) >= self.chunk_size
+        ):
+            series, length = self._compact(series, length)
+            if length == len(series):
+                grown = np.empty(len(series) + self.chunk_size, dtype=self.dtype)
+                grown[:length] = series[:length]
+                series = grown
+
+        row = series[length]
+        row["ts"] = time.time() if timestamp is None else timestamp
+        for name in self.fields:
+            row[name] = values.get(name, np.nan)
+
+        self._series[user_id] = series
+        self._lengths[user_id] = length + 1
+
+    def query(self, user_id: str, start: Optional[float] = None, end: Optional[float] = None) -> np.ndarray:
+        """Events with start <= ts <= end (either bound optional), oldest first"""
+        events = self._view(user_id)
+        ts = events["ts"]
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+        hi = len(events) if end is None else int(np.searchsorted(ts, end, side="right"))
+        return events[lo:hi].copy()
+
+    def last(self, user_id: str, n: int) -> np.ndarray:
+        """The most recent `n` events, oldest first"""
+        events = self._view(user_id)
+        return events[max(len(events) - n, 0):].copy()
+
+    def evict_idle(self) -> int:
+        """Drop users whose newest event is older than `idle_seconds`; returns how many"""
+        self._swept_at = time.monotonic()
+        if self.idle_seconds is None:
+            return 0
+        cutoff = time.time() - self.idle_seconds
+        idle = [
+            user_id for user_id, series in self._series.items()
+            if self._lengths[user_id] == 0 or series[self._lengths[user_id] - 1]["ts"] < cutoff
+        ]
+        for user_id in idle:
+            del self._series[user_id]
+            del self._lengths[user_id]
+        return len(idle)
+
+    def nbytes(self) -> int:
+        """Memory held by the event arrays (including unused chunk capacity)"""
+        return sum(series.nbytes for series in self._series.values())
+
+    @staticmethod
+    def to_dicts(events: np.ndarray) -> List[dict]:
+        """API-friendly rows: 'timestamp' as datetime, metrics as floats (float32 precision)"""
+        names = [name for name in events.dtype.names if name != "ts"]
+        return [
+            {
+                "timestamp": datetime.fromtimestamp(float(event["ts"])),
+                **{name: round(float(event[name]), 4) for name in names}
+            }
+            for event in events
+        ]
+
+    def _view(self, user_id: str) -> np.ndarray:
+        series = self._series.get(user_id)
+        if series is None:
+            return np.empty(0, dtype=self.dtype)
+        length = self._lengths[user_id]
+        return series[self._expired(series, length):length]
+
+    def _expired(self, series: np.ndarray, length: int) -> int:
+        """How many of the oldest events are past the retention window"""
+        if self.retention_seconds is None or length == 0:
+            return 0
+        cutoff = time.time() - self.retention_seconds
+        if series[0]["ts"] >= cutoff:
+            return 0
+        return int(np.searchsorted(series["ts"][:length], cutoff, side="left"))
+
+    def _compact(self, series: np.ndarray, length: int):
+        """Drop events outside the retention window / event cap; shrink if mostly empty"""
+        cut = self._expired(series, length)
+        if self.max_events is not None:
+            # Leave room for the incoming event
+            cut = max(cut, length - self.max_events + 1)
+
+        if cut == 0:
+            return series, length
+
+        length -= cut
+        capacity = max(-(-(length + 1) // self.chunk_size) * self.chunk_size, self.chunk_size)
+        if capacity < len(series):
+            compacted = np.empty(capacity, dtype=self.dtype)
+            compacted[:length] = series[cut:cut + length]
+            return compacted, length
+
+        series[:length] = series[cut:cut + length]
+        return series, length
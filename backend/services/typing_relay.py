@@ -0,0 +1,163 @@
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from config import settings
+
+TypingKey = Tuple[str, str]  # (user_id, room)
+
+
+@dataclass
+class _Typing:
+    sid: str
+    user_name: Optional[str]
+    started_at: float  # when `user_typing` went out
+    deadline: float  # when `user_typing_stop` goes out
+
+
+class TypingRelay:
+    """
+    Relays typing indicators to a room, debounced per (user, room).
+
+    The first keystroke sends `user_typing` to the room (not to the
+    sender); further ones only push the idle deadline back. The pair ends
+    with one `user_typing_stop`, when the client says so or after
+    TYPING_IDLE_SECONDS without keystrokes, but never sooner than
+    TYPING_WINDOW_SECONDS after the start, so a room sees at most one
+    start and one stop per window however fast the client toggles.
+
+    Deadlines sit in a hashed timer wheel (one slot per tick) swept by a
+    single task while anyone is typing, rather than a task per typist.
+    Entries are checked when their slot comes round and moved on if the
+    deadline was pushed back in the meantime.
+    """
+
+    SLOTS = 128
+
+    def __init__(self, emit: Callable[..., Awaitable] = None, window: float = None,
+                 idle: float = None, tick: float = None, clock: Callable[[], float] = time.monotonic):
+        self._emit = emit or self._emit_to_room
+        self.window = window if window is not None else settings.TYPING_WINDOW_SECONDS
+        self.idle = max(self.window, idle if idle is not None else settings.TYPING_IDLE_SECONDS)
+        self.tick = tick if tick is not None else settings.TYPING_WHEEL_TICK_MS / 1000
+        self.clock = clock
+        self._typing: Dict[TypingKey, _Typing] = {}
+        self._by_sid: Dict[str, Set[TypingKey]] = {}
+        self._slots: List[Set[TypingKey]] = [set() for _ in range(self.SLOTS)]
+        self._cursor: Optional[int] = None  # last tick swept
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    async def _emit_to_room(event: str, payload: Dict, room: str, user_id: str, sid: str):
+        from socket_manager import sio, socket_manager
+        skip = list(socket_manager.user_sockets.get(user_id, ())) or [sid]
+        await sio.emit(event, payload, room=room, skip_sid=skip)
+
+    def _schedule(self, key: TypingKey, deadline: float):
+        tick = math.ceil(deadline / self.tick)
+        if self._cursor is None:
+            self._cursor = tick - 1
+        tick = max(tick, self._cursor + 1)
+        self._slots[tick % self.SLOTS].add(key)
+
+    async def start(self, user_id: str, sid: str, room: str, user_name: str = None):
+        """A keystroke from `user_id` in `room`"""
+        now = self.clock()
+        key = (user_id, room)
+        state = self._typing.get(key)
+        if state is not None:
+            state.deadline = now + self.idle
+            return
+
+        self._typing[key] = _Typing(sid, user_name, now, now + self.idle)
+        self._by_sid.setdefault(sid, set()).add(key)
+        self._schedule(key, now + self.idle)
+        self._ensure_running()
+        await self._emit("user_typing", {"room": room, "user_id": user_id, "user_name": user_name},
+                         room, user_id, sid)
+
+    async def stop(self, user_id: str, room: str):
+        """The client says `user_id` stopped typing in `room`"""
+        state = self._typing.get((user_id, room))
+        if state is None:
+            return
+        now = self.clock()
+        if now >= state.started_at + self.window:
+            await self._finish((user_id, room))
+        else:
+            state.deadline = state.started_at + self.window
+            self._schedule((user_id, room), state.deadline)
+
+    async def drop(self, sid: str):
+        """Stop everything the socket was typing (on disconnect)"""
+        for key in list(self._by_sid.get(sid, ())):
+            await self._finish(key)
+
+    async def _finish(self, key: TypingKey):
+        state = self._typing.pop(key, None)
+        if state is None:
+            return
+        keys = self._by_sid.get(state.sid)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_sid[state.sid]
+        user_id, room = key
+        await self._emit("user_typing_stop", {"room": room, "user_id": user_id, "user_name": state.user_name},
+                         room, user_id, state.sid)
+
+    async def expire(self, now: float = None) -> int:
+        """Send the stops that are due; returns how many went out"""
+        now = now if now is not None else self.clock()
+        if self._cursor is None:
+            return 0
+        target = math.floor(now / self.tick)
+        if target - self._cursor >= self.SLOTS:
+            # Fell more than a full turn behind: sweep every slot once
+            due = set().union(*self._slots)
+            for slot in self._slots:
+                slot.clear()
+        else:
+            due = set()
+            for tick in range(self._cursor + 1, target + 1):
+                slot = self._slots[tick % self.SLOTS]
+                due |= slot
+                slot.clear()
+        self._cursor = max(self._cursor, target)
+
+        stopped = 0
+        for key in due:
+            state = self._typing.get(key)
+            if state is None:
+                continue
+            if state.deadline <= now:
+                await self._finish(key)
+                stopped += 1
+            else:
+                self._schedule(key, state.deadline)
+        return stopped
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while self._typing:
+            await asyncio.sleep(self.tick)
+            try:
+                await self.expire()
+            except Exception as e:
+                print(f"Typing indicator sweep failed: {e}")
+
+    async def close(self):
+        """Stop the sweeper (called on app shutdown)"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+# Global instance
+typing_relay = TypingRelay()
@@ -0,0 +1,127 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+from sqlalchemy import bindparam, func, update
+
+from config import settings
+from database import AsyncSessionLocal
+from models.db_models import User
+
+
+class UserCounterCoalescer:
+    """
+    Buffers hot per-user writes (points, streaks, last_login) and applies
+    them every USER_COUNTER_FLUSH_SECONDS as batched UPDATEs, so a user gets
+    at most one write per flush window however many events they generate.
+
+    `add` accumulates a delta and is applied as `x = x + :delta`, so
+    concurrent workers never lose each other's increments. `set` is last
+    write wins within the window (timestamps, streak resets).
+    """
+
+    COUNTERS = {"total_points", "level", "current_streak", "longest_streak"}
+    FIELDS = COUNTERS | {"last_login"}
+
+    def __init__(self, session_factory=AsyncSessionLocal, interval_seconds: float = None):
+        self._sessions = session_factory
+        self.interval = interval_seconds or settings.USER_COUNTER_FLUSH_SECONDS
+        self._deltas: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._values: Dict[str, Dict[str, Any]] = defaultdict(dict)
+        self._flush_lock = asyncio.Lock()
+        self._writer: Optional[asyncio.Task] = None
+
+    def add(self, user_id: str, field: str, delta: int = 1):
+        if field not in self.COUNTERS:
+            raise ValueError(f"{field} is not a coalesced counter")
+        assigned = self._values.get(user_id)
+        if assigned and field in assigned:
+            assigned[field] += delta
+        else:
+            pending = self._deltas[user_id]
+            pending[field] = pending.get(field, 0) + delta
+        self._start_writer()
+
+    def set(self, user_id: str, field: str, value: Any):
+        if field not in self.FIELDS:
+            raise ValueError(f"{field} is not a coalesced field")
+        self._values[user_id][field] = value
+        # A set supersedes increments queued before it
+        self._deltas.get(user_id, {}).pop(field, None)
+        self._start_writer()
+
+    def _start_writer(self):
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._write_loop())
+
+    async def _write_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self):
+        """Apply everything buffered so far; failed writes are re-queued"""
+        async with self._flush_lock:
+            if not self._deltas and not self._values:
+                return
+            deltas, self._deltas = self._deltas, defaultdict(dict)
+            values, self._values = self._values, defaultdict(dict)
+
+            # One executemany per distinct set of touched columns
+            shapes: Dict[tuple, list] = defaultdict(list)
+            for user_id in set(deltas) | set(values):
+                d, v = deltas.get(user_id, {}), values.get(user_id, {})
+                if not d and not v:
+                    continue
+                shape = (tuple(sorted(d)), tuple(sorted(v)))
+                params = {"b_user_id": user_id}
+                params.update({f"d_{k}": n for k, n in d.items()})
+                params.update({f"v_{k}": x for k, x in v.items()})
+                shapes[shape].append(params)
+
+            try:
+                async with self._sessions() as db:
+                    for (added, assigned), params in shapes.items():
+                        await db.execute(self._statement(added, assigned), params)
+                    await db.commit()
+            except Exception as e:
+                print(f"User counter flush failed, will retry: {e}")
+                self._requeue(deltas, values)
+
+    @staticmethod
+    def _statement(added: tuple, assigned: tuple):
+        table = User.__table__
+        changes = {k: func.coalesce(table.c[k], 0) + bindparam(f"d_{k}") for k in added}
+        changes.update({k: bindparam(f"v_{k}") for k in assigned})
+        return update(table).where(table.c.id == bindparam("b_user_id")).values(changes)
+
+    def _requeue(self, deltas, values):
+        for user_id, d in deltas.items():
+            for field, n in d.items():
+                if field not in self._values.get(user_id, {}):
+                    pending = self._deltas[user_id]
+                    pending[field] = pending.get(field, 0) + n
+        for user_id, v in values.items():
+            for field, x in v.items():
+                if field in self._values[user_id]:
+                    continue
+                # Increments queued since the failed flush apply on top of the old value
+                newer = self._deltas.get(user_id, {}).pop(field, None)
+                self._values[user_id][field] = x + newer if newer is not None else x
+
+    async def close(self):
+        """Stop the writer and flush what is left (called on app shutdown)"""
+        if self._writer is not None:
+            # Holding the lock means the writer is not midway through a flush
+            async with self._flush_lock:
+                self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        await self.flush()
+
+
+# Global instance
+user_counters = UserCounterCoalescer()
@@ -1,83 +1,292 @@
+import asyncio
+import heapq
+import time
 import socketio
-from typing import Dict, List, Any
+from socketio.async_pubsub_manager import AsyncPubSubManager
+from typing import Dict, List, Any, Optional, Set, Tuple
+from urllib.parse import parse_qs
+
+from config import settings
+from models.db_models import UserRole
+from services.auth_service import AuthService, principal_for_token
+from services.presence import presence
+from services.principal_cache import Principal, current_principal
+from services.typing_relay import typing_relay
+
+
+class FakeRedisManager(socketio.AsyncRedisManager):
+    """AsyncRedisManager on an in-process fakeredis server (tests, local runs)"""
+
+    def _redis_connect(self):
+        from fakeredis import aioredis as fake_redis
+        from services.redis_client import fake_server
+        self.redis = fake_redis.FakeRedis(server=fake_server(self.redis_url))
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self.connected = True
+
+
+def create_client_manager(kind: str = None, url: str = None) -> Optional[socketio.AsyncManager]:
+    """
+    Client manager for SOCKETIO_MANAGER: None keeps Socket.IO's in-process
+    manager; "redis" publishes every emit on a Redis channel so each worker
+    delivers it to the members of the room it holds. A `fakeredis://` URL
+    uses an in-process stand-in, shared only by servers in the same process.
+    """
+    kind = kind or settings.SOCKETIO_MANAGER
+    if kind == "memory":
+        return None
+    if kind == "redis":
+        url = url or settings.SOCKETIO_REDIS_URL or settings.REDIS_URL
+        manager_class = FakeRedisManager if url.startswith("fakeredis://") else socketio.AsyncRedisManager
+        return manager_class(url, channel=settings.SOCKETIO_CHANNEL)
+    raise ValueError(f"Unknown SOCKETIO_MANAGER: {kind}")
+
 
 # Create Async Socket.IO server
 # cors_allowed_origins="*" allows connection from any domain (dev mode)
 sio = socketio.AsyncServer(
     async_mode='asgi',
     cors_allowed_origins="*",
+    client_manager=create_client_manager(),
     logger=True,
     engineio_logger=True
 )
 
 class SocketManager:
+    """
+    Tracks which user each socket belongs to, both ways, so lookups and
+    targeted pushes don't scan every connection. Each user's sockets also
+    sit in a `user_{id}` room, so one emit reaches all of them.
+
+    The index only covers this worker's sockets. With a Redis client
+    manager the user may be connected to another worker, so pushes always
+    go out through the room.
+
+    Sockets authenticate once, with a JWT on connect (or a fresh one via
+    `authenticate`). The principal is kept in the Socket.IO session, so
+    event handlers authorize from memory. Tokens aren't re-checked per
+    event: a sweeper disconnects, in bulk, sockets whose token expired.
+    """
+
     def __init__(self):
         self.active_connections: Dict[str, str] = {}  # sid -> user_id
+        self.user_sockets: Dict[str, Set[str]] = {}  # user_id -> sids
+        self.expires_at: Dict[str, float] = {}  # sid -> token exp
+        self._expiries: List[Tuple[float, str]] = []  # heap of (exp, sid); stale entries skipped
+        self._sweeper: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def user_room(user_id: str) -> str:
+        return f"user_{user_id}"
+
+    @staticmethod
+    def _token(environ: dict, auth: Any) -> Optional[str]:
+        """From the handshake `auth` payload, an Authorization header or ?token="""
+        if isinstance(auth, dict) and auth.get("token"):
+            return auth["token"]
+        header = environ.get("HTTP_AUTHORIZATION", "")
+        if header.lower().startswith("bearer "):
+            return header[7:]
+        return parse_qs(environ.get("QUERY_STRING", "")).get("token", [None])[0]
+
+    async def connect(self, sid: str, environ: dict, auth: Any = None):
+        principal = await self.authorize(sid, self._token(environ, auth))
+        if principal is None:
+            raise socketio.exceptions.ConnectionRefusedError("authentication failed")
+        print(f"Client connected: {sid} (User: {principal.id})")
+
+    async def authorize(self, sid: str, token: Optional[str]) -> Optional[Principal]:
+        """Verify `token` and bind its principal to the socket; None if rejected"""
+        if not token:
+            return None
+        principal = await principal_for_token(token)
+        if principal is None or not principal.is_active:
+            return None
+        claims = await AuthService.verify_token(token)  # cached by principal_for_token
+
+        await sio.save_session(sid, {"principal": principal})
+        exp = claims.get("exp") if claims else None
+        if exp:
+            self.expires_at[sid] = exp
+            heapq.heappush(self._expiries, (exp, sid))
+            if self._sweeper is None or self._sweeper.done():
+                self._sweeper = asyncio.get_running_loop().create_task(self._sweep_loop())
+        else:
+            self.expires_at.pop(sid, None)
+        await self.register_user(sid, str(principal.id))
+        return principal
+
+    async def principal(self, sid: str) -> Optional[Principal]:
+        try:
+            session = await sio.get_session(sid)
+        except KeyError:
+            return None
+        return session.get("principal")
 
-    async def connect(self, sid: str, environ: dict):
-        print(f"Client connected: {sid}")
-        # In a real app, we would authenticate the user here using the token in query params or headers
+    async def _sweep_loop(self):
+        while self.expires_at:
+            await asyncio.sleep(settings.SOCKETIO_AUTH_SWEEP_SECONDS)
+            try:
+                await self.sweep_expired()
+            except Exception as e:
+                print(f"Socket token sweep failed: {e}")
+
+    async def sweep_expired(self, now: float = None) -> int:
+        """Disconnect every socket whose token has expired; returns how many"""
+        now = now if now is not None else time.time()
+        expired = []
+        while self._expiries and self._expiries[0][0] <= now:
+            exp, sid = heapq.heappop(self._expiries)
+            if self.expires_at.get(sid) == exp:
+                del self.expires_at[sid]
+                expired.append(sid)
+        for sid in expired:
+            await sio.emit('auth_expired', {'reason': 'token expired'}, room=sid)
+            await sio.disconnect(sid)
+        return len(expired)
+
+    async def close(self):
+        """Stop the expiry sweeper (called on app shutdown)"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
         
     async def disconnect(self, sid: str):
-        if sid in self.active_connections:
-            user_id = self.active_connections[sid]
+        # Socket.IO drops the sid from its rooms itself
+        user_id = self._forget(sid)
+        await typing_relay.drop(sid)
+        await presence.drop(sid)
+        if user_id is not None:
             print(f"Client disconnected: {sid} (User: {user_id})")
-            del self.active_connections[sid]
         else:
             print(f"Client disconnected: {sid}")
 
+    def _forget(self, sid: str) -> Optional[str]:
+        self.expires_at.pop(sid, None)
+        user_id = self.active_connections.pop(sid, None)
+        if user_id is not None:
+            sids = self.user_sockets.get(user_id)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self.user_sockets[user_id]
+        return user_id
+
     async def register_user(self, sid: str, user_id: str):
         """Map a socket ID to a user ID"""
-        self.active_connections[sid] = user_id
+        previous = self.active_connections.get(sid)
+        if previous != user_id:
+            if previous is not None:
+                self._forget(sid)
+                await sio.leave_room(sid, self.user_room(previous))
+                # Circle rooms were authorized for the previous user
+                for room in presence.rooms_of(sid):
+                    await sio.leave_room(sid, room)
+                await presence.drop(sid)
+                await typing_relay.drop(sid)
+            self.active_connections[sid] = user_id
+            self.user_sockets.setdefault(user_id, set()).add(sid)
+            await sio.enter_room(sid, self.user_room(user_id))
         await sio.emit('status', {'status': 'connected', 'user_id': user_id}, room=sid)
 
+    def is_online(self, user_id: str) -> bool:
+        """Whether the user has a socket on this worker"""
+        return user_id in self.user_sockets
+
     async def broadcast_to_user(self, user_id: str, event: str, data: Any):
         """Send an event to a specific user if they are connected"""
-        # Find all sockets for this user
-        for sid, uid in self.active_connections.items():
-            if uid == user_id:
-                await sio.emit(event, data, room=sid)
+        if user_id in self.user_sockets or isinstance(sio.manager, AsyncPubSubManager):
+            await sio.emit(event, data, room=self.user_room(user_id))
 
 # Initialize manager
 socket_manager = SocketManager()
 
 # Event Handlers
 @sio.event
-async def connect(sid, environ):
-    await socket_manager.connect(sid, environ)
+async def connect(sid, environ, auth=None):
+    await socket_manager.connect(sid, environ, auth)
 
 @sio.event
 async def disconnect(sid):
     await socket_manager.disconnect(sid)
 
+async def require_principal(sid, event: str) -> Optional[Principal]:
+    """The socket's principal, or None (after telling the client) if it has none"""
+    principal = await socket_manager.principal(sid)
+    if principal is None:
+        await sio.emit('auth_error', {'event': event, 'error': 'not_authenticated'}, room=sid)
+    return principal
+
 @sio.event
 async def authenticate(sid, data):
     """
-    Client sends { 'user_id': '...' } after connection to identify themselves.
-    In production, verify JWT token here.
+    Client may send { 'token': '...' } to re-authenticate (e.g. after a
+    token refresh). The user is whoever the token says; a 'user_id' that
+    doesn't match it is rejected.
     """
-    user_id = data.get('user_id')
-    if user_id:
-        await socket_manager.register_user(sid, user_id)
+    data = data or {}
+    if data.get('token'):
+        if await socket_manager.authorize(sid, data['token']) is None:
+            await sio.emit('auth_error', {'event': 'authenticate', 'error': 'invalid_token'}, room=sid)
+        return
+
+    principal = await require_principal(sid, 'authenticate')
+    if principal is None:
+        return
+    if data.get('user_id') and str(data['user_id']) != str(principal.id):
+        await sio.emit('auth_error', {'event': 'authenticate', 'error': 'user_mismatch'}, room=sid)
+    else:
+        await socket_manager.register_user(sid, str(principal.id))
         
+def typing_room(sid, data) -> Optional[str]:
+    """The room a typing event is for ({ 'circle_id' } or { 'roomId' }), if the socket is in it"""
+    data = data or {}
+    room = f"circle_{data['circle_id']}" if data.get('circle_id') else data.get('roomId')
+    if room and room in sio.rooms(sid):
+        return room
+    return None
+
 @sio.event
 async def typing_start(sid, data):
     """
-    Client sends { 'to_user': '...', 'chat_id': '...' }
+    Client sends { 'circle_id': '...', 'userName': '...' } on keystrokes;
+    the room gets 'user_typing' once, then 'user_typing_stop' when they stop
+    (see TypingRelay).
     """
-    # Relay typing status to the target user/room
-    # For now, just echo or log
-    pass
+    principal = await require_principal(sid, 'typing_start')
+    room = typing_room(sid, data) if principal else None
+    if room:
+        user_name = str(data.get('userName') or '')[:50] or None
+        await typing_relay.start(str(principal.id), sid, room, user_name)
+
+@sio.event
+async def typing_stop(sid, data):
+    principal = await require_principal(sid, 'typing_stop')
+    room = typing_room(sid, data) if principal else None
+    if room:
+        await typing_relay.stop(str(principal.id), room)
 
 @sio.event
 async def join_circle(sid, data):
     """
-    Client sends { 'circle_id': '...' } to join a chat room
+    Client sends { 'circle_id': '...' } to join a chat room (members of the
+    circle only); it gets the room's 'presence_snapshot', then
+    'presence_diff' as members come and go
     """
+    principal = await require_principal(sid, 'join_circle')
+    if principal is None:
+        return
     circle_id = data.get('circle_id')
     if circle_id:
+        from services.peer_circle_service import peer_circle_service
+        circle = await peer_circle_service.get_circle(str(circle_id))
+        if circle is None or str(principal.id) not in circle["members"]:
+            await sio.emit('auth_error', {'event': 'join_circle', 'error': 'not_authorized'}, room=sid)
+            return
         room = f"circle_{circle_id}"
-        sio.enter_room(sid, room)
+        await sio.enter_room(sid, room)
+        await presence.join(sid, str(principal.id), room)
         print(f"Socket {sid} joined room {room}")
 
 @sio.event
@@ -88,10 +297,73 @@ async def leave_circle(sid, data):
     circle_id = data.get('circle_id')
     if circle_id:
         room = f"circle_{circle_id}"
-        sio.leave_room(sid, room)
+        await sio.leave_room(sid, room)
+        await presence.leave(sid, room)
         print(f"Socket {sid} left room {room}")
 
+@sio.event
+async def watch_import(sid, data):
+    """
+    Client sends { 'job_id': '...' } to receive 'import_progress' events
+    for a roster import (school admins of that school, platform admins).
+    """
+    principal = await require_principal(sid, 'watch_import')
+    if principal is None:
+        return
+    job_id = data.get('job_id')
+    if job_id:
+        from services.student_import import student_importer
+        job = await student_importer.get_job(job_id)
+        allowed = job is not None and (
+            principal.role == UserRole.PLATFORM_ADMIN
+            or (principal.role == UserRole.SCHOOL_ADMIN and principal.school_id == job["school_id"])
+        )
+        if not allowed:
+            await sio.emit('auth_error', {'event': 'watch_import', 'error': 'not_authorized'}, room=sid)
+            return
+        await sio.enter_room(sid, f"import_{job_id}")
+
 @sio.event
 async def message(sid, data):
+    if await require_principal(sid, 'message') is None:
+        return
     print(f"Message from {sid}: {data}")
     # Handle incoming real-time messages
+
+@sio.event
+async def chat_message(sid, data):
+    """
+    Client sends { 'message': '...', 'session_id': '...', 'language': 'en' }
+    and receives the reply as a series of 'chat_stream' events:
+    one 'risk' frame, then 'token' frames as they arrive, then 'done'.
+    The turn is always recorded for the socket's own user, in one of
+    their own sessions.
+    """
+    from fastapi import HTTPException
+    from pydantic import ValidationError
+    from models.conversation import ConversationRequest
+    from routes.conversation import stream_chat_turn
+    from services.chat_sessions import chat_sessions
+
+    principal = await require_principal(sid, 'chat_message')
+    if principal is None:
+        return
+    current_principal.set(principal)
+
+    try:
+        request = ConversationRequest(**{**(data or {}), 'user_id': str(principal.id)})
+    except ValidationError as e:
+        await sio.emit('chat_error', {'error': 'invalid_request', 'detail': str(e)}, room=sid)
+        return
+
+    if request.session_id:
+        session = await chat_sessions.get(request.session_id)
+        if session is not None and str(session.user_id) != str(principal.id):
+            await sio.emit('auth_error', {'event': 'chat_message', 'error': 'not_authorized'}, room=sid)
+            return
+
+    try:
+        async for frame in stream_chat_turn(request):
+            await sio.emit('chat_stream', frame, room=sid)
+    except HTTPException as e:
+        await sio.emit('chat_error', {'error': 'invalid_request', 'detail': e.detail}, room=sid)
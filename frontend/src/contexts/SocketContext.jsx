@@ -36,14 +36,13 @@ export function SocketProvider({ children }) {
       reconnection: true,
       reconnectionAttempts: 5,
       reconnectionDelay: 1000,
+      // The server verifies this token on connect; the socket acts as its user
+      auth: (cb) => cb({ token: localStorage.getItem('access_token') }),
     })
 
     newSocket.on('connect', () => {
       console.log('Socket connected:', newSocket.id)
       setIsConnected(true)
-      
-      // Authenticate with socket
-      newSocket.emit('authenticate', { user_id: user.id })
     })
 
     newSocket.on('disconnect', () => {
@@ -12,7 +12,7 @@ class SocketService {
     if (this.socket?.connected) return
 
     this.socket = io(SOCKET_URL, {
-      auth: { userId },
+      auth: (cb) => cb({ token: localStorage.getItem('access_token') }),
       transports: ['websocket', 'polling']
     })
 